@@ -6,7 +6,7 @@ import os
 db = SQLAlchemy()
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__, 
                 template_folder='../templates',
                 static_folder='../static')
@@ -15,6 +15,66 @@ def create_app():
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///tasks.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # SQLite connection pragmas; an empty value leaves SQLite's default
+    app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_BUSY_TIMEOUT'] = os.environ.get('SQLITE_BUSY_TIMEOUT', '5000')  # ms
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_MMAP_SIZE'] = os.environ.get('SQLITE_MMAP_SIZE', '268435456')  # bytes
+    app.config['SQLITE_CACHE_SIZE'] = os.environ.get('SQLITE_CACHE_SIZE', '-65536')  # negative = KiB
+    # Connection pool for server databases (PostgreSQL, MySQL)
+    app.config['DATABASE_POOL_SIZE'] = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+    app.config['DATABASE_MAX_OVERFLOW'] = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+    app.config['DATABASE_POOL_PRE_PING'] = os.environ.get('DATABASE_POOL_PRE_PING', '1') == '1'
+    app.config['DATABASE_POOL_RECYCLE'] = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))  # seconds
+    # Processes expanding cron schedules during generation (1 = in-process),
+    # used once at least EXPANSION_MIN_TEMPLATES templates are due
+    app.config['EXPANSION_WORKERS'] = int(os.environ.get('EXPANSION_WORKERS', 1))
+    app.config['EXPANSION_MIN_TEMPLATES'] = int(os.environ.get('EXPANSION_MIN_TEMPLATES', 500))
+    # Threads per process running POST /api/generate-recurring jobs
+    app.config['GENERATION_WORKERS'] = int(os.environ.get('GENERATION_WORKERS', 1))
+    # Seconds without progress before a running generation job is considered orphaned
+    app.config['GENERATION_JOB_STALE'] = int(os.environ.get('GENERATION_JOB_STALE', 300))
+    # Set to 0 to run without background jobs (e.g. benchmarks, one-off scripts)
+    app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED', '1') == '1'
+    # How far ahead the scheduler materializes recurring tasks
+    app.config['RECURRING_HORIZON_DAYS'] = int(os.environ.get('RECURRING_HORIZON_DAYS', 7))
+    # Elects the one process that runs scheduled jobs: 'file', 'db' or 'none'
+    app.config['SCHEDULER_LOCK'] = os.environ.get('SCHEDULER_LOCK', 'file')
+    app.config['SCHEDULER_LOCK_FILE'] = os.environ.get('SCHEDULER_LOCK_FILE')
+    app.config['SCHEDULER_LOCK_TTL'] = int(os.environ.get('SCHEDULER_LOCK_TTL', 120))
+    app.config['SCHEDULER_LOCK_RETRY'] = int(os.environ.get('SCHEDULER_LOCK_RETRY', 60))
+    # Entries kept in the change log; clients further behind refetch their view
+    app.config['CHANGE_LOG_SIZE'] = int(os.environ.get('CHANGE_LOG_SIZE', 10000))
+    # Seconds a change stream stays open before the client reconnects
+    app.config['CHANGES_STREAM_TIMEOUT'] = int(os.environ.get('CHANGES_STREAM_TIMEOUT', 300))
+    # Request, SQL and job metrics at /metrics and in Server-Timing headers
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+    # Fingerprinted static files: built at startup, or by `python -m app.assets` when 0
+    app.config['ASSET_BUILD'] = os.environ.get('ASSET_BUILD', '1') == '1'
+    app.config['ASSET_BUILD_DIR'] = os.environ.get('ASSET_BUILD_DIR', os.path.join(app.instance_path, 'assets'))
+    # JSON responses at least this large are gzip/brotli compressed
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # bytes
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+    app.config['COMPRESS_BROTLI_QUALITY'] = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+    # Rendered print view fragments kept per process
+    app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('FRAGMENT_CACHE_SIZE', 256))
+    # Completed tasks due more than this many days ago move to the archive (0 = never)
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get('ARCHIVE_BATCH_SIZE', 1000))
+    # Keep the archive in another database; by default it's a table in the main one
+    app.config['ARCHIVE_DATABASE_URL'] = os.environ.get('ARCHIVE_DATABASE_URL', '')
+    # Rows inserted per transaction by the .ics import
+    app.config['IMPORT_BATCH_SIZE'] = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    # Explicit settings take precedence over the environment
+    if config:
+        app.config.update(config)
+    
+    # Pool sizing for server databases; SQLite pragmas and the archive bind
+    # are set up in init_engine()
+    from app.database import engine_options, init_engine
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app)
+    if app.config['ARCHIVE_DATABASE_URL']:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})['archive'] = app.config['ARCHIVE_DATABASE_URL']
     
     # Initialize extensions
     db.init_app(app)
@@ -25,11 +85,34 @@ def create_app():
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
     
+    # Keep data versions (ETags) and the change log in step with every write
+    from app.versioning import init_versioning
+    init_versioning()
+    from app.changes import init_change_log
+    init_change_log()
+    
+    # Hashed static URLs for templates and the service worker
+    from app.assets import init_assets
+    init_assets(app)
+    
     # Create tables
     with app.app_context():
+        init_engine(app)
+        if app.config['METRICS_ENABLED']:
+            from app.metrics import init_metrics
+            init_metrics(app)
+        from app.compression import init_compression
+        init_compression(app)
         db.create_all()
+        # Columns, indexes and constraints added since a table was created
+        from app.schema import upgrade_schema
+        upgrade_schema()
+        # Full-text indexes over tasks and templates, maintained by the database
+        from app.search import init_search
+        init_search(app)
         # Initialize scheduler for recurring tasks
-        from app.scheduler import init_scheduler
-        init_scheduler(app)
+        if app.config['SCHEDULER_ENABLED']:
+            from app.scheduler import init_scheduler
+            init_scheduler(app)
     
     return app
@@ -0,0 +1,192 @@
+from datetime import date, timedelta
+from flask import current_app
+from app import db
+from app.models import ARCHIVED_TASK_COLUMNS, ArchivedTask, INHERITED_FIELDS, Task, TaskTemplate, TASK_COLUMNS
+
+# Columns copied between the hot and archive tables (TASK_COLUMNS order)
+_FIELDS = [column.key for column in TASK_COLUMNS]
+# Archived for a task with no title of its own or from a template (its
+# template was deleted without the title being copied to it)
+UNTITLED = '(untitled)'
+# Task rows to archive: the fields as read, then whether each inherited field
+# is NULL on the task
+_ARCHIVING_COLUMNS = TASK_COLUMNS + tuple(getattr(Task, field).is_(None) for field in INHERITED_FIELDS)
+# Archived rows to restore
+_RESTORING_COLUMNS = ARCHIVED_TASK_COLUMNS + (ArchivedTask.inherited_fields,)
+
+
+def archive_cutoff():
+    """Tasks due before this day may be archived, None if archiving is off.
+    
+    Reads covering days before the cutoff also query the archive; later
+    ranges only touch the hot table.
+    """
+    days = current_app.config['ARCHIVE_AFTER_DAYS']
+    if days <= 0:
+        return None
+    return date.today() - timedelta(days=days)
+
+
+def reaches_archive(first_day):
+    """Whether a read starting at first_day (None = unbounded) may need archived rows"""
+    cutoff = archive_cutoff()
+    return cutoff is not None and (first_day is None or first_day < cutoff)
+
+
+def archived_rows(first_day, last_day):
+    """ARCHIVED_TASK_COLUMNS rows due in [first_day, last_day], ordered like the hot reads"""
+    return db.session.execute(
+        db.select(*ARCHIVED_TASK_COLUMNS)
+        .where(ArchivedTask.due_date >= first_day, ArchivedTask.due_date <= last_day)
+        .order_by(ArchivedTask.due_date, ArchivedTask.due_time, ArchivedTask.priority)
+    ).all()
+
+
+def archived_keys(first_day, last_day, template_ids=None):
+    """(template_id, due_date) slots archived in [first_day, last_day], so
+    their occurrences aren't shown or generated again
+    """
+    if not reaches_archive(first_day):
+        return set()
+    query = db.select(ArchivedTask.template_id, ArchivedTask.due_date).where(
+        ArchivedTask.template_id.isnot(None),
+        ArchivedTask.due_date >= first_day,
+        ArchivedTask.due_date <= last_day
+    )
+    if template_ids is not None:
+        query = query.where(ArchivedTask.template_id.in_(template_ids))
+    return {(template_id, due_date) for template_id, due_date in db.session.execute(query)}
+
+
+def get_archived_task(task_id):
+    """Task dict of an archived task, or None"""
+    row = db.session.execute(
+        db.select(*ARCHIVED_TASK_COLUMNS).where(ArchivedTask.id == task_id)
+    ).first()
+    return Task.row_to_dict(row) if row is not None else None
+
+
+def _separate_database():
+    """Whether the archive lives outside the main database (ARCHIVE_DATABASE_URL)"""
+    return db.engines['archive'] is not db.engine
+
+
+def _archived_values(row):
+    """ArchivedTask insert values for a _ARCHIVING_COLUMNS row"""
+    values = dict(zip(_FIELDS, row))
+    inherited = [field for field, is_null in zip(INHERITED_FIELDS, row[len(_FIELDS):])
+                 if is_null and values['template_id'] is not None]
+    values['inherited_fields'] = ','.join(inherited) or None
+    if values['title'] is None:
+        values['title'] = UNTITLED
+    return values
+
+
+def _restored_values(rows):
+    """Task insert values for _RESTORING_COLUMNS rows.
+    
+    Inherited fields are NULL again, so the tasks follow later template
+    edits; tasks whose template is gone keep the archived values.
+    """
+    template_ids = {row.template_id for row in rows if row.inherited_fields}
+    existing = set(db.session.scalars(
+        db.select(TaskTemplate.id).where(TaskTemplate.id.in_(template_ids))
+    )) if template_ids else set()
+    restored = []
+    for row in rows:
+        values = dict(zip(_FIELDS, row))
+        if row.template_id in existing:
+            values.update(dict.fromkeys(row.inherited_fields.split(',')))
+        restored.append(values)
+    return restored
+
+
+def _move(values, source, target):
+    """Move rows, given as insert values for target, from one table to the other.
+    
+    In the main database this is one transaction, left for the caller to
+    commit. With a separate archive database the copy is committed before the
+    delete, so a crash in between leaves the row in both tables rather than
+    losing it; both steps commit here, and the next move overwrites the
+    leftover copy. Task ids are never reused (AUTOINCREMENT on SQLite), so a
+    target row with a moved row's id can only be such a copy.
+    """
+    ids = [row['id'] for row in values]
+    # Core statements: moving rows isn't a data change for ETags or the change log
+    db.session.execute(target.__table__.delete().where(target.id.in_(ids)))
+    db.session.execute(target.__table__.insert(), values)
+    if _separate_database():
+        db.session.commit()
+    db.session.execute(source.__table__.delete().where(source.id.in_(ids)))
+    if _separate_database():
+        db.session.commit()
+
+
+def archive_completed_tasks(batch_size=None):
+    """Move completed tasks due before the cutoff to the archive, in batches.
+    
+    Each batch is its own transaction. Archived rows the cutoff no longer
+    covers, because ARCHIVE_AFTER_DAYS was raised or set to 0, are moved back
+    first. Returns the number of tasks archived.
+    """
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = archive_cutoff()
+    
+    stale = ArchivedTask.due_date >= cutoff if cutoff is not None else db.true()
+    while True:
+        rows = db.session.execute(
+            db.select(*_RESTORING_COLUMNS).where(stale).order_by(ArchivedTask.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        _move(_restored_values(rows), ArchivedTask, Task)
+        db.session.commit()
+    if cutoff is None:
+        return 0
+    
+    archived = 0
+    while True:
+        rows = db.session.execute(
+            db.select(*_ARCHIVING_COLUMNS)
+            .where(
+                Task.is_completed.is_(True),
+                Task.is_skipped.is_(False),
+                Task.due_date < cutoff
+            )
+            .order_by(Task.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        _move([_archived_values(row) for row in rows], Task, ArchivedTask)
+        db.session.commit()
+        archived += len(rows)
+    return archived
+
+
+def restore_archived_task(task_id):
+    """Move an archived task back to the hot table so it can be edited.
+    
+    Part of the caller's transaction unless the archive is a separate
+    database. Returns the Task, or None if no archived task has this id.
+    """
+    row = db.session.execute(
+        db.select(*_RESTORING_COLUMNS).where(ArchivedTask.id == task_id)
+    ).first()
+    if row is None:
+        return None
+    _move(_restored_values([row]), ArchivedTask, Task)
+    return db.session.get(Task, task_id)
+
+
+def restore_archived_slot(template_id, due_date):
+    """Restore the archived occurrence of a template on a day, if there is one"""
+    task_id = db.session.scalar(
+        db.select(ArchivedTask.id).where(
+            ArchivedTask.template_id == template_id,
+            ArchivedTask.due_date == due_date
+        )
+    )
+    if task_id is None:
+        return None
+    return restore_archived_task(task_id)
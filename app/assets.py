@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+try:
+    import brotli
+except ImportError:  # Optional, .br files are skipped without it
+    brotli = None
+from flask import current_app, request, send_from_directory, url_for
+
+MANIFEST_NAME = 'manifest.json'
+# Hashed files never change, so clients may keep them for a year without revalidating
+IMMUTABLE_MAX_AGE = 31536000
+# Only text formats benefit from compression
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+def _hashed_name(path, digest):
+    root, ext = os.path.splitext(path)
+    return f'{root}.{digest[:12]}{ext}'
+
+
+def _write(path, data):
+    """Write atomically, so workers building at the same time never serve half a file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _compressible(path):
+    mimetype = mimetypes.guess_type(path)[0] or ''
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def build_assets(static_folder, build_dir):
+    """Copy every static file to a content-hashed name plus .gz and .br siblings.
+    
+    Returns the manifest, which maps static paths (as passed to url_for) to
+    hashed paths, and also writes it to build_dir. Unchanged files are left
+    alone, so rebuilding is cheap.
+    """
+    manifest = {}
+    for directory, _, filenames in os.walk(static_folder):
+        for filename in sorted(filenames):
+            source = os.path.join(directory, filename)
+            path = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            hashed = _hashed_name(path, hashlib.sha256(data).hexdigest())
+            manifest[path] = hashed
+            
+            target = os.path.join(build_dir, hashed)
+            if os.path.exists(target):
+                continue
+            if _compressible(path):
+                _write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write(target + '.br', brotli.compress(data, quality=11))
+            # The plain file last: its presence marks the build of this hash done
+            _write(target, data)
+    
+    _write(os.path.join(build_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def load_manifest(build_dir):
+    try:
+        with open(os.path.join(build_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(path):
+    """URL of a static file; the hashed, long-cached copy once assets are built"""
+    hashed = current_app.extensions['assets'].get(path)
+    if hashed is None:
+        return url_for('static', filename=path)
+    return url_for('assets', filename=hashed)
+
+
+def assets_version():
+    """Short hash over all hashed asset names, e.g. for the service worker cache"""
+    manifest = current_app.extensions['assets']
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def serve_asset(filename):
+    """Serve a hashed asset, precompressed when the client accepts it"""
+    build_dir = current_app.config['ASSET_BUILD_DIR']
+    if filename not in current_app.extensions['asset_files']:
+        return current_app.response_class(status=404)
+    
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    accepted = request.accept_encodings
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[candidate] and os.path.exists(os.path.join(build_dir, filename + suffix)):
+            encoding = candidate
+            filename += suffix
+            break
+    
+    response = send_from_directory(build_dir, filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    """Serve fingerprinted static files at /assets and expose asset_url() to templates.
+    
+    With ASSET_BUILD enabled the files are built at startup; otherwise the
+    manifest from a previous `python -m app.assets` run is used. Without a
+    manifest, asset_url() falls back to plain /static URLs.
+    """
+    build_dir = app.config['ASSET_BUILD_DIR']
+    if app.config['ASSET_BUILD']:
+        manifest = build_assets(app.static_folder, build_dir)
+    else:
+        manifest = load_manifest(build_dir)
+    app.extensions['assets'] = manifest
+    app.extensions['asset_files'] = frozenset(manifest.values())
+    app.add_url_rule('/assets/<path:filename>', 'assets', serve_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
+
+
+if __name__ == '__main__':
+    # Build step for deployments that run with ASSET_BUILD=0
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    build_dir = os.environ.get('ASSET_BUILD_DIR', os.path.join(root, 'instance', 'assets'))
+    if len(sys.argv) > 1:
+        build_dir = sys.argv[1]
+    static_folder = os.path.join(root, 'static')
+    manifest = build_assets(static_folder, build_dir)
+    print(f'Built {len(manifest)} assets into {os.path.abspath(build_dir)}')
@@ -0,0 +1,227 @@
+import threading
+from sqlalchemy import event
+from app import db
+from app.models import ChangeLogEntry, Task, TaskTemplate, TASK_COLUMNS
+from app.occurrences import virtual_task_id
+
+# Most entries returned by one changes_since() call
+MAX_CHANGES = 500
+
+# Woken after each commit that logged changes, so streams in this process
+# don't wait for their next poll
+_changes_committed = threading.Condition()
+
+
+def _task_entry(task, action):
+    return {
+        'entity': 'task',
+        'action': action,
+        'entity_id': task.id,
+        'template_id': task.template_id,
+        'due_date': task.due_date
+    }
+
+
+# Every entry is written with all of these keys, as one executemany
+_ENTRY_KEYS = ('entity', 'action', 'entity_id', 'template_id', 'due_date')
+
+
+def _record(session, connection, entries):
+    entries = [{key: entry.get(key) for key in _ENTRY_KEYS} for entry in entries]
+    connection.execute(ChangeLogEntry.__table__.insert(), entries)
+    session.info['changes_logged'] = True
+
+
+def _after_flush(session, flush_context):
+    """Log tasks and templates written through the unit of work"""
+    entries = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        action = 'delete' if obj in session.deleted else 'upsert'
+        if isinstance(obj, Task):
+            entries.append(_task_entry(obj, action))
+        elif isinstance(obj, TaskTemplate):
+            entries.append({'entity': 'template', 'action': action, 'entity_id': obj.id})
+    if entries:
+        _record(session, session.connection(), entries)
+
+
+def _do_orm_execute(orm_execute_state):
+    """Log bulk INSERT/UPDATE/DELETE statements on tasks and templates"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update
+            or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in (Task, TaskTemplate):
+        return
+    
+    entries = []
+    if mapper.class_ is TaskTemplate:
+        entries.append({'entity': 'template', 'action': 'invalidate'})
+    else:
+        params = orm_execute_state.parameters
+        if isinstance(params, dict):
+            params = [params]
+        if orm_execute_state.is_insert and params:
+            # Generated rows are identified by their template and day until read
+            for row in params:
+                if row.get('template_id') and row.get('due_date'):
+                    entries.append({
+                        'entity': 'task',
+                        'action': 'upsert',
+                        'template_id': row['template_id'],
+                        'due_date': row['due_date']
+                    })
+                else:
+                    entries = [{'entity': 'task', 'action': 'invalidate'}]
+                    break
+        else:
+            entries.append({'entity': 'task', 'action': 'invalidate'})
+    _record(orm_execute_state.session, orm_execute_state.session.connection(), entries)
+
+
+def _after_commit(session):
+    if session.info.pop('changes_logged', False):
+        with _changes_committed:
+            _changes_committed.notify_all()
+
+
+def _after_rollback(session):
+    session.info.pop('changes_logged', None)
+
+
+def wait_for_changes(timeout):
+    """Block until this process commits logged changes or timeout elapses"""
+    with _changes_committed:
+        _changes_committed.wait(timeout)
+
+
+def latest_seq():
+    """Sequence number of the newest entry, 0 if the log is empty"""
+    return db.session.query(db.func.max(ChangeLogEntry.seq)).scalar() or 0
+
+
+def changes_since(since, limit=MAX_CHANGES):
+    """Changes after sequence number since, with the current state of each row.
+    
+    Entries for the same task or template are coalesced into the latest one.
+    When since is older than the compacted log (or newer than its end), the
+    result has reset=True and the client must refetch its view.
+    """
+    oldest, newest = db.session.query(
+        db.func.min(ChangeLogEntry.seq), db.func.max(ChangeLogEntry.seq)
+    ).one()
+    newest = newest or 0
+    if since > newest or (oldest is not None and since < oldest - 1):
+        return {'seq': newest, 'reset': True, 'more': False, 'changes': []}
+    
+    entries = ChangeLogEntry.query.filter(ChangeLogEntry.seq > since).order_by(
+        ChangeLogEntry.seq
+    ).limit(limit + 1).all()
+    more = len(entries) > limit
+    entries = entries[:limit]
+    
+    latest = {}
+    for entry in entries:
+        if entry.action == 'invalidate':
+            key = (entry.entity, 'invalidate')
+        elif entry.entity_id is not None:
+            key = (entry.entity, entry.entity_id)
+        else:
+            key = ('slot', entry.template_id, entry.due_date)
+        latest.pop(key, None)
+        latest[key] = entry
+    
+    return {
+        'seq': entries[-1].seq if entries else since,
+        'reset': False,
+        'more': more,
+        'changes': _serialize(list(latest.values()))
+    }
+
+
+def _serialize(entries):
+    task_ids = {e.entity_id for e in entries if e.entity == 'task' and e.entity_id is not None}
+    slots = {(e.template_id, e.due_date) for e in entries
+             if e.entity == 'task' and e.action == 'upsert' and e.entity_id is None}
+    template_ids = {e.entity_id for e in entries if e.entity == 'template' and e.entity_id is not None}
+    
+    rows = []
+    if task_ids:
+        rows += db.session.execute(
+            db.select(*TASK_COLUMNS, Task.is_skipped).where(Task.id.in_(task_ids))
+        ).all()
+    if slots:
+        rows += db.session.execute(
+            db.select(*TASK_COLUMNS, Task.is_skipped).where(
+                Task.template_id.in_({slot[0] for slot in slots}),
+                Task.due_date.in_({slot[1] for slot in slots})
+            )
+        ).all()
+    # row[0] is id, row[3] due_date, row[8] template_id
+    by_id = {row[0]: row for row in rows}
+    by_slot = {(row[8], row[3]): row for row in rows if row[8]}
+    templates = {}
+    if template_ids:
+        templates = {
+            t.id: t for t in TaskTemplate.query.filter(TaskTemplate.id.in_(template_ids))
+        }
+    
+    changes = []
+    for entry in entries:
+        change = {'seq': entry.seq, 'entity': entry.entity, 'action': entry.action}
+        if entry.action == 'invalidate':
+            changes.append(change)
+            continue
+        
+        if entry.entity == 'template':
+            template = templates.get(entry.entity_id)
+            change['id'] = entry.entity_id
+            if template is None:
+                change['action'] = 'delete'
+            else:
+                change['action'] = 'upsert'
+                change['template'] = template.to_dict()
+            changes.append(change)
+            continue
+        
+        if entry.entity_id is not None:
+            row = by_id.get(entry.entity_id)
+        else:
+            row = by_slot.get((entry.template_id, entry.due_date))
+            if row is None:
+                # Inserted and removed again within the window
+                continue
+        change['id'] = entry.entity_id if row is None else row[0]
+        template_id = entry.template_id if row is None else row[8]
+        due_date = entry.due_date if row is None else row[3]
+        if template_id and due_date:
+            # Placeholder the client may still show for this occurrence
+            change['virtual_id'] = virtual_task_id(template_id, due_date)
+        if row is None or row[-1]:
+            change['action'] = 'delete'
+        else:
+            change['action'] = 'upsert'
+            change['task'] = Task.row_to_dict(row)
+        changes.append(change)
+    return changes
+
+
+def compact_change_log(keep):
+    """Drop all but the newest keep entries, returns the number deleted"""
+    cutoff = latest_seq() - keep
+    if cutoff <= 0:
+        return 0
+    deleted = ChangeLogEntry.query.filter(ChangeLogEntry.seq <= cutoff).delete()
+    db.session.commit()
+    return deleted
+
+
+def init_change_log():
+    """Register the session events that fill the change log"""
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
@@ -0,0 +1,39 @@
+import gzip
+try:
+    import brotli
+except ImportError:  # Optional, gzip only without it
+    brotli = None
+from flask import current_app, request
+
+# Streamed responses (NDJSON, SSE) are passed through untouched
+COMPRESSED_MIMETYPES = ('application/json',)
+
+
+def _compress_response(response):
+    if (response.is_streamed or response.direct_passthrough
+            or response.status_code in (204, 206, 304)
+            or response.mimetype not in COMPRESSED_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(data, quality=current_app.config['COMPRESS_BROTLI_QUALITY']))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=current_app.config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def init_compression(app):
+    """Compress JSON responses of at least COMPRESS_MIN_SIZE bytes for clients that accept it.
+    
+    Registered after the metrics hooks, so response size metrics and
+    Server-Timing cover the compressed body.
+    """
+    app.after_request(_compress_response)
@@ -0,0 +1,164 @@
+from calendar import monthrange
+from datetime import date, datetime
+from functools import lru_cache
+from croniter import croniter
+
+
+class CompiledCron:
+    """Cron expression compiled into field bitsets for bulk range expansion.
+    
+    Fields are expanded by croniter itself, so parsing rules (aliases, names,
+    steps such as '1/2', 'L') are exactly croniter's; only the iteration is
+    replaced. Bit n of each mask is set when value n matches.
+    """
+    
+    __slots__ = ('days', 'last_day', 'months', 'weekdays', 'times',
+                 'day_or', 'dom_restricted', 'dow_restricted', '_weekday_masks')
+    
+    def __init__(self, expanded):
+        minutes, hours, days, months, weekdays = expanded
+        
+        self.times = [(h, m) for h in _values(hours, 0, 23) for m in _values(minutes, 0, 59)]
+        self.last_day = 'l' in days
+        self.days = _mask(v for v in _values(days, 1, 31) if v != 'l')
+        self.months = _mask(_values(months, 1, 12))
+        # croniter accepts 7 as an alias for Sunday
+        self.weekdays = _mask(v % 7 for v in _values(weekdays, 0, 6))
+        self.dom_restricted = days[0] != '*'
+        self.dow_restricted = weekdays[0] != '*'
+        # Like cron, a restricted day-of-month OR a restricted day-of-week matches
+        self.day_or = self.dom_restricted and self.dow_restricted
+        self._weekday_masks = {}
+    
+    def month_days(self, year, month):
+        """Bitset of matching days (bit 1 = day 1) in the given month"""
+        if not (self.months >> month) & 1:
+            return 0
+        first_weekday, length = monthrange(year, month)
+        all_days = (1 << (length + 1)) - 2
+        
+        dom = self.days & all_days
+        if self.last_day:
+            dom |= 1 << length
+        # monthrange() counts Monday as 0, cron counts Sunday as 0
+        dow = self._weekday_mask((first_weekday + 1) % 7, length)
+        
+        if self.day_or:
+            return dom | dow
+        if self.dom_restricted:
+            return dom
+        if self.dow_restricted:
+            return dow
+        return all_days
+    
+    def _weekday_mask(self, first_weekday, length):
+        key = (first_weekday, length)
+        mask = self._weekday_masks.get(key)
+        if mask is None:
+            mask = 0
+            for day in range(1, length + 1):
+                if (self.weekdays >> ((first_weekday + day - 1) % 7)) & 1:
+                    mask |= 1 << day
+            self._weekday_masks[key] = mask
+        return mask
+    
+    def occurrences(self, start, end):
+        """All matching times t with start < t <= end, like repeated get_next()"""
+        result = []
+        if start >= end or not self.times:
+            return result
+        
+        year, month = start.year, start.month
+        first_day, last_day = start.date(), end.date()
+        while (year, month) <= (last_day.year, last_day.month):
+            days = self.month_days(year, month)
+            day = 1
+            while days:
+                days >>= 1
+                if days & 1:
+                    current = date(year, month, day)
+                    if first_day <= current <= last_day:
+                        stamps = [datetime(year, month, day, h, m) for h, m in self.times]
+                        if current == first_day or current == last_day:
+                            stamps = [t for t in stamps if start < t <= end]
+                        result.extend(stamps)
+                day += 1
+            month += 1
+            if month > 12:
+                year, month = year + 1, 1
+        return result
+
+
+def _values(field, low, high):
+    """Expand a croniter field list, where '*' means the whole range"""
+    if field[0] == '*':
+        return range(low, high + 1)
+    return field
+
+
+def _mask(values):
+    mask = 0
+    for value in values:
+        mask |= 1 << value
+    return mask
+
+
+@lru_cache(maxsize=512)
+def compile_cron(cron_expr):
+    """Compile a cron expression, or return None if it needs croniter's iterator.
+    
+    Raises the same errors as croniter for invalid expressions.
+    """
+    cron = croniter(cron_expr, datetime(2000, 1, 1))
+    # Seconds/year fields, nth weekday ('1#2') and nearest weekday ('15W')
+    # stay on the slow path
+    if len(cron.expanded) != 5 or cron.nth_weekday_of_month:
+        return None
+    if getattr(cron, 'nearest_weekday', None):
+        return None
+    if any(not isinstance(v, int) for v in cron.expanded[4] if v != '*'):
+        return None
+    return CompiledCron(cron.expanded)
+
+
+def get_occurrences(cron_expr, start, end):
+    """All occurrences of a cron expression with start < t <= end"""
+    compiled = compile_cron(cron_expr)
+    if compiled is not None:
+        return compiled.occurrences(start, end)
+    
+    occurrences = []
+    cron = croniter(cron_expr, start)
+    while True:
+        next_time = cron.get_next(datetime)
+        if next_time > end:
+            break
+        occurrences.append(next_time)
+    return occurrences
+
+
+def template_occurrences(cron_expr, template_start, template_end, start_date, end_date):
+    """Occurrences in (start_date, end_date], clipped to a template's own
+    start/end dates. Invalid expressions yield no occurrences.
+    """
+    occurrences = []
+    
+    # Adjust range based on template's start/end dates
+    effective_start = start_date
+    effective_end = end_date
+    
+    if template_start:
+        effective_start = max(start_date, datetime.combine(template_start, datetime.min.time()))
+    
+    if template_end:
+        effective_end = min(end_date, datetime.combine(template_end, datetime.max.time()))
+    
+    # If the effective range is invalid, return empty
+    if effective_start > effective_end:
+        return occurrences
+    
+    try:
+        occurrences = get_occurrences(cron_expr, effective_start, effective_end)
+    except (ValueError, KeyError):
+        pass
+    return occurrences
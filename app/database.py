@@ -0,0 +1,61 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def engine_options(app):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database.
+    
+    Server databases get a sized, pre-pinged connection pool. SQLite keeps
+    SQLAlchemy's default pool and is tuned with pragmas instead.
+    """
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'pool_size': app.config['DATABASE_POOL_SIZE'],
+        'max_overflow': app.config['DATABASE_MAX_OVERFLOW'],
+        'pool_pre_ping': app.config['DATABASE_POOL_PRE_PING'],
+        'pool_recycle': app.config['DATABASE_POOL_RECYCLE']
+    }
+
+
+def sqlite_pragmas(app):
+    """PRAGMA statements run on every new SQLite connection, in order"""
+    settings = (
+        # WAL lets readers run while the scheduler writes
+        ('journal_mode', app.config['SQLITE_JOURNAL_MODE']),
+        # Wait for the write lock instead of failing with 'database is locked'
+        ('busy_timeout', app.config['SQLITE_BUSY_TIMEOUT']),
+        ('synchronous', app.config['SQLITE_SYNCHRONOUS']),
+        ('mmap_size', app.config['SQLITE_MMAP_SIZE']),
+        ('cache_size', app.config['SQLITE_CACHE_SIZE'])
+    )
+    return [f'PRAGMA {name} = {value}' for name, value in settings if value not in (None, '')]
+
+
+def init_engine(app):
+    """Set up the archive bind and apply the SQLite pragmas to each connection.
+    
+    Without ARCHIVE_DATABASE_URL the archive bind shares the main engine, so
+    archived_tasks lives in the main database and moving rows between it and
+    tasks is a single transaction. Must run in an app context before the
+    first connection is opened.
+    """
+    from app import db
+    
+    if 'archive' not in db.engines:
+        db.engines['archive'] = db.engine
+    
+    pragmas = sqlite_pragmas(app)
+    
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+    
+    for engine in set(db.engines.values()):
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', set_sqlite_pragmas)
@@ -0,0 +1,47 @@
+from collections import OrderedDict
+import threading
+from flask import current_app
+from markupsafe import Markup
+from app import metrics
+
+
+class FragmentCache:
+    """Rendered HTML fragments per period, in LRU order.
+    
+    Each entry remembers the data version it was rendered from; a lookup
+    with a newer version re-renders and replaces it, so a write to a period
+    invalidates only that period's fragments.
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_or_render(self, key, version, render):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                metrics.FRAGMENT_CACHE.labels(result='hit').inc()
+                return entry[1]
+        
+        # Render outside the lock; concurrent misses may both render
+        html = Markup(render())
+        metrics.FRAGMENT_CACHE.labels(result='miss').inc()
+        with self._lock:
+            self._entries[key] = (version, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+
+def fragment_cache():
+    """The current app's fragment cache (one per process)"""
+    cache = current_app.extensions.get('fragment_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            'fragment_cache', FragmentCache(current_app.config['FRAGMENT_CACHE_SIZE'])
+        )
+    return cache
@@ -0,0 +1,586 @@
+from datetime import date, datetime, time, timedelta, timezone
+import re
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9: TZID values are read as floating times
+    ZoneInfo = None
+from croniter import croniter
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.cron import compile_cron
+from app.models import ARCHIVED_TASK_COLUMNS, INHERITED_FIELDS, Task, TaskTemplate, TASK_COLUMNS
+from app.occurrences import template_day_occurrences, virtual_task_id
+
+PRODID = '-//Task Calendar//Task Calendar//EN'
+# Cron weekday numbers (0 = Sunday) to iCalendar BYDAY codes
+WEEKDAYS = ('SU', 'MO', 'TU', 'WE', 'TH', 'FR', 'SA')
+# Task priority (1=High, 2=Medium, 3=Low) to iCalendar PRIORITY (1 = highest)
+PRIORITY_TO_ICAL = {1: 1, 2: 5, 3: 9}
+EXPORT_BATCH_SIZE = 500
+# Import errors reported back, the rest are only counted
+MAX_IMPORT_ERRORS = 20
+
+
+# --- Text encoding (RFC 5545 3.1 and 3.3.11) ---
+
+def escape_text(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def unescape_text(value):
+    return re.sub(r'\\([\\;,nN])', lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+def fold(line):
+    """Content line folded at 75 octets, CRLF terminated"""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while data:
+        # Don't split inside a UTF-8 sequence
+        cut = min(limit, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+        limit = 74  # continuation lines start with a space
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _format_date(value):
+    return value.strftime('%Y%m%d')
+
+
+def _format_datetime(value):
+    """Floating local time, like the naive datetimes the app stores"""
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def _format_utc(value):
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+# --- Cron <-> RRULE ---
+
+def cron_to_rrule(cron_expr):
+    """(RRULE value, first time of day) for a cron expression, or None.
+    
+    Tasks are generated once per day at the first matching time, so the
+    rule describes days only and the time goes into DTSTART. Expressions
+    that match on day-of-month OR day-of-week, or that need croniter's
+    iterator (nth weekday, 'W', seconds), have no single-rule equivalent.
+    """
+    try:
+        compiled = compile_cron(cron_expr)
+    except (ValueError, KeyError):
+        return None
+    if compiled is None or compiled.day_or or not compiled.times:
+        return None
+    
+    if compiled.dom_restricted:
+        days = [str(day) for day in range(1, 32) if (compiled.days >> day) & 1]
+        if compiled.last_day:
+            days.append('-1')
+        if not days:
+            return None
+        parts = ['FREQ=MONTHLY', 'BYMONTHDAY=' + ','.join(days)]
+    elif compiled.dow_restricted:
+        weekdays = [WEEKDAYS[day] for day in range(7) if (compiled.weekdays >> day) & 1]
+        parts = ['FREQ=WEEKLY', 'BYDAY=' + ','.join(weekdays)]
+    else:
+        parts = ['FREQ=DAILY']
+    months = [str(month) for month in range(1, 13) if (compiled.months >> month) & 1]
+    if len(months) < 12:
+        parts.append('BYMONTH=' + ','.join(months))
+    return ';'.join(parts), time(*min(compiled.times))
+
+
+def rrule_to_cron(rrule, dtstart):
+    """(cron expression, end date or None) for an RRULE starting at dtstart.
+    
+    Supports DAILY, WEEKLY, MONTHLY and YEARLY rules without INTERVAL, with
+    plain BYDAY, BYMONTHDAY (-1 = last day) and BYMONTH lists, UNTIL and
+    COUNT. Raises ValueError for anything cron can't express.
+    """
+    rule = {}
+    for part in rrule.upper().split(';'):
+        if '=' in part:
+            key, value = part.split('=', 1)
+            rule[key] = value
+    freq = rule.pop('FREQ', None)
+    if rule.pop('INTERVAL', '1') != '1':
+        raise ValueError('RRULE INTERVAL is not supported')
+    rule.pop('WKST', None)
+    until, count = rule.pop('UNTIL', None), rule.pop('COUNT', None)
+    byday, bymonthday, bymonth = rule.pop('BYDAY', None), rule.pop('BYMONTHDAY', None), rule.pop('BYMONTH', None)
+    if rule:
+        raise ValueError(f"RRULE {', '.join(sorted(rule))} is not supported")
+    
+    dom, dow, month = '*', '*', bymonth or '*'
+    if byday:
+        codes = byday.split(',')
+        if any(code not in WEEKDAYS for code in codes):
+            raise ValueError('RRULE BYDAY with positions is not supported')
+        dow = ','.join(str(WEEKDAYS.index(code)) for code in codes)
+    if bymonthday:
+        values = []
+        for value in bymonthday.split(','):
+            if value == '-1':
+                values.append('L')
+            elif value.isdigit() and 1 <= int(value) <= 31:
+                values.append(value)
+            else:
+                raise ValueError('RRULE BYMONTHDAY must be 1-31 or -1')
+        dom = ','.join(values)
+    if byday and bymonthday:
+        # cron ORs restricted day fields where RRULE ANDs them
+        raise ValueError('RRULE with both BYDAY and BYMONTHDAY is not supported')
+    
+    if freq == 'DAILY':
+        pass
+    elif freq == 'WEEKLY':
+        if not byday:
+            dow = str((dtstart.weekday() + 1) % 7)
+    elif freq == 'MONTHLY':
+        if not byday and not bymonthday:
+            dom = str(dtstart.day)
+    elif freq == 'YEARLY':
+        if not byday and not bymonthday:
+            dom = str(dtstart.day)
+        if not bymonth:
+            month = str(dtstart.month)
+    else:
+        raise ValueError(f'RRULE FREQ={freq} is not supported')
+    
+    cron_expr = f'{dtstart.minute} {dtstart.hour} {dom} {month} {dow}'
+    end_date = None
+    if until:
+        end_date = _split_when(_parse_value(until, {}))[0]
+    elif count:
+        # The date of the COUNT-th occurrence, counting dtstart itself
+        cron = croniter(cron_expr, dtstart - timedelta(seconds=1))
+        for _ in range(int(count)):
+            end_date = cron.get_next(datetime).date()
+    return cron_expr, end_date
+
+
+# --- Export ---
+
+def _component_lines(component, uid, stamp, title, description, due_date, due_time,
+                     priority, is_completed=False, completed_at=None, extra=()):
+    lines = [f'BEGIN:{component}', f'UID:{uid}', f'DTSTAMP:{stamp}']
+    lines.extend(extra)
+    if due_time is None:
+        lines.append(f'DTSTART;VALUE=DATE:{_format_date(due_date)}')
+        if component == 'VTODO':
+            lines.append(f'DUE;VALUE=DATE:{_format_date(due_date)}')
+    else:
+        value = _format_datetime(datetime.combine(due_date, due_time))
+        lines.append(f'DTSTART:{value}')
+        if component == 'VTODO':
+            lines.append(f'DUE:{value}')
+    lines.append(f'SUMMARY:{escape_text(title or "")}')
+    if description:
+        lines.append(f'DESCRIPTION:{escape_text(description)}')
+    if priority in PRIORITY_TO_ICAL:
+        lines.append(f'PRIORITY:{PRIORITY_TO_ICAL[priority]}')
+    if component == 'VTODO':
+        lines.append('STATUS:COMPLETED' if is_completed else 'STATUS:NEEDS-ACTION')
+        if completed_at:
+            lines.append(f'COMPLETED:{_format_utc(completed_at)}')
+    lines.append(f'END:{component}')
+    return ''.join(fold(line) for line in lines)
+
+
+def load_series():
+    """Active templates whose schedule is expressible as an RRULE.
+    
+    Returns ({template_id: (template, compiled cron, rrule, time of day)},
+    [templates that have to be expanded]).
+    """
+    series = {}
+    expanded = []
+    for template in TaskTemplate.query.filter(TaskTemplate.is_active.is_(True)).order_by(TaskTemplate.id):
+        rule = cron_to_rrule(template.cron_schedule)
+        if rule is None:
+            expanded.append(template)
+        else:
+            series[template.id] = (template, compile_cron(template.cron_schedule)) + rule
+    return series, expanded
+
+
+def _scheduled_day(template, compiled, day):
+    if template.start_date and day < template.start_date:
+        return False
+    if template.end_date and day > template.end_date:
+        return False
+    return bool((compiled.month_days(day.year, day.month) >> day.day) & 1)
+
+
+def export_calendar(component, host, first_day=None, last_day=None, window=None, series=None):
+    """Yield an iCalendar document in chunks.
+    
+    Active templates with an RRULE equivalent become one recurring
+    component. Their stored occurrences are only written when they differ
+    from the schedule (as RECURRENCE-ID overrides), and deleted occurrences
+    become EXDATEs. Other templates are expanded over window (first_day,
+    last_day) pairs. Stored and archived tasks are read in batches from a
+    streaming cursor, optionally limited to [first_day, last_day]. series is
+    the load_series() result, loaded here unless the caller already has it.
+    """
+    stamp = _format_utc(datetime.now(timezone.utc))
+    yield ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN'
+    ))
+    
+    series, expanded = series or load_series()
+    
+    # Deleted occurrences (tombstones) of the recurring series
+    exdates = {}
+    if series:
+        for template_id, due_date in db.session.execute(
+            db.select(Task.template_id, Task.due_date)
+            .where(Task.is_skipped.is_(True), Task.template_id.in_(series))
+        ):
+            exdates.setdefault(template_id, []).append(due_date)
+    
+    for template_id, (template, compiled, rrule, start_time) in series.items():
+        anchor = template.start_date or (template.created_at or datetime.utcnow()).date()
+        dtstart = template.get_next_occurrence(datetime.combine(anchor, time.min) - timedelta(microseconds=1))
+        if dtstart is None or (template.end_date and dtstart.date() > template.end_date):
+            continue
+        if template.end_date:
+            rrule += f';UNTIL={_format_datetime(datetime.combine(template.end_date, time(23, 59, 59)))}'
+        extra = [f'RRULE:{rrule}']
+        for day in sorted(exdates.get(template_id, ())):
+            extra.append(f'EXDATE:{_format_datetime(datetime.combine(day, start_time))}')
+        yield _component_lines(
+            component, f'template-{template_id}@{host}', stamp, template.title, template.description,
+            dtstart.date(), dtstart.time(), template.priority, extra=extra
+        )
+    
+    for columns, criteria in ((TASK_COLUMNS, (Task.is_skipped.is_(False),)), (ARCHIVED_TASK_COLUMNS, ())):
+        due_date = columns[3]
+        query = db.select(*columns).where(*criteria)
+        if first_day:
+            query = query.where(due_date >= first_day)
+        if last_day:
+            query = query.where(due_date <= last_day)
+        rows = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for batch in rows.partitions():
+            chunk = []
+            for (task_id, title, description, due_day, due_time, is_completed,
+                 completed_at, priority, template_id, created_at, updated_at) in batch:
+                entry = series.get(template_id)
+                if entry is not None and _scheduled_day(entry[0], entry[1], due_day):
+                    template, _, _, start_time = entry
+                    if (not is_completed and due_time == start_time and title == template.title
+                            and description == template.description and priority == template.priority):
+                        continue  # Covered by the RRULE
+                    recurrence_id = _format_datetime(datetime.combine(due_day, start_time))
+                    chunk.append(_component_lines(
+                        component, f'template-{template_id}@{host}', stamp, title, description,
+                        due_day, due_time, priority, is_completed, completed_at,
+                        extra=[f'RECURRENCE-ID:{recurrence_id}']
+                    ))
+                    continue
+                extra = [f'RELATED-TO:template-{template_id}@{host}'] if template_id else []
+                chunk.append(_component_lines(
+                    component, f'task-{task_id}@{host}', stamp, title, description,
+                    due_day, due_time, priority, is_completed, completed_at, extra=extra
+                ))
+            yield ''.join(chunk)
+    
+    if expanded and window:
+        window_first, window_last = window
+        stored = {(template_id, due_date) for template_id, due_date in db.session.execute(
+            db.select(Task.template_id, Task.due_date).where(
+                Task.template_id.in_([template.id for template in expanded]),
+                Task.due_date >= window_first,
+                Task.due_date <= window_last
+            )
+        )}
+        for template in expanded:
+            chunk = []
+            seen = set()
+            for occurrence in template_day_occurrences(template, window_first, window_last):
+                key = (template.id, occurrence.date())
+                if key in stored or key in seen:
+                    continue
+                seen.add(key)
+                chunk.append(_component_lines(
+                    component, f'{virtual_task_id(template.id, occurrence.date())}@{host}', stamp,
+                    template.title, template.description, occurrence.date(), occurrence.time(),
+                    template.priority, extra=[f'RELATED-TO:template-{template.id}@{host}']
+                ))
+            yield ''.join(chunk)
+    
+    yield fold('END:VCALENDAR')
+
+
+# --- Import ---
+
+def _read_lines(stream, chunk_size=65536):
+    """Physical lines of a binary stream, read in chunks (request streams read
+    byte by byte when iterated)"""
+    rest = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+
+def unfolded_lines(stream):
+    """Logical content lines from a binary stream, read incrementally"""
+    pending = None
+    for raw in _read_lines(stream):
+        line = raw.decode('utf-8', errors='replace').rstrip('\r')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending:
+            yield pending
+        pending = line
+    if pending:
+        yield pending
+
+
+def parse_line(line):
+    """(NAME, {PARAM: value}, value) for a content line"""
+    in_quotes = False
+    for index, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ':' and not in_quotes:
+            head, value = line[:index], line[index + 1:]
+            break
+    else:
+        raise ValueError(f'Malformed line: {line[:40]}')
+    name, *raw_params = head.split(';')
+    params = {}
+    for param in raw_params:
+        key, _, param_value = param.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def _parse_value(value, params):
+    """date for VALUE=DATE, else a naive local datetime"""
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.strptime(value[:8], '%Y%m%d').date()
+    parsed = datetime.strptime(value.rstrip('Z')[:15], '%Y%m%dT%H%M%S')
+    if value.endswith('Z'):
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    elif params.get('TZID') and ZoneInfo is not None:
+        try:
+            parsed = parsed.replace(tzinfo=ZoneInfo(params['TZID']))
+        except (KeyError, ValueError):
+            pass  # Unknown zone, keep the floating time
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _parse_utc(value):
+    """COMPLETED is always UTC; completed_at is stored as naive UTC"""
+    return datetime.strptime(value.strip().rstrip('Z')[:15], '%Y%m%dT%H%M%S')
+
+
+def _split_when(value):
+    """(due_date, due_time) from a parsed DATE or DATE-TIME"""
+    if isinstance(value, datetime):
+        return value.date(), value.time()
+    return value, None
+
+
+def _priority(value):
+    try:
+        priority = int(value)
+    except (TypeError, ValueError):
+        return 2
+    if priority == 0:
+        return 2
+    return 1 if priority <= 4 else 2 if priority == 5 else 3
+
+
+class CalendarImport:
+    """Incremental import: components are turned into rows as they are parsed
+    and inserted batch_size rows per transaction.
+    
+    Memory stays flat for tasks; only the UIDs and occurrence days of
+    recurring series are remembered, to attach their overrides. A batch
+    that violates a constraint (e.g. an occurrence written concurrently) is
+    rolled back and retried row by row; failing rows are reported as errors.
+    """
+    
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.rows = []
+        self.series = {}  # UID -> TaskTemplate
+        self.series_days = set()  # (template_id, due_date) already written
+        self.counts = {'tasks': 0, 'templates': 0, 'skipped': 0}
+        self.errors = []
+        self.line = None  # line of the component being added
+    
+    def run(self, lines):
+        stack = []
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                name, params, value = parse_line(line)
+            except ValueError as e:
+                self._error(number, e)
+                continue
+            if name == 'BEGIN':
+                stack.append((value.upper(), {}))
+            elif name == 'END':
+                if not stack:
+                    continue
+                component, props = stack.pop()
+                if component in ('VTODO', 'VEVENT') and (not stack or stack[-1][0] == 'VCALENDAR'):
+                    self.line = number
+                    try:
+                        self._add(props)
+                    except (KeyError, ValueError) as e:
+                        self._error(number, e)
+            elif stack:
+                stack[-1][1].setdefault(name, []).append((params, value))
+        self._flush()
+        return dict(self.counts, errors=self.errors)
+    
+    def _error(self, line_number, error):
+        self.counts['skipped'] += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append({'line': line_number, 'error': str(error)})
+    
+    def _add(self, props):
+        def first(name):
+            values = props.get(name)
+            return values[0] if values else None
+        
+        when = first('DUE') or first('DTSTART')
+        if when is None:
+            raise ValueError('Component has neither DUE nor DTSTART')
+        due_date, due_time = _split_when(_parse_value(when[1], when[0]))
+        summary, description = first('SUMMARY'), first('DESCRIPTION')
+        title = unescape_text(summary[1])[:200] if summary else '(untitled)'
+        description = unescape_text(description[1]) if description else ''
+        priority = _priority(first('PRIORITY')[1] if first('PRIORITY') else None)
+        uid = first('UID')[1] if first('UID') else None
+        
+        rrule = first('RRULE')
+        if rrule is not None:
+            start = first('DTSTART') or when
+            dtstart = _parse_value(start[1], start[0])
+            if not isinstance(dtstart, datetime):
+                dtstart = datetime.combine(dtstart, time(9, 0))
+            cron_expr, end_date = rrule_to_cron(rrule[1], dtstart)
+            template = TaskTemplate(
+                title=title,
+                description=description,
+                cron_schedule=cron_expr,
+                priority=priority,
+                start_date=dtstart.date(),
+                end_date=end_date
+            )
+            template.refresh_next_occurrence()
+            db.session.add(template)
+            # Committed on its own so a failed batch doesn't take it along
+            db.session.commit()
+            self.counts['templates'] += 1
+            if uid:
+                self.series[uid] = template
+            for params, value in props.get('EXDATE', ()):
+                for item in value.split(','):
+                    day, _ = _split_when(_parse_value(item, params))
+                    self._add_row(template.id, {
+                        'due_date': day,
+                        'template_id': template.id,
+                        'is_skipped': True
+                    })
+            return
+        
+        status = first('STATUS')
+        completed = first('COMPLETED')
+        is_completed = bool(completed) or (status is not None and status[1].upper() == 'COMPLETED')
+        row = {
+            'title': title,
+            'description': description,
+            'due_date': due_date,
+            'due_time': due_time,
+            'priority': priority,
+            'is_completed': is_completed,
+            'completed_at': _parse_utc(completed[1]) if completed else None
+        }
+        template = self.series.get(uid)
+        recurrence_id = first('RECURRENCE-ID')
+        if template is not None and recurrence_id is not None:
+            # An edited occurrence of a series imported above
+            row['due_date'] = _split_when(_parse_value(recurrence_id[1], recurrence_id[0]))[0]
+            row['template_id'] = template.id
+            # Only overrides are stored, the rest is inherited
+            for field in INHERITED_FIELDS:
+                if row[field] == getattr(template, field):
+                    row[field] = None
+            self._add_row(template.id, row)
+        else:
+            self._add_row(None, row)
+    
+    def _add_row(self, template_id, row):
+        if template_id is not None:
+            key = (template_id, row['due_date'])
+            if key in self.series_days:
+                raise ValueError(f'Duplicate occurrence on {row["due_date"]}')
+            self.series_days.add(key)
+        self.rows.append((self.line, row))
+        if len(self.rows) >= self.batch_size:
+            self._flush()
+    
+    def _flush(self):
+        if self.rows:
+            # The ORM sends one executemany per run of rows with NULLs in the
+            # same columns, so group those runs together
+            self.rows.sort(key=lambda item: tuple(sorted(key for key, value in item[1].items() if value is None)))
+            inserted = [row for _, row in self.rows]
+            try:
+                db.session.execute(db.insert(Task), inserted)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                inserted = self._insert_each()
+            self.counts['tasks'] += sum(1 for row in inserted if not row.get('is_skipped'))
+            self.rows = []
+    
+    def _insert_each(self):
+        """Insert a rejected batch row by row, returns the rows inserted"""
+        inserted = []
+        for line_number, row in self.rows:
+            try:
+                db.session.execute(db.insert(Task), [row])
+                db.session.commit()
+                inserted.append(row)
+            except IntegrityError as e:
+                db.session.rollback()
+                self._error(line_number, e.orig or e)
+        return inserted
+
+
+def import_calendar(stream, batch_size):
+    """Import tasks and recurring series from an iCalendar byte stream.
+    
+    Returns counts of imported tasks and templates and of skipped
+    components, with the first MAX_IMPORT_ERRORS errors. Every batch is
+    committed, so an interrupted import keeps the batches before it; rows
+    rejected by the database are skipped and reported like parse errors.
+    """
+    return CalendarImport(batch_size).run(unfolded_lines(stream))
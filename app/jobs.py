@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import threading
+import time
+from app import db, metrics
+from app.locking import process_owner
+from app.models import GenerationJob
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def month_chunks(start, end):
+    """Split (start, end] at month boundaries into consecutive (start, end] chunks"""
+    chunks = []
+    current = start
+    while current < end:
+        if current.month == 12:
+            next_month = datetime(current.year + 1, 1, 1)
+        else:
+            next_month = datetime(current.year, current.month + 1, 1)
+        chunk_end = min(next_month, end)
+        chunks.append((current, chunk_end))
+        current = chunk_end
+    return chunks
+
+
+def create_generation_job(start_date, end_date):
+    """Queue a backfill of (start_date, end_date], committed but not yet started"""
+    job = GenerationJob(
+        start_date=start_date,
+        end_date=end_date,
+        cursor=start_date,
+        chunks_total=len(month_chunks(start_date, end_date)),
+        status='queued'
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def submit_generation_job(app, job_id):
+    """Run a job on this process's background executor"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config['GENERATION_WORKERS'],
+                thread_name_prefix='generation'
+            )
+    return _executor.submit(run_generation_job, app, job_id)
+
+
+def _claim(app, job_id):
+    """Take ownership of a job unless a process is already running it.
+    
+    A running job whose heartbeat is older than GENERATION_JOB_STALE is
+    assumed to be orphaned and can be taken over.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=app.config['GENERATION_JOB_STALE'])
+    owner = process_owner()
+    result = db.session.execute(
+        db.update(GenerationJob)
+        .where(
+            GenerationJob.id == job_id,
+            GenerationJob.status.in_(('queued', 'running', 'failed')),
+            db.or_(GenerationJob.status != 'running', GenerationJob.heartbeat_at < stale)
+        )
+        .values(
+            status='running',
+            owner=owner,
+            heartbeat_at=now,
+            error=None,
+            started_at=db.func.coalesce(GenerationJob.started_at, now)
+        )
+    )
+    db.session.commit()
+    return bool(result.rowcount)
+
+
+def run_generation_job(app, job_id):
+    """Generate the remaining chunks of a job, committing after each one.
+    
+    Chunks are expanded with generate_tasks_for_range(), which skips days that
+    already have a task, so re-running a chunk interrupted before its progress
+    was saved doesn't create duplicates.
+    """
+    from app.scheduler import generate_tasks_for_range
+    
+    with app.app_context():
+        if not _claim(app, job_id):
+            return None
+        job = db.session.get(GenerationJob, job_id)
+        
+        metrics.track_job()
+        started = time.perf_counter()
+        rows_before = job.rows_generated
+        try:
+            for chunk_start, chunk_end in month_chunks(job.cursor, job.end_date):
+                rows = generate_tasks_for_range(chunk_start, chunk_end)
+                job.cursor = chunk_end
+                job.chunks_done += 1
+                job.rows_generated += rows
+                job.heartbeat_at = datetime.utcnow()
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = str(e)
+        else:
+            job.status = 'success'
+        finally:
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            metrics.record_job('generate_recurring', job.status,
+                               time.perf_counter() - started, job.rows_generated - rows_before)
+        return job.status
+
+
+def resume_generation_jobs(app):
+    """Restart queued or running jobs whose process went away"""
+    with app.app_context():
+        stale = datetime.utcnow() - timedelta(seconds=app.config['GENERATION_JOB_STALE'])
+        job_ids = [job_id for (job_id,) in db.session.query(GenerationJob.id).filter(
+            db.or_(
+                GenerationJob.status == 'queued',
+                db.and_(GenerationJob.status == 'running', GenerationJob.heartbeat_at < stale)
+            ),
+            GenerationJob.created_at < stale
+        )]
+    for job_id in job_ids:
+        submit_generation_job(app, job_id)
+    return len(job_ids)
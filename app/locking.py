@@ -0,0 +1,140 @@
+import os
+import socket
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def process_owner():
+    """Identify this process as the holder of a lock"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class FileLock:
+    """Exclusive lock on a local file, released by the OS when the process exits.
+    
+    Only coordinates processes on the same host.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+    
+    def acquire(self):
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(process_owner())
+        lock_file.flush()
+        self._file = lock_file
+        return True
+    
+    def refresh(self):
+        return self._file is not None
+    
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class DatabaseLock:
+    """Lease stored in the scheduler_locks table, works across hosts.
+    
+    The holder must call refresh() more often than every ttl seconds, otherwise
+    another process may take the lease over.
+    """
+    
+    def __init__(self, app, name, ttl):
+        self.app = app
+        self.name = name
+        self.ttl = ttl
+        self.owner = process_owner()
+    
+    def acquire(self):
+        from app import db
+        from app.models import SchedulerLock
+        
+        with self.app.app_context():
+            now = datetime.utcnow()
+            result = db.session.execute(
+                db.update(SchedulerLock)
+                .where(
+                    SchedulerLock.name == self.name,
+                    db.or_(
+                        SchedulerLock.owner == self.owner,
+                        SchedulerLock.heartbeat_at < now - timedelta(seconds=self.ttl)
+                    )
+                )
+                .values(owner=self.owner, acquired_at=now, heartbeat_at=now)
+            )
+            if result.rowcount:
+                db.session.commit()
+                return True
+            
+            if db.session.get(SchedulerLock, self.name) is not None:
+                db.session.rollback()
+                return False
+            try:
+                db.session.add(SchedulerLock(
+                    name=self.name,
+                    owner=self.owner,
+                    acquired_at=now,
+                    heartbeat_at=now
+                ))
+                db.session.commit()
+            except IntegrityError:
+                # Another process created the row first
+                db.session.rollback()
+                return False
+            return True
+    
+    def refresh(self):
+        """Extend the lease, returns False if it was lost"""
+        from app import db
+        from app.models import SchedulerLock
+        
+        with self.app.app_context():
+            result = db.session.execute(
+                db.update(SchedulerLock)
+                .where(SchedulerLock.name == self.name, SchedulerLock.owner == self.owner)
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            db.session.commit()
+            return bool(result.rowcount)
+    
+    def release(self):
+        from app import db
+        from app.models import SchedulerLock
+        
+        with self.app.app_context():
+            SchedulerLock.query.filter_by(name=self.name, owner=self.owner).delete()
+            db.session.commit()
+
+
+def create_scheduler_lock(app):
+    """Build the lock configured by SCHEDULER_LOCK, or None to disable locking"""
+    backend = app.config['SCHEDULER_LOCK']
+    if backend == 'file':
+        path = app.config['SCHEDULER_LOCK_FILE'] or os.path.join(app.instance_path, 'scheduler.lock')
+        return FileLock(path)
+    if backend == 'db':
+        return DatabaseLock(app, 'scheduler', app.config['SCHEDULER_LOCK_TTL'])
+    return None
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+
+# Histogram buckets (upper bounds) for latencies in seconds and sizes in bytes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+JOB_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request',
+    labelnames=('method', 'route', 'status'), buckets=LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Size of response bodies with a known length',
+    labelnames=('route',), buckets=SIZE_BUCKETS
+)
+DB_STATEMENTS = Counter(
+    'db_statements_total', 'SQL statements executed, by request route or job',
+    labelnames=('route',)
+)
+DB_DURATION = Counter(
+    'db_duration_seconds_total', 'Time spent executing SQL, by request route or job',
+    labelnames=('route',)
+)
+JOB_DURATION = Histogram(
+    'scheduler_job_duration_seconds', 'Duration of scheduled job runs',
+    labelnames=('job',), buckets=JOB_BUCKETS
+)
+JOB_RUNS = Counter(
+    'scheduler_job_runs_total', 'Scheduled job runs by outcome',
+    labelnames=('job', 'status')
+)
+JOB_ROWS = Counter(
+    'scheduler_job_rows_generated_total', 'Rows generated by scheduled jobs',
+    labelnames=('job',)
+)
+FRAGMENT_CACHE = Counter(
+    'fragment_cache_requests_total', 'Rendered HTML fragment lookups by result',
+    labelnames=('result',)
+)
+
+# SQL timings of code running outside a request, e.g. scheduled jobs
+_job_stats = threading.local()
+
+
+def render():
+    """All metrics in the Prometheus text exposition format.
+    
+    With PROMETHEUS_MULTIPROC_DIR set (e.g. under gunicorn), every process
+    writes its values to files there and this sums up all of them, so the
+    answer doesn't depend on which worker serves the scrape.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def _current_stats():
+    """[statement count, seconds] accumulator for the running request or job"""
+    if has_request_context():
+        return g.get('_db_stats')
+    return getattr(_job_stats, 'stats', None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - context._metrics_started
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _before_request():
+    g._request_started = time.perf_counter()
+    g._db_stats = [0, 0.0]
+
+
+def _after_request(response):
+    started = g.pop('_request_started', None)
+    if started is None:
+        return response
+    duration = time.perf_counter() - started
+    statements, db_time = g.pop('_db_stats')
+    route = _route()
+    
+    REQUEST_DURATION.labels(method=request.method, route=route,
+                            status=str(response.status_code)).observe(duration)
+    if response.content_length is not None:
+        RESPONSE_SIZE.labels(route=route).observe(response.content_length)
+    if statements:
+        DB_STATEMENTS.labels(route=route).inc(statements)
+        DB_DURATION.labels(route=route).inc(db_time)
+    
+    response.headers.add(
+        'Server-Timing',
+        f'app;dur={duration * 1000:.1f}, db;dur={db_time * 1000:.1f};desc="{statements} queries"'
+    )
+    return response
+
+
+def track_job():
+    """Start collecting SQL timings for a job run on this thread"""
+    _job_stats.stats = [0, 0.0]
+
+
+def record_job(job_id, status, duration, rows):
+    """Record a finished job run, including SQL collected since track_job()"""
+    stats = getattr(_job_stats, 'stats', None)
+    _job_stats.stats = None
+    JOB_DURATION.labels(job=job_id).observe(duration)
+    JOB_RUNS.labels(job=job_id, status=status).inc()
+    if rows:
+        JOB_ROWS.labels(job=job_id).inc(rows)
+    if stats is not None and stats[0]:
+        DB_STATEMENTS.labels(route=f'job:{job_id}').inc(stats[0])
+        DB_DURATION.labels(route=f'job:{job_id}').inc(stats[1])
+
+
+def metrics_view():
+    """Prometheus scrape endpoint"""
+    return current_app.response_class(render(), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """Record request, SQL and job metrics and serve them at /metrics.
+    
+    Must run in an app context, after the database engine is configured.
+    """
+    from app import db
+    
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    for engine in set(db.engines.values()):
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
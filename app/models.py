@@ -1,11 +1,16 @@
 from app import db
-from datetime import datetime, date
+from datetime import datetime, date, time, timedelta
 from croniter import croniter
+from app.cron import template_occurrences
 
 
 class TaskTemplate(db.Model):
     """Template for recurring tasks with cron-like scheduling"""
     __tablename__ = 'task_templates'
+    __table_args__ = (
+        # The scheduler loads only templates whose next occurrence is due
+        db.Index('ix_task_templates_next_occurrence', 'is_active', 'is_exhausted', 'next_occurrence_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -15,6 +20,12 @@ class TaskTemplate(db.Model):
     start_date = db.Column(db.Date, nullable=True)  # When recurrence starts (null = no limit)
     end_date = db.Column(db.Date, nullable=True)    # When recurrence ends (null = no limit)
     is_active = db.Column(db.Boolean, default=True)
+    # Occurrences up to this point exist as Task rows (null = nothing generated yet)
+    materialized_through = db.Column(db.DateTime, nullable=True)
+    # First occurrence after the watermark (null = not computed yet)
+    next_occurrence_at = db.Column(db.DateTime, nullable=True)
+    # No occurrences left, e.g. end_date has passed
+    is_exhausted = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -31,36 +42,27 @@ class TaskTemplate(db.Model):
         except (ValueError, KeyError):
             return None
     
-    def get_occurrences_in_range(self, start_date, end_date):
-        """Get all occurrences within a date range, respecting template start/end dates"""
-        occurrences = []
-        
-        # Adjust range based on template's start/end dates
-        effective_start = start_date
-        effective_end = end_date
+    def refresh_next_occurrence(self, now=None):
+        """Recompute next_occurrence_at and is_exhausted.
         
+        The next occurrence is the first one after both now and the watermark,
+        within the template's start/end dates. Call after changing the
+        schedule or advancing materialized_through.
+        """
+        after = max(now or datetime.now(), self.materialized_through or datetime.min)
         if self.start_date:
-            template_start = datetime.combine(self.start_date, datetime.min.time())
-            effective_start = max(start_date, template_start)
-        
-        if self.end_date:
-            template_end = datetime.combine(self.end_date, datetime.max.time())
-            effective_end = min(end_date, template_end)
-        
-        # If the effective range is invalid, return empty
-        if effective_start > effective_end:
-            return occurrences
-        
-        try:
-            cron = croniter(self.cron_schedule, effective_start)
-            while True:
-                next_time = cron.get_next(datetime)
-                if next_time > effective_end:
-                    break
-                occurrences.append(next_time)
-        except (ValueError, KeyError):
-            pass
-        return occurrences
+            after = max(after, datetime.combine(self.start_date, time.min) - timedelta(microseconds=1))
+        next_occurrence = self.get_next_occurrence(after)
+        if next_occurrence is not None and self.end_date and next_occurrence.date() > self.end_date:
+            next_occurrence = None
+        self.next_occurrence_at = next_occurrence
+        self.is_exhausted = next_occurrence is None
+        return next_occurrence
+    
+    def get_occurrences_in_range(self, start_date, end_date):
+        """Get all occurrences within a date range, respecting template start/end dates"""
+        return template_occurrences(self.cron_schedule, self.start_date, self.end_date,
+                                    start_date, end_date)
     
     def to_dict(self):
         return {
@@ -72,6 +74,8 @@ class TaskTemplate(db.Model):
             'start_date': self.start_date.isoformat() if self.start_date else None,
             'end_date': self.end_date.isoformat() if self.end_date else None,
             'is_active': self.is_active,
+            'next_occurrence_at': self.next_occurrence_at.isoformat() if self.next_occurrence_at else None,
+            'is_exhausted': self.is_exhausted,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -80,15 +84,27 @@ class TaskTemplate(db.Model):
 class Task(db.Model):
     """Individual task instance (can be standalone or from a template)"""
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # One generated task per template and day; also serves template lookups
+        db.UniqueConstraint('template_id', 'due_date', name='uq_tasks_template_due_date'),
+        # Date range scans in listing order (calendar views, keyset pagination)
+        db.Index('ix_tasks_due', 'due_date', 'due_time', 'priority'),
+        # Never hand out an id again: archived tasks keep theirs and move back
+        {'sqlite_autoincrement': True}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
+    # Title, description and priority of a generated task are NULL unless
+    # overridden; reads take them from the template (see INHERITED_FIELDS)
+    title = db.Column(db.String(200))
     description = db.Column(db.Text)
     due_date = db.Column(db.Date, nullable=False)
     due_time = db.Column(db.Time)  # Optional specific time
     is_completed = db.Column(db.Boolean, default=False)
     completed_at = db.Column(db.DateTime)
-    priority = db.Column(db.Integer, default=2)  # 1=High, 2=Medium, 3=Low
+    priority = db.Column(db.Integer)  # 1=High, 2=Medium, 3=Low
+    # Tombstone for a deleted recurring occurrence, hidden from all reads
+    is_skipped = db.Column(db.Boolean, default=False, nullable=False)
     
     # Link to template (null for standalone tasks)
     template_id = db.Column(db.Integer, db.ForeignKey('task_templates.id'), nullable=True)
@@ -101,20 +117,225 @@ class Task(db.Model):
         self.is_completed = not self.is_completed
         self.completed_at = datetime.utcnow() if self.is_completed else None
     
+    def inherited(self, field):
+        """A field's value, taken from the template unless this task overrides it"""
+        value = getattr(self, field)
+        if value is None and self.template_id is not None:
+            template = db.session.get(TaskTemplate, self.template_id)
+            if template is not None:
+                return getattr(template, field)
+        return value
+    
     def to_dict(self):
         return {
             'id': self.id,
-            'title': self.title,
-            'description': self.description,
+            'title': self.inherited('title'),
+            'description': self.inherited('description'),
             'due_date': self.due_date.isoformat() if self.due_date else None,
             'due_time': self.due_time.isoformat() if self.due_time else None,
             'is_completed': self.is_completed,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'priority': self.priority,
+            'priority': self.inherited('priority'),
             'template_id': self.template_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+    
+    @staticmethod
+    def row_to_dict(row):
+        """Serialize a TASK_COLUMNS row like to_dict(), without an ORM object"""
+        (task_id, title, description, due_date, due_time, is_completed,
+         completed_at, priority, template_id, created_at, updated_at) = row[:11]
+        return {
+            'id': task_id,
+            'title': title,
+            'description': description,
+            'due_date': due_date.isoformat() if due_date else None,
+            'due_time': due_time.isoformat() if due_time else None,
+            'is_completed': is_completed,
+            'completed_at': completed_at.isoformat() if completed_at else None,
+            'priority': priority,
+            'template_id': template_id,
+            'created_at': created_at.isoformat() if created_at else None,
+            'updated_at': updated_at.isoformat() if updated_at else None
+        }
+
+
+# Task fields a generated task inherits from its template
+INHERITED_FIELDS = ('title', 'description', 'priority')
+
+
+def _inherited(field):
+    """A task column as read: the task's own value, else its template's"""
+    template_value = (
+        db.select(getattr(TaskTemplate, field))
+        .where(TaskTemplate.id == Task.template_id)
+        .correlate(Task)
+        .scalar_subquery()
+    )
+    return db.func.coalesce(getattr(Task, field), template_value)
+
+
+# Resolved fields for filters and ordering; template edits need no task writes
+TASK_TITLE = _inherited('title')
+TASK_DESCRIPTION = _inherited('description')
+TASK_PRIORITY = _inherited('priority')
+
+# Columns for read paths that skip ORM hydration, see Task.row_to_dict()
+TASK_COLUMNS = (
+    Task.id, TASK_TITLE.label('title'), TASK_DESCRIPTION.label('description'), Task.due_date,
+    Task.due_time, Task.is_completed, Task.completed_at, TASK_PRIORITY.label('priority'),
+    Task.template_id, Task.created_at, Task.updated_at
+)
+
+
+class ArchivedTask(db.Model):
+    """Completed task moved out of the hot tasks table, see app.archive.
+    
+    Keeps the original id. Lives on the 'archive' bind, which is the main
+    database unless ARCHIVE_DATABASE_URL points elsewhere. Title, description
+    and priority are stored as read, so the archive needs no template;
+    inherited_fields names those the task took from its template, which it
+    inherits again when moved back.
+    """
+    __tablename__ = 'archived_tasks'
+    __bind_key__ = 'archive'
+    __table_args__ = (
+        db.Index('ix_archived_tasks_due', 'due_date', 'due_time', 'priority'),
+        db.Index('ix_archived_tasks_template_due_date', 'template_id', 'due_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    due_date = db.Column(db.Date, nullable=False)
+    due_time = db.Column(db.Time)
+    is_completed = db.Column(db.Boolean, default=True)
+    completed_at = db.Column(db.DateTime)
+    priority = db.Column(db.Integer, default=2)
+    template_id = db.Column(db.Integer, nullable=True)  # No foreign key, may be another database
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    inherited_fields = db.Column(db.String(50))  # Comma-separated INHERITED_FIELDS, NULL if none
+
+
+# TASK_COLUMNS for archived rows, in the same order
+ARCHIVED_TASK_COLUMNS = tuple(getattr(ArchivedTask, column.key) for column in TASK_COLUMNS)
+
+
+class SchedulerLock(db.Model):
+    """Lease row electing the one process that runs scheduled jobs"""
+    __tablename__ = 'scheduler_locks'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(200), nullable=False)  # hostname:pid of the holder
+    acquired_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'owner': self.owner,
+            'acquired_at': self.acquired_at.isoformat() if self.acquired_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None
+        }
+
+
+class JobRun(db.Model):
+    """One execution of a scheduled job"""
+    __tablename__ = 'job_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(100), nullable=False, index=True)
+    owner = db.Column(db.String(200))
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    duration = db.Column(db.Float)  # Seconds
+    rows_generated = db.Column(db.Integer)
+    status = db.Column(db.String(20), default='running')  # running, success, failed
+    error = db.Column(db.Text)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'owner': self.owner,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration': self.duration,
+            'rows_generated': self.rows_generated,
+            'status': self.status,
+            'error': self.error
+        }
+
+
+class GenerationJob(db.Model):
+    """Background backfill of recurring tasks over a date range, one chunk at a time"""
+    __tablename__ = 'generation_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    start_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False)
+    # Everything up to here is committed; an interrupted job resumes from it
+    cursor = db.Column(db.DateTime, nullable=False)
+    chunks_total = db.Column(db.Integer, nullable=False)
+    chunks_done = db.Column(db.Integer, nullable=False, default=0)
+    rows_generated = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, success, failed
+    error = db.Column(db.Text)
+    owner = db.Column(db.String(200))  # hostname:pid of the process running it
+    heartbeat_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'cursor': self.cursor.isoformat(),
+            'chunks_total': self.chunks_total,
+            'chunks_done': self.chunks_done,
+            'progress': self.chunks_done / self.chunks_total if self.chunks_total else 1.0,
+            'rows_generated': self.rows_generated,
+            'status': self.status,
+            'error': self.error,
+            'owner': self.owner,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class DataVersion(db.Model):
+    """Counter bumped by every write to a slice of data, used to build ETags"""
+    __tablename__ = 'data_versions'
+    
+    scope = db.Column(db.String(50), primary_key=True)  # e.g. 'templates', 'tasks:2025-01'
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ChangeLogEntry(db.Model):
+    """One task or template mutation, numbered for incremental client sync.
+    
+    Task entries name the row by id, or by (template_id, due_date) when it was
+    bulk-inserted; 'invalidate' entries stand for writes whose rows aren't
+    known (bulk UPDATE/DELETE) and tell clients to refetch.
+    """
+    __tablename__ = 'change_log'
+    # Never reuse sequence numbers, even after compaction empties the table
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # task, template
+    action = db.Column(db.String(20), nullable=False)  # upsert, delete, invalidate
+    entity_id = db.Column(db.Integer)
+    template_id = db.Column(db.Integer)
+    due_date = db.Column(db.Date)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
 # Common cron schedule presets for UI
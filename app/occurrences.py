@@ -0,0 +1,198 @@
+from datetime import datetime, time, timedelta
+import re
+from app import db
+from app.archive import restore_archived_slot
+from app.models import ARCHIVED_TASK_COLUMNS, ArchivedTask, Task, TaskTemplate
+
+# Synthetic id of a recurring occurrence that has no Task row yet
+VIRTUAL_ID_PATTERN = re.compile(r'^tpl-(\d+)-(\d{8})$')
+
+
+def virtual_task_id(template_id, due_date):
+    """Stable id for a template occurrence on a given day"""
+    return f'tpl-{template_id}-{due_date:%Y%m%d}'
+
+
+def parse_virtual_task_id(task_id):
+    """Return (template_id, due_date) for a synthetic id, or None"""
+    match = VIRTUAL_ID_PATTERN.match(str(task_id))
+    if not match:
+        return None
+    try:
+        due_date = datetime.strptime(match.group(2), '%Y%m%d').date()
+    except ValueError:
+        return None
+    return int(match.group(1)), due_date
+
+
+def virtual_task_dict(template, occurrence):
+    """Serialize an occurrence with the same shape as Task.to_dict()"""
+    return {
+        'id': virtual_task_id(template.id, occurrence.date()),
+        'title': template.title,
+        'description': template.description,
+        'due_date': occurrence.date().isoformat(),
+        'due_time': occurrence.time().isoformat(),
+        'is_completed': False,
+        'completed_at': None,
+        'priority': template.priority,
+        'template_id': template.id,
+        'created_at': None,
+        'updated_at': None
+    }
+
+
+def _day_bounds(first_day, last_day):
+    # get_occurrences_in_range() is exclusive at the start, so begin just
+    # before midnight to keep 00:00 occurrences on the first day
+    start = datetime.combine(first_day, time.min) - timedelta(microseconds=1)
+    end = datetime.combine(last_day, time.max)
+    return start, end
+
+
+def template_day_occurrences(template, first_day, last_day):
+    """A template's occurrences in [first_day, last_day] that are shown virtually.
+    
+    Expansion starts at the later of first_day and the day the template was
+    created, so a new template doesn't show up as pending in the past.
+    """
+    if template.created_at is not None:
+        first_day = max(first_day, template.created_at.date())
+    if first_day > last_day:
+        return []
+    return template.get_occurrences_in_range(*_day_bounds(first_day, last_day))
+
+
+def get_virtual_occurrences(first_day, last_day, stored_keys):
+    """(template, occurrence) pairs of active templates in [first_day, last_day]
+    that have no stored row. stored_keys holds (template_id, due_date) pairs
+    of existing rows, tombstones included.
+    """
+    templates = TaskTemplate.query.filter(
+        TaskTemplate.is_active.is_(True),
+        db.or_(TaskTemplate.created_at.is_(None),
+               TaskTemplate.created_at < datetime.combine(last_day + timedelta(days=1), time.min)),
+        db.or_(TaskTemplate.start_date.is_(None), TaskTemplate.start_date <= last_day),
+        db.or_(TaskTemplate.end_date.is_(None), TaskTemplate.end_date >= first_day)
+    ).all()
+    if not templates:
+        return []
+    
+    seen = set(stored_keys)
+    pending = []
+    for template in templates:
+        for occurrence in template_day_occurrences(template, first_day, last_day):
+            key = (template.id, occurrence.date())
+            if key in seen:
+                continue
+            seen.add(key)
+            pending.append((template, occurrence))
+    return pending
+
+
+def get_virtual_tasks(first_day, last_day, stored_keys):
+    """Task dicts for the occurrences get_virtual_occurrences() returns"""
+    return [
+        virtual_task_dict(template, occurrence)
+        for template, occurrence in get_virtual_occurrences(first_day, last_day, stored_keys)
+    ]
+
+
+def _find_occurrence(task_id):
+    """Resolve a synthetic id to (template, occurrence) if it is still scheduled"""
+    parsed = parse_virtual_task_id(task_id)
+    if parsed is None:
+        return None
+    template_id, due_date = parsed
+    template = db.session.get(TaskTemplate, template_id)
+    if template is None or not template.is_active:
+        return None
+    occurrences = template_day_occurrences(template, due_date, due_date)
+    if not occurrences:
+        return None
+    return template, occurrences[0]
+
+
+def get_virtual_task(task_id):
+    """Task dict for a synthetic id, or None if it doesn't resolve"""
+    parsed = parse_virtual_task_id(task_id)
+    if parsed is None:
+        return None
+    stored = Task.query.filter_by(template_id=parsed[0], due_date=parsed[1]).first()
+    if stored is not None:
+        return None if stored.is_skipped else stored.to_dict()
+    archived = db.session.execute(
+        db.select(*ARCHIVED_TASK_COLUMNS).where(
+            ArchivedTask.template_id == parsed[0],
+            ArchivedTask.due_date == parsed[1]
+        )
+    ).first()
+    if archived is not None:
+        return Task.row_to_dict(archived)
+    found = _find_occurrence(task_id)
+    if found is None:
+        return None
+    return virtual_task_dict(*found)
+
+
+def task_reference(task_id):
+    """What an API task id refers to, looked up without writing anything.
+    
+    Returns the row id of a stored or archived task, (template_id, due_date)
+    for an occurrence that isn't stored yet, or None if the id doesn't resolve
+    (unknown, deleted, or no longer scheduled).
+    """
+    task_id = str(task_id)
+    if task_id.isdigit():
+        is_skipped = db.session.scalar(db.select(Task.is_skipped).where(Task.id == int(task_id)))
+        if is_skipped is not None:
+            return None if is_skipped else int(task_id)
+        return db.session.scalar(db.select(ArchivedTask.id).where(ArchivedTask.id == int(task_id)))
+    parsed = parse_virtual_task_id(task_id)
+    if parsed is None:
+        return None
+    stored = db.session.execute(
+        db.select(Task.id, Task.is_skipped).where(
+            Task.template_id == parsed[0],
+            Task.due_date == parsed[1]
+        )
+    ).first()
+    if stored is not None:
+        return None if stored.is_skipped else stored.id
+    archived_id = db.session.scalar(
+        db.select(ArchivedTask.id).where(
+            ArchivedTask.template_id == parsed[0],
+            ArchivedTask.due_date == parsed[1]
+        )
+    )
+    if archived_id is not None:
+        return archived_id
+    return parsed if _find_occurrence(task_id) is not None else None
+
+
+def materialize_virtual_task(task_id):
+    """Get or create the Task row behind a synthetic id (not committed).
+    
+    An archived occurrence is restored to the tasks table. Returns None if the
+    id doesn't resolve to a scheduled occurrence or the occurrence was deleted.
+    """
+    parsed = parse_virtual_task_id(task_id)
+    if parsed is None:
+        return None
+    stored = Task.query.filter_by(template_id=parsed[0], due_date=parsed[1]).first()
+    if stored is None:
+        stored = restore_archived_slot(*parsed)
+    if stored is not None:
+        return None if stored.is_skipped else stored
+    found = _find_occurrence(task_id)
+    if found is None:
+        return None
+    template, occurrence = found
+    task = Task(
+        due_date=occurrence.date(),
+        due_time=occurrence.time(),
+        template_id=template.id
+    )
+    db.session.add(task)
+    db.session.flush()
+    return task
@@ -1,7 +1,32 @@
-from flask import Blueprint, render_template, request, jsonify
-from datetime import datetime, date, timedelta
+from flask import Blueprint, render_template, request, jsonify, abort, current_app, stream_with_context
+from datetime import datetime, date, time, timedelta
+import base64
+import heapq
+from itertools import islice
+import json
+try:
+    import orjson
+except ImportError:  # Optional faster encoder
+    orjson = None
 from app import db
-from app.models import Task, TaskTemplate, CRON_PRESETS
+from app.models import (
+    ARCHIVED_TASK_COLUMNS, ArchivedTask, Task, TaskTemplate, GenerationJob, JobRun, SchedulerLock,
+    CRON_PRESETS, INHERITED_FIELDS, TASK_COLUMNS, TASK_PRIORITY
+)
+from app.archive import (
+    archived_keys, archived_rows, get_archived_task, reaches_archive, restore_archived_slot,
+    restore_archived_task
+)
+from app.occurrences import (
+    get_virtual_occurrences, get_virtual_task, get_virtual_tasks, materialize_virtual_task,
+    parse_virtual_task_id, task_reference
+)
+from app.ical import export_calendar, import_calendar, load_series
+from app.search import search_tasks, search_templates
+from app.changes import changes_since, latest_seq, wait_for_changes
+from app.assets import asset_url, assets_version
+from app.fragments import fragment_cache
+from app.versioning import TEMPLATES_SCOPE, calendar_scopes, make_etag
 
 main_bp = Blueprint('main', __name__)
 api_bp = Blueprint('api', __name__)
@@ -27,54 +52,452 @@ def templates_view():
     return render_template('templates.html')
 
 
+@main_bp.route('/sw.js')
+def service_worker():
+    """Service worker whose precache list and cache name follow the asset hashes"""
+    precache = ['/'] + [asset_url(path) for path in sorted(current_app.extensions['assets'])]
+    script = render_template('sw.js', version=assets_version(), precache=precache)
+    response = current_app.response_class(script, mimetype='application/javascript')
+    # Browsers check for a new worker on navigation; never serve a stale one
+    response.cache_control.no_cache = True
+    return response
+
+
+def _print_date(day):
+    return f'{day:%b} {day.day}, {day.year}'
+
+
+def _print_etag(version):
+    """ETag of a print page; it also shows the day it was printed"""
+    return f'{version}-{date.today():%Y%m%d}'
+
+
+def _print_response(template, title, grid, etag):
+    html = render_template(template, title=title, grid=grid, generated_on=_print_date(date.today()))
+    return _with_etag(current_app.response_class(html, mimetype='text/html'), etag)
+
+
 @main_bp.route('/print/weekly')
 def print_weekly():
-    """Print-friendly weekly view"""
-    return render_template('print_weekly.html')
+    """Print-friendly weekly view, rendered on the server.
+    
+    The day grid is cached per week and data version, so reprinting an
+    unchanged week doesn't query or render its tasks again.
+    """
+    try:
+        target_date = date.fromisoformat(request.args.get('date', date.today().isoformat()))
+    except ValueError:
+        abort(400, description='date must be a YYYY-MM-DD date')
+    start_of_week = target_date - timedelta(days=target_date.weekday())
+    end_of_week = start_of_week + timedelta(days=6)
+    
+    version = make_etag(calendar_scopes(start_of_week, end_of_week), 'print-week', start_of_week)
+    etag = _print_etag(version)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    
+    def render_grid():
+        days = _month_days(start_of_week, end_of_week)
+        _fill_calendar_days(days, start_of_week, end_of_week)
+        return render_template('_print_week.html', days=days.values())
+    
+    grid = fragment_cache().get_or_render(('week', start_of_week), version, render_grid)
+    title = f'{_print_date(start_of_week)} - {_print_date(end_of_week)}'
+    return _print_response('print_weekly.html', title, grid, etag)
 
 
 @main_bp.route('/print/monthly')
 def print_monthly():
-    """Print-friendly monthly view"""
-    return render_template('print_monthly.html')
+    """Print-friendly monthly view, rendered on the server with a cached grid"""
+    try:
+        first_day, last_day = _month_bounds(
+            int(request.args.get('year', date.today().year)),
+            int(request.args.get('month', date.today().month))
+        )
+    except ValueError:
+        abort(400, description='year and month must form a valid month')
+    
+    version = make_etag(calendar_scopes(first_day, last_day), 'print-month', first_day)
+    etag = _print_etag(version)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    
+    def render_grid():
+        days = _month_days(first_day, last_day)
+        _fill_calendar_days(days, first_day, last_day)
+        # Blank cells before the 1st so weeks start on Monday
+        return render_template('_print_month.html', days=days.values(), padding=first_day.weekday())
+    
+    grid = fragment_cache().get_or_render(('month', first_day), version, render_grid)
+    return _print_response('print_monthly.html', f'{first_day:%B} {first_day.year}', grid, etag)
 
 
 # ============ API Routes ============
 
+def _get_task_or_404(task_id):
+    """Look up a task by id for a change, materializing a virtual recurring
+    occurrence or restoring an archived task
+    """
+    if task_id.isdigit():
+        task = Task.query.filter(
+            Task.id == int(task_id),
+            Task.is_skipped.is_(False)
+        ).first()
+        if task is None and db.session.get(Task, int(task_id)) is None:
+            task = restore_archived_task(int(task_id))
+    else:
+        task = materialize_virtual_task(task_id)
+    if task is None:
+        abort(404)
+    return task
+
+
+def _not_modified(etag):
+    """304 response if the client already has this version, else None"""
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+
+def _with_etag(response, etag):
+    """Attach an ETag and make clients revalidate before reusing the response"""
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    return response
+
+
+def _task_sort_key(task):
+    """Order task dicts like ORDER BY due_date, due_time, priority (NULLs first)"""
+    return (
+        task['due_date'],
+        task['due_time'] is not None, task['due_time'] or '',
+        task['priority'] is not None, task['priority'] or 0
+    )
+
+
+def _json_response(payload):
+    """jsonify() through orjson when it is installed, for large read payloads"""
+    if orjson is None:
+        return jsonify(payload)
+    body = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS) + b'\n'
+    return current_app.response_class(body, mimetype='application/json')
+
+
+def _empty_days(first_day, last_day, **fields):
+    """Day buckets keyed by ISO date; fields maps names to callables on the date"""
+    days = {}
+    current = first_day
+    while current <= last_day:
+        day = {'date': current.isoformat()}
+        for name, value in fields.items():
+            day[name] = value(current)
+        day['tasks'] = []
+        days[day['date']] = day
+        current += timedelta(days=1)
+    return days
+
+
+def _fill_calendar_days(days, first_day, last_day):
+    """Put stored tasks and virtual template occurrences into day buckets.
+    
+    Rows are read as plain tuples (no ORM objects) and bucketed in one pass.
+    Archived tasks are merged in when the range starts before the archive
+    cutoff.
+    """
+    rows = db.session.execute(
+        db.select(*TASK_COLUMNS, Task.is_skipped)
+        .where(Task.due_date >= first_day, Task.due_date <= last_day)
+        .order_by(Task.due_date, Task.due_time, TASK_PRIORITY)
+    ).all()
+    
+    row_to_dict = Task.row_to_dict
+    stored_keys = set()
+    for row in rows:
+        # row[3] is due_date, row[8] template_id, row[-1] is_skipped
+        if row[8]:
+            stored_keys.add((row[8], row[3]))
+        if row[-1]:
+            continue
+        bucket = days.get(row[3].isoformat())
+        if bucket is not None:
+            bucket['tasks'].append(row_to_dict(row))
+    
+    touched = set()
+    if reaches_archive(first_day):
+        hot_ids = {row[0] for row in rows}
+        for row in archived_rows(first_day, last_day):
+            if row[8]:
+                stored_keys.add((row[8], row[3]))
+            bucket = days.get(row[3].isoformat())
+            if bucket is not None and row[0] not in hot_ids:
+                bucket['tasks'].append(row_to_dict(row))
+                touched.add(bucket['date'])
+    for task in get_virtual_tasks(first_day, last_day, stored_keys):
+        days[task['due_date']]['tasks'].append(task)
+        touched.add(task['due_date'])
+    for day_key in touched:
+        days[day_key]['tasks'].sort(key=_task_sort_key)
+    return days
+
+
 # --- Tasks API ---
 
+def _priority(model):
+    """Priority as read: generated tasks inherit it from their template"""
+    return TASK_PRIORITY if model is Task else model.priority
+
+
+def _task_list_order(model):
+    """Deterministic order for task listings; NULLs first on every database so
+    keyset cursors behave the same on SQLite and PostgreSQL
+    """
+    return (
+        model.due_date,
+        model.due_time.asc().nulls_first(),
+        _priority(model).asc().nulls_first(),
+        model.id
+    )
+
+
+TASK_LIST_ORDER = _task_list_order(Task)
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+
+def _encode_cursor(task):
+    """Opaque cursor pointing just past a task (or TASK_COLUMNS row) in TASK_LIST_ORDER"""
+    key = [
+        task.due_date.isoformat(),
+        task.due_time.isoformat() if task.due_time else None,
+        task.priority,
+        task.id
+    ]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        due_date, due_time, priority, task_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (
+            date.fromisoformat(due_date),
+            time.fromisoformat(due_time) if due_time else None,
+            priority,
+            int(task_id)
+        )
+    except (ValueError, TypeError):
+        abort(400, description='Invalid cursor')
+
+
+def _list_sort_key(row):
+    """TASK_LIST_ORDER as a Python sort key for TASK_COLUMNS rows"""
+    return (
+        row[3],
+        row[4] is not None, row[4] or time.min,
+        row[7] is not None, row[7] or 0,
+        row[0]
+    )
+
+
+def _merge_archived(rows, archived):
+    """Merge hot and archived rows, both in TASK_LIST_ORDER, into one listing.
+    
+    A task left in both tables by an interrupted move is listed once.
+    """
+    previous_id = None
+    for row in heapq.merge(rows, archived, key=_list_sort_key):
+        if row[0] != previous_id:
+            yield row
+        previous_id = row[0]
+
+
+def _after_cursor(cursor, model=Task):
+    """Filter for rows of model strictly after the cursor in TASK_LIST_ORDER"""
+    due_date, due_time, priority, task_id = cursor
+    
+    def after(column, value):
+        # (greater, equal) for a nullable column sorted NULLs first
+        if value is None:
+            return column.isnot(None), column.is_(None)
+        return column > value, column == value
+    
+    time_after, time_equal = after(model.due_time, due_time)
+    priority_after, priority_equal = after(_priority(model), priority)
+    # The redundant bound lets the index seek to the cursor's day instead of
+    # scanning every earlier row
+    return db.and_(model.due_date >= due_date, db.or_(
+        model.due_date > due_date,
+        db.and_(model.due_date == due_date, db.or_(
+            time_after,
+            db.and_(time_equal, db.or_(
+                priority_after,
+                db.and_(priority_equal, model.id > task_id)
+            ))
+        ))
+    ))
+
+
+def _stream_tasks(query, stream_format, archive_query=None, limit=None):
+    """Stream query results (merged with archived rows) as NDJSON or a chunked JSON array"""
+    dumps = current_app.json.dumps
+    row_to_dict = Task.row_to_dict
+    rows = query.yield_per(STREAM_BATCH_SIZE)
+    if archive_query is not None:
+        rows = _merge_archived(rows, archive_query.yield_per(STREAM_BATCH_SIZE))
+        if limit:
+            rows = islice(rows, limit)
+    
+    if stream_format == 'ndjson':
+        def generate():
+            for row in rows:
+                yield dumps(row_to_dict(row)) + '\n'
+        mimetype = 'application/x-ndjson'
+    else:
+        def generate():
+            yield '['
+            separator = ''
+            for row in rows:
+                yield separator + dumps(row_to_dict(row))
+                separator = ','
+            yield ']'
+        mimetype = 'application/json'
+    
+    return current_app.response_class(stream_with_context(generate()), mimetype=mimetype)
+
+
 @api_bp.route('/tasks', methods=['GET'])
 def get_tasks():
-    """Get tasks with optional date range filter"""
+    """Get tasks with optional date range filter.
+    
+    Supports keyset pagination (limit, cursor; the next cursor is returned in
+    the X-Next-Cursor header) and streaming (stream=ndjson or stream=json).
+    Archived tasks are included when the range starts before the archive
+    cutoff.
+    """
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    stream_format = request.args.get('stream')
+    
+    start = datetime.fromisoformat(start_date).date() if start_date else None
+    end = datetime.fromisoformat(end_date).date() if end_date else None
+    after = _decode_cursor(cursor) if cursor else None
     
-    query = Task.query
+    def listing(model, columns, *criteria):
+        query = model.query.filter(*criteria)
+        if start:
+            query = query.filter(model.due_date >= start)
+        if end:
+            query = query.filter(model.due_date <= end)
+        if after:
+            query = query.filter(_after_cursor(after, model))
+        return query.order_by(*_task_list_order(model)).with_entities(*columns)
     
-    if start_date:
-        start = datetime.fromisoformat(start_date).date()
-        query = query.filter(Task.due_date >= start)
+    query = listing(Task, TASK_COLUMNS, Task.is_skipped.is_(False))
+    archive_query = None
+    if reaches_archive(after[0] if after else start):
+        archive_query = listing(ArchivedTask, ARCHIVED_TASK_COLUMNS)
     
-    if end_date:
-        end = datetime.fromisoformat(end_date).date()
-        query = query.filter(Task.due_date <= end)
+    if stream_format:
+        if stream_format not in ('ndjson', 'json'):
+            abort(400, description='stream must be ndjson or json')
+        if limit:
+            query = query.limit(limit)
+            if archive_query is not None:
+                archive_query = archive_query.limit(limit)
+        return _stream_tasks(query, stream_format, archive_query, limit)
     
-    tasks = query.order_by(Task.due_date, Task.due_time, Task.priority).all()
-    return jsonify([task.to_dict() for task in tasks])
+    def fetch(count=None):
+        if archive_query is None:
+            return (query.limit(count) if count else query).all()
+        if not count:
+            return list(_merge_archived(query.all(), archive_query.all()))
+        merged = _merge_archived(query.limit(count).all(), archive_query.limit(count).all())
+        return list(islice(merged, count))
+    
+    row_to_dict = Task.row_to_dict
+    if limit is None:
+        return _json_response([row_to_dict(row) for row in fetch()])
+    
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # Fetch one extra row to know whether another page exists
+    rows = fetch(limit + 1)
+    response = _json_response([row_to_dict(row) for row in rows[:limit]])
+    if len(rows) > limit:
+        response.headers['X-Next-Cursor'] = _encode_cursor(rows[limit - 1])
+    return response
 
 
-@api_bp.route('/tasks', methods=['POST'])
-def create_task():
-    """Create a new task"""
-    data = request.get_json()
-    
-    task = Task(
+def _parse_due_time(value):
+    return datetime.strptime(value, '%H:%M').time() if value else None
+
+
+def _new_task(data):
+    """Build a standalone task from create request JSON"""
+    return Task(
         title=data['title'],
         description=data.get('description', ''),
         due_date=datetime.fromisoformat(data['due_date']).date(),
-        due_time=datetime.strptime(data['due_time'], '%H:%M').time() if data.get('due_time') else None,
+        due_time=_parse_due_time(data.get('due_time')),
         priority=data.get('priority', 2)
     )
+
+
+def _parse_task_changes(data):
+    """Parse the fields present in update request JSON"""
+    changes = {}
+    for field in ('title', 'description', 'priority', 'is_completed'):
+        if field in data:
+            changes[field] = data[field]
+    if 'due_date' in data:
+        changes['due_date'] = datetime.fromisoformat(data['due_date']).date()
+    if 'due_time' in data:
+        changes['due_time'] = _parse_due_time(data['due_time'])
+    return changes
+
+
+def _apply_task_changes(task, changes):
+    """Apply parsed update fields to a task"""
+    if 'title' in changes:
+        task.title = changes['title']
+    if 'description' in changes:
+        task.description = changes['description']
+    if 'due_date' in changes:
+        due_date = changes['due_date']
+        if task.template_id and due_date != task.due_date:
+            # A moved occurrence becomes a standalone task; the tombstone keeps
+            # the template from scheduling the original day again
+            template_id, original_date = task.template_id, task.due_date
+            for field in INHERITED_FIELDS:
+                setattr(task, field, task.inherited(field))
+            task.template_id = None
+            db.session.flush()
+            db.session.add(Task(
+                due_date=original_date,
+                template_id=template_id,
+                is_skipped=True
+            ))
+        task.due_date = due_date
+    if 'due_time' in changes:
+        task.due_time = changes['due_time']
+    if 'priority' in changes:
+        task.priority = changes['priority']
+    if 'is_completed' in changes:
+        task.is_completed = changes['is_completed']
+        task.completed_at = datetime.utcnow() if changes['is_completed'] else None
+
+
+@api_bp.route('/tasks', methods=['POST'])
+def create_task():
+    """Create a new task"""
+    data = request.get_json()
+    
+    task = _new_task(data)
     
     db.session.add(task)
     db.session.commit()
@@ -82,50 +505,195 @@ def create_task():
     return jsonify(task.to_dict()), 201
 
 
-@api_bp.route('/tasks/<int:task_id>', methods=['GET'])
+def _batch_errors(errors, count):
+    """400 response for a rejected batch: its errors, every other operation skipped"""
+    return jsonify({'results': [
+        {'index': index, 'status': 'error', 'error': errors[index]}
+        if index in errors else {'index': index, 'status': 'skipped'}
+        for index in range(count)
+    ]}), 400
+
+
+@api_bp.route('/tasks/batch', methods=['POST'])
+def batch_tasks():
+    """Apply a list of create/update/toggle/delete operations in one transaction.
+    
+    Body: {"operations": [{"op": "create", "data": {...}},
+                          {"op": "update", "id": 1, "data": {...}},
+                          {"op": "toggle", "id": 2}, {"op": "delete", "id": 3}]}
+    Either every operation is applied or, if any is invalid or refers to a
+    missing task, none is.
+    """
+    payload = request.get_json()
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list):
+        abort(400, description='Expected {"operations": [...]}')
+    
+    # Validate everything before writing, with the same parsing as the
+    # single-task endpoints
+    parsed = []
+    errors = {}
+    for index, operation in enumerate(operations):
+        try:
+            op = operation['op']
+            data = operation.get('data', {})
+            if not isinstance(data, dict):
+                raise TypeError('data must be an object')
+            if op == 'create':
+                parsed.append((op, None, _new_task(data)))
+            elif op == 'update':
+                parsed.append((op, str(operation['id']), _parse_task_changes(data)))
+            elif op in ('toggle', 'delete'):
+                parsed.append((op, str(operation['id']), None))
+            else:
+                raise ValueError(f'Unknown op {op!r}')
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            errors[index] = f'{type(e).__name__}: {e}'
+            parsed.append(None)
+    
+    # Check that every referenced task exists before anything is written:
+    # restoring an archived task commits when the archive is a separate
+    # database, which a rejected batch mustn't leave behind
+    deleted = set()
+    for index, item in enumerate(parsed):
+        if item is None or item[0] == 'create':
+            continue
+        reference = task_reference(item[1])
+        if reference is None or reference in deleted:
+            errors[index] = 'Not found'
+        elif item[0] == 'delete':
+            deleted.add(reference)
+    if errors:
+        return _batch_errors(errors, len(operations))
+    
+    # Load every referenced stored task in one query
+    task_ids = {int(item[1]) for item in parsed if item[1] and item[1].isdigit()}
+    tasks = {}
+    if task_ids:
+        tasks = {task.id: task for task in Task.query.filter(
+            Task.id.in_(task_ids),
+            Task.is_skipped.is_(False)
+        )}
+    # Restore referenced archived tasks before anything is applied: with a
+    # separate archive database a restore commits
+    for item in parsed:
+        if not item[1]:
+            continue
+        if item[1].isdigit():
+            task_id = int(item[1])
+            if task_id not in tasks and db.session.get(Task, task_id) is None:
+                task = restore_archived_task(task_id)
+                if task is not None:
+                    tasks[task.id] = task
+        else:
+            slot = parse_virtual_task_id(item[1])
+            if slot is not None:
+                restore_archived_slot(*slot)
+    
+    def resolve(task_id):
+        if task_id.isdigit():
+            return tasks.get(int(task_id))
+        task = materialize_virtual_task(task_id)
+        if task is not None:
+            tasks[task.id] = task
+        return task
+    
+    results = [None] * len(operations)
+    deleted = set()
+    for index, (op, task_id, value) in enumerate(parsed):
+        if op == 'create':
+            db.session.add(value)
+            results[index] = value
+            continue
+        task = resolve(task_id)
+        if task is None or task.id in deleted:
+            # Only if the task went away since it was checked; a restore
+            # already committed to a separate archive is archived again later
+            errors[index] = 'Not found'
+            continue
+        if op == 'update':
+            _apply_task_changes(task, value)
+        elif op == 'toggle':
+            task.toggle_complete()
+        else:
+            deleted.add(task.id)
+        results[index] = task
+    
+    if errors:
+        db.session.rollback()
+        return _batch_errors(errors, len(operations))
+    
+    db.session.flush()
+    
+    if deleted:
+        # Recurring occurrences keep a tombstone, standalone tasks go away
+        recurring = [task_id for task_id in deleted if tasks[task_id].template_id]
+        standalone = [task_id for task_id in deleted if not tasks[task_id].template_id]
+        if recurring:
+            Task.query.filter(Task.id.in_(recurring)).update(
+                {'is_skipped': True}, synchronize_session=False
+            )
+        if standalone:
+            Task.query.filter(Task.id.in_(standalone)).delete(synchronize_session=False)
+    
+    response = []
+    for index, (item, task) in enumerate(zip(parsed, results)):
+        if item[0] == 'delete':
+            response.append({'index': index, 'status': 'ok', 'id': task.id})
+        else:
+            response.append({'index': index, 'status': 'ok', 'task': task.to_dict()})
+    
+    db.session.commit()
+    return jsonify({'results': response})
+
+
+@api_bp.route('/tasks/<task_id>', methods=['GET'])
 def get_task(task_id):
-    """Get a specific task"""
-    task = Task.query.get_or_404(task_id)
-    return jsonify(task.to_dict())
+    """Get a specific task (or a virtual recurring occurrence)"""
+    if not task_id.isdigit():
+        virtual_task = get_virtual_task(task_id)
+        if virtual_task is None:
+            abort(404)
+        return jsonify(virtual_task)
+    task = Task.query.filter(Task.id == int(task_id), Task.is_skipped.is_(False)).first()
+    if task is not None:
+        return jsonify(task.to_dict())
+    # Reading an archived task leaves it in the archive
+    archived_task = get_archived_task(int(task_id))
+    if archived_task is None:
+        abort(404)
+    return jsonify(archived_task)
 
 
-@api_bp.route('/tasks/<int:task_id>', methods=['PUT'])
+@api_bp.route('/tasks/<task_id>', methods=['PUT'])
 def update_task(task_id):
     """Update a task"""
-    task = Task.query.get_or_404(task_id)
+    task = _get_task_or_404(task_id)
     data = request.get_json()
     
-    if 'title' in data:
-        task.title = data['title']
-    if 'description' in data:
-        task.description = data['description']
-    if 'due_date' in data:
-        task.due_date = datetime.fromisoformat(data['due_date']).date()
-    if 'due_time' in data:
-        task.due_time = datetime.strptime(data['due_time'], '%H:%M').time() if data['due_time'] else None
-    if 'priority' in data:
-        task.priority = data['priority']
-    if 'is_completed' in data:
-        task.is_completed = data['is_completed']
-        task.completed_at = datetime.utcnow() if data['is_completed'] else None
+    _apply_task_changes(task, _parse_task_changes(data))
     
     db.session.commit()
     return jsonify(task.to_dict())
 
 
-@api_bp.route('/tasks/<int:task_id>', methods=['DELETE'])
+@api_bp.route('/tasks/<task_id>', methods=['DELETE'])
 def delete_task(task_id):
     """Delete a task"""
-    task = Task.query.get_or_404(task_id)
-    db.session.delete(task)
+    task = _get_task_or_404(task_id)
+    if task.template_id:
+        # Keep a tombstone so the occurrence isn't shown or generated again
+        task.is_skipped = True
+    else:
+        db.session.delete(task)
     db.session.commit()
     return '', 204
 
 
-@api_bp.route('/tasks/<int:task_id>/toggle', methods=['POST'])
+@api_bp.route('/tasks/<task_id>/toggle', methods=['POST'])
 def toggle_task(task_id):
     """Toggle task completion status"""
-    task = Task.query.get_or_404(task_id)
+    task = _get_task_or_404(task_id)
     task.toggle_complete()
     db.session.commit()
     return jsonify(task.to_dict())
@@ -136,8 +704,13 @@ def toggle_task(task_id):
 @api_bp.route('/templates', methods=['GET'])
 def get_templates():
     """Get all task templates"""
+    etag = make_etag([TEMPLATES_SCOPE], 'templates')
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    
     templates = TaskTemplate.query.order_by(TaskTemplate.created_at.desc()).all()
-    return jsonify([t.to_dict() for t in templates])
+    return _with_etag(jsonify([t.to_dict() for t in templates]), etag)
 
 
 @api_bp.route('/templates', methods=['POST'])
@@ -154,6 +727,7 @@ def create_template():
         end_date=datetime.fromisoformat(data['end_date']).date() if data.get('end_date') else None,
         is_active=data.get('is_active', True)
     )
+    template.refresh_next_occurrence()
     
     db.session.add(template)
     db.session.commit()
@@ -170,35 +744,30 @@ def get_template(template_id):
 
 @api_bp.route('/templates/<int:template_id>', methods=['PUT'])
 def update_template(template_id):
-    """Update a template and sync changes to all future associated tasks"""
+    """Update a template; its tasks inherit title, description and priority,
+    so only a schedule change touches them
+    """
     template = TaskTemplate.query.get_or_404(template_id)
     data = request.get_json()
     
-    if 'title' in data:
-        template.title = data['title']
-    if 'description' in data:
-        template.description = data['description']
-    if 'cron_schedule' in data:
-        template.cron_schedule = data['cron_schedule']
-    if 'priority' in data:
-        template.priority = data['priority']
-    if 'start_date' in data:
-        template.start_date = datetime.fromisoformat(data['start_date']).date() if data['start_date'] else None
-    if 'end_date' in data:
-        template.end_date = datetime.fromisoformat(data['end_date']).date() if data['end_date'] else None
-    if 'is_active' in data:
-        template.is_active = data['is_active']
-    
-    # Update all future tasks (today and beyond) associated with this template
-    today = date.today()
-    Task.query.filter(
-        Task.template_id == template_id,
-        Task.due_date >= today
-    ).update({
-        'title': template.title,
-        'description': template.description,
-        'priority': template.priority
-    })
+    values = {}
+    for field in ('title', 'description', 'cron_schedule', 'priority', 'is_active'):
+        if field in data:
+            values[field] = data[field]
+    for field in ('start_date', 'end_date'):
+        if field in data:
+            values[field] = datetime.fromisoformat(data[field]).date() if data[field] else None
+    
+    changed = {field for field, value in values.items() if getattr(template, field) != value}
+    for field in changed:
+        setattr(template, field, values[field])
+    
+    # Reschedule future tasks (today and beyond) when the schedule changed
+    if changed & {'cron_schedule', 'start_date', 'end_date'}:
+        from app.scheduler import reconcile_template_tasks
+        reconcile_template_tasks(template)
+    if changed & {'cron_schedule', 'start_date', 'end_date', 'is_active'}:
+        template.refresh_next_occurrence()
     
     db.session.commit()
     return jsonify(template.to_dict())
@@ -214,8 +783,9 @@ def delete_template(template_id):
     delete_tasks = request.args.get('delete_tasks', 'future')
     
     if delete_tasks == 'all':
-        # Delete all tasks from this template
+        # Delete all tasks from this template, archived ones included
         Task.query.filter(Task.template_id == template_id).delete()
+        ArchivedTask.query.filter(ArchivedTask.template_id == template_id).delete()
     elif delete_tasks == 'future':
         # Delete only future tasks (today and beyond) from this template
         Task.query.filter(
@@ -224,6 +794,12 @@ def delete_template(template_id):
         ).delete()
     # If delete_tasks == 'none', don't delete any tasks
     
+    if delete_tasks != 'all':
+        # Tasks left behind keep the values they inherited
+        Task.query.filter(Task.template_id == template_id).update({
+            field: db.func.coalesce(getattr(Task, field), getattr(template, field))
+            for field in INHERITED_FIELDS
+        }, synchronize_session=False)
     db.session.delete(template)
     db.session.commit()
     return '', 204
@@ -234,6 +810,7 @@ def toggle_template(template_id):
     """Toggle template active status"""
     template = TaskTemplate.query.get_or_404(template_id)
     template.is_active = not template.is_active
+    template.refresh_next_occurrence()
     db.session.commit()
     return jsonify(template.to_dict())
 
@@ -243,43 +820,29 @@ def regenerate_template_tasks(template_id):
     """Regenerate future tasks for a specific template after it's been updated"""
     template = TaskTemplate.query.get_or_404(template_id)
     
-    # Delete future tasks for this template (today and beyond)
-    today = date.today()
-    deleted_count = Task.query.filter(
-        Task.template_id == template_id,
-        Task.due_date >= today
-    ).delete()
-    db.session.commit()
-    
-    # Regenerate tasks for this template only for the next 30 days
     if not template.is_active:
-        return jsonify({'deleted': deleted_count, 'regenerated': 0})
-    
-    end_date = datetime.now() + timedelta(days=30)
-    occurrences = template.get_occurrences_in_range(datetime.now(), end_date)
-    generated_count = 0
-    
-    for occurrence in occurrences:
-        # Check if task already exists for this template and date
-        existing = Task.query.filter_by(
-            template_id=template.id,
-            due_date=occurrence.date()
-        ).first()
-        
-        if not existing:
-            task = Task(
-                title=template.title,
-                description=template.description,
-                due_date=occurrence.date(),
-                due_time=occurrence.time(),
-                priority=template.priority,
-                template_id=template.id
-            )
-            db.session.add(task)
-            generated_count += 1
+        # Inactive templates keep only completed future tasks, and the
+        # tombstones of deleted or moved occurrences for when they come back
+        deleted_count = Task.query.filter(
+            Task.template_id == template_id,
+            Task.due_date >= date.today(),
+            Task.is_completed.isnot(True),
+            Task.is_skipped.is_(False)
+        ).delete(synchronize_session=False)
+        template.materialized_through = None
+        template.refresh_next_occurrence()
+        db.session.commit()
+        return jsonify({'deleted': deleted_count, 'regenerated': 0, 'updated': 0})
     
+    # Diff future tasks against the template for at least the next 30 days
+    from app.scheduler import reconcile_template_tasks
+    counts = reconcile_template_tasks(template, horizon_end=datetime.now() + timedelta(days=30))
     db.session.commit()
-    return jsonify({'deleted': deleted_count, 'regenerated': generated_count})
+    return jsonify({
+        'deleted': counts['deleted'],
+        'regenerated': counts['inserted'],
+        'updated': counts['updated']
+    })
 
 
 @api_bp.route('/templates/presets', methods=['GET'])
@@ -290,6 +853,91 @@ def get_cron_presets():
 
 # --- Calendar API ---
 
+# Longest span /calendar/range serves in one response
+MAX_RANGE_DAYS = 400
+
+
+def _month_bounds(year, month):
+    """First and last day of a month"""
+    first_day = date(year, month, 1)
+    if month == 12:
+        last_day = date(year + 1, 1, 1) - timedelta(days=1)
+    else:
+        last_day = date(year, month + 1, 1) - timedelta(days=1)
+    return first_day, last_day
+
+
+def _week_days(first_day, last_day):
+    return _empty_days(first_day, last_day, day_name=lambda d: d.strftime('%A'))
+
+
+def _month_days(first_day, last_day):
+    return _empty_days(
+        first_day, last_day,
+        day=lambda d: d.day,
+        day_name=lambda d: d.strftime('%A')
+    )
+
+
+def _week_payload(days, start_of_week):
+    """Week response body from filled day buckets"""
+    end_of_week = start_of_week + timedelta(days=6)
+    return {
+        'start_date': start_of_week.isoformat(),
+        'end_date': end_of_week.isoformat(),
+        'days': [days[(start_of_week + timedelta(days=i)).isoformat()] for i in range(7)]
+    }
+
+
+def _month_payload(days, first_day, last_day):
+    """Month response body from filled day buckets"""
+    return {
+        'year': first_day.year,
+        'month': first_day.month,
+        'month_name': first_day.strftime('%B'),
+        'first_day': first_day.isoformat(),
+        'last_day': last_day.isoformat(),
+        'days': [
+            days[(first_day + timedelta(days=i)).isoformat()]
+            for i in range((last_day - first_day).days + 1)
+        ]
+    }
+
+
+def _period_start(day, group):
+    """First day of the day, week (Monday) or month containing day"""
+    if group == 'week':
+        return day - timedelta(days=day.weekday())
+    if group == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _parse_calendar_range():
+    """Read start, end and group from the query string, widened to whole periods"""
+    group = request.args.get('group', 'week')
+    try:
+        start = date.fromisoformat(request.args['start'])
+        end = date.fromisoformat(request.args['end'])
+    except (KeyError, ValueError):
+        abort(400, description='start and end must be YYYY-MM-DD dates')
+    if group not in ('day', 'week', 'month'):
+        abort(400, description='group must be day, week or month')
+    if end < start:
+        abort(400, description='end must not be before start')
+    
+    first_day = _period_start(start, group)
+    if group == 'week':
+        last_day = end + timedelta(days=6 - end.weekday())
+    elif group == 'month':
+        last_day = _month_bounds(end.year, end.month)[1]
+    else:
+        last_day = end
+    if (last_day - first_day).days >= MAX_RANGE_DAYS:
+        abort(400, description=f'Range is limited to {MAX_RANGE_DAYS} days')
+    return group, first_day, last_day
+
+
 @api_bp.route('/calendar/week', methods=['GET'])
 def get_week_data():
     """Get tasks for a specific week"""
@@ -300,33 +948,16 @@ def get_week_data():
     start_of_week = target_date - timedelta(days=target_date.weekday())
     end_of_week = start_of_week + timedelta(days=6)
     
-    # Get existing tasks
-    tasks = Task.query.filter(
-        Task.due_date >= start_of_week,
-        Task.due_date <= end_of_week
-    ).order_by(Task.due_date, Task.due_time, Task.priority).all()
-    
-    # Organize tasks by day
-    week_data = {}
-    current = start_of_week
-    while current <= end_of_week:
-        week_data[current.isoformat()] = {
-            'date': current.isoformat(),
-            'day_name': current.strftime('%A'),
-            'tasks': []
-        }
-        current += timedelta(days=1)
+    etag = make_etag(calendar_scopes(start_of_week, end_of_week), 'week', start_of_week)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
     
-    for task in tasks:
-        day_key = task.due_date.isoformat()
-        if day_key in week_data:
-            week_data[day_key]['tasks'].append(task.to_dict())
+    # Existing tasks and upcoming recurring occurrences, organized by day
+    week_data = _week_days(start_of_week, end_of_week)
+    _fill_calendar_days(week_data, start_of_week, end_of_week)
     
-    return jsonify({
-        'start_date': start_of_week.isoformat(),
-        'end_date': end_of_week.isoformat(),
-        'days': list(week_data.values())
-    })
+    return _with_etag(_json_response(_week_payload(week_data, start_of_week)), etag)
 
 
 @api_bp.route('/calendar/month', methods=['GET'])
@@ -336,53 +967,396 @@ def get_month_data():
     month = int(request.args.get('month', date.today().month))
     
     # Get first and last day of month
-    first_day = date(year, month, 1)
-    if month == 12:
-        last_day = date(year + 1, 1, 1) - timedelta(days=1)
+    first_day, last_day = _month_bounds(year, month)
+    
+    etag = make_etag(calendar_scopes(first_day, last_day), 'month', first_day)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    
+    # Tasks and recurring occurrences for the month, organized by day
+    month_data = _month_days(first_day, last_day)
+    _fill_calendar_days(month_data, first_day, last_day)
+    
+    return _with_etag(_json_response(_month_payload(month_data, first_day, last_day)), etag)
+
+
+@api_bp.route('/calendar/range', methods=['GET'])
+def get_calendar_range():
+    """Get several consecutive days, weeks or months from a single query.
+    
+    start and end are widened to whole periods. Each period has the same shape
+    as the day buckets of /calendar/week (group=day|week) or the body of
+    /calendar/month (group=month), so clients can prefetch neighbours.
+    """
+    group, first_day, last_day = _parse_calendar_range()
+    etag = make_etag(calendar_scopes(first_day, last_day), 'range', group, first_day, last_day)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    
+    if group == 'month':
+        days = _month_days(first_day, last_day)
     else:
-        last_day = date(year, month + 1, 1) - timedelta(days=1)
+        days = _week_days(first_day, last_day)
+    _fill_calendar_days(days, first_day, last_day)
     
-    # Get tasks for the month
-    tasks = Task.query.filter(
-        Task.due_date >= first_day,
-        Task.due_date <= last_day
-    ).order_by(Task.due_date, Task.due_time, Task.priority).all()
+    periods = []
+    if group == 'day':
+        periods = list(days.values())
+    elif group == 'week':
+        current = first_day
+        while current <= last_day:
+            periods.append(_week_payload(days, current))
+            current += timedelta(days=7)
+    else:
+        current = first_day
+        while current <= last_day:
+            month_first, month_last = _month_bounds(current.year, current.month)
+            periods.append(_month_payload(days, month_first, month_last))
+            current = month_last + timedelta(days=1)
     
-    # Organize tasks by day
-    month_data = {}
+    return _with_etag(_json_response({
+        'start_date': first_day.isoformat(),
+        'end_date': last_day.isoformat(),
+        'group': group,
+        'periods': periods
+    }), etag)
+
+
+@api_bp.route('/calendar/summary', methods=['GET'])
+def get_calendar_summary():
+    """Get task counts per day, week or month without loading the tasks.
+    
+    Stored tasks are counted with one GROUP BY over the due_date index;
+    recurring occurrences that aren't stored yet are added as pending tasks.
+    """
+    group, first_day, last_day = _parse_calendar_range()
+    
+    etag = make_etag(calendar_scopes(first_day, last_day), 'summary', group, first_day, last_day)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    
+    periods = {}
     current = first_day
     while current <= last_day:
-        month_data[current.isoformat()] = {
-            'date': current.isoformat(),
-            'day': current.day,
-            'day_name': current.strftime('%A'),
-            'tasks': []
-        }
+        key = _period_start(current, group)
+        if key not in periods:
+            periods[key] = {
+                'start_date': key.isoformat(),
+                'end_date': None,
+                'total': 0,
+                'completed': 0,
+                'virtual': 0,
+                'priorities': {}
+            }
+        periods[key]['end_date'] = current.isoformat()
         current += timedelta(days=1)
     
-    for task in tasks:
-        day_key = task.due_date.isoformat()
-        if day_key in month_data:
-            month_data[day_key]['tasks'].append(task.to_dict())
+    in_range = (Task.due_date >= first_day, Task.due_date <= last_day)
+    counts = db.session.execute(
+        db.select(
+            Task.due_date,
+            TASK_PRIORITY,
+            db.func.count(),
+            db.func.sum(db.case((Task.is_completed.is_(True), 1), else_=0))
+        )
+        .where(*in_range, Task.is_skipped.is_(False))
+        .group_by(Task.due_date, TASK_PRIORITY)
+    ).all()
+    if reaches_archive(first_day):
+        counts += db.session.execute(
+            db.select(
+                ArchivedTask.due_date,
+                ArchivedTask.priority,
+                db.func.count(),
+                db.func.sum(db.case((ArchivedTask.is_completed.is_(True), 1), else_=0))
+            )
+            .where(ArchivedTask.due_date >= first_day, ArchivedTask.due_date <= last_day)
+            .group_by(ArchivedTask.due_date, ArchivedTask.priority)
+        ).all()
+    for due_date, priority, total, completed in counts:
+        period = periods[_period_start(due_date, group)]
+        period['total'] += total
+        period['completed'] += completed or 0
+        if priority is not None:
+            priorities = period['priorities']
+            priorities[str(priority)] = priorities.get(str(priority), 0) + total
     
-    return jsonify({
-        'year': year,
-        'month': month,
-        'month_name': first_day.strftime('%B'),
-        'first_day': first_day.isoformat(),
-        'last_day': last_day.isoformat(),
-        'days': list(month_data.values())
-    })
+    stored_keys = [(template_id, due_date) for template_id, due_date in db.session.execute(
+        db.select(Task.template_id, Task.due_date)
+        .where(*in_range, Task.template_id.isnot(None))
+    )]
+    stored_keys += archived_keys(first_day, last_day)
+    for template, occurrence in get_virtual_occurrences(first_day, last_day, stored_keys):
+        period = periods[_period_start(occurrence.date(), group)]
+        period['total'] += 1
+        period['virtual'] += 1
+        if template.priority is not None:
+            priorities = period['priorities']
+            priorities[str(template.priority)] = priorities.get(str(template.priority), 0) + 1
+    
+    return _with_etag(_json_response({
+        'start_date': first_day.isoformat(),
+        'end_date': last_day.isoformat(),
+        'group': group,
+        'periods': list(periods.values())
+    }), etag)
+
+
+def _parse_datetime(value, name):
+    """Parse an ISO datetime from a request, converting aware values to local time"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        abort(400, description=f'{name} must be an ISO date or datetime')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
 
 
 @api_bp.route('/generate-recurring', methods=['POST'])
 def generate_recurring_tasks():
-    """Manually trigger generation of recurring tasks for a date range"""
+    """Queue generation of recurring tasks for a date range.
+    
+    The range is processed in one-month chunks on a background thread, with a
+    commit per chunk. Responds at once with the job to poll for progress.
+    """
     data = request.get_json()
-    start_date = datetime.fromisoformat(data['start_date'])
-    end_date = datetime.fromisoformat(data['end_date'])
+    start_date = _parse_datetime(data.get('start_date'), 'start_date')
+    end_date = _parse_datetime(data.get('end_date'), 'end_date')
+    if end_date < start_date:
+        abort(400, description='end_date must not be before start_date')
+    
+    from app.jobs import create_generation_job, submit_generation_job
+    job = create_generation_job(start_date, end_date)
+    submit_generation_job(current_app._get_current_object(), job.id)
+    
+    return jsonify(job.to_dict()), 202, {'Location': f'/api/generate-recurring/{job.id}'}
+
+
+@api_bp.route('/generate-recurring/<int:job_id>', methods=['GET'])
+def get_generation_job(job_id):
+    """Get the progress and result of a generation job"""
+    job = GenerationJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+
+@api_bp.route('/generate-recurring/<int:job_id>/resume', methods=['POST'])
+def resume_generation_job(job_id):
+    """Continue a failed or interrupted job from its last committed chunk"""
+    job = GenerationJob.query.get_or_404(job_id)
+    stale = datetime.utcnow() - timedelta(seconds=current_app.config['GENERATION_JOB_STALE'])
+    if job.status == 'success':
+        abort(409, description='Job already finished')
+    if job.status == 'running' and job.heartbeat_at and job.heartbeat_at >= stale:
+        abort(409, description='Job is still running')
+    
+    from app.jobs import submit_generation_job
+    submit_generation_job(current_app._get_current_object(), job.id)
     
-    from app.scheduler import generate_tasks_for_range
-    count = generate_tasks_for_range(start_date, end_date)
+    return jsonify(job.to_dict()), 202
+
+
+# --- Search API ---
+
+SEARCH_PAGE_SIZE = 20
+
+
+def _parse_flag(name):
+    """Optional boolean query parameter: None, True or False"""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    if value not in ('1', '0', 'true', 'false'):
+        abort(400, description=f'{name} must be 1 or 0')
+    return value in ('1', 'true')
+
+
+@api_bp.route('/search', methods=['GET'])
+def search():
+    """Full-text search over task or template titles and descriptions.
+    
+    Results are ranked best match first and paginated with limit and offset;
+    next_offset is null on the last page. type=templates searches templates
+    (filter: active); tasks, archived ones included, can be filtered with
+    start_date, end_date and completed.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        abort(400, description='q is required')
+    search_type = request.args.get('type', 'tasks')
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', SEARCH_PAGE_SIZE, type=int)
+    if offset < 0:
+        abort(400, description='offset must not be negative')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
     
-    return jsonify({'generated': count})
+    if search_type == 'tasks':
+        try:
+            start = date.fromisoformat(request.args['start_date']) if 'start_date' in request.args else None
+            end = date.fromisoformat(request.args['end_date']) if 'end_date' in request.args else None
+        except ValueError:
+            abort(400, description='start_date and end_date must be YYYY-MM-DD dates')
+        results, more = search_tasks(query, offset, limit, start, end, _parse_flag('completed'),
+                                     archived=reaches_archive(start))
+    elif search_type == 'templates':
+        results, more = search_templates(query, offset, limit, _parse_flag('active'))
+    else:
+        abort(400, description='type must be tasks or templates')
+    
+    return _json_response({
+        'query': query,
+        'type': search_type,
+        'results': results,
+        'next_offset': offset + limit if more else None
+    })
+
+
+# --- iCalendar API ---
+
+# Default window for templates whose schedule has no RRULE equivalent
+ICAL_EXPANSION_DAYS = 365
+
+
+@api_bp.route('/export.ics', methods=['GET'])
+def export_ics():
+    """Stream tasks and recurring templates as an iCalendar file.
+    
+    component selects VTODO (default) or VEVENT. start_date/end_date limit
+    stored tasks and the expansion of templates that can't be written as an
+    RRULE; recurring series are always exported whole. The range is limited
+    to MAX_RANGE_DAYS only when there are templates to expand.
+    """
+    component = request.args.get('component', 'VTODO').upper()
+    if component not in ('VTODO', 'VEVENT'):
+        abort(400, description='component must be VTODO or VEVENT')
+    try:
+        first_day = date.fromisoformat(request.args['start_date']) if 'start_date' in request.args else None
+        last_day = date.fromisoformat(request.args['end_date']) if 'end_date' in request.args else None
+    except ValueError:
+        abort(400, description='start_date and end_date must be YYYY-MM-DD dates')
+    window_first = first_day or date.today()
+    window_last = last_day or window_first + timedelta(days=ICAL_EXPANSION_DAYS)
+    if window_last < window_first:
+        abort(400, description='end_date must not be before start_date')
+    # Stored tasks are streamed over any range; only templates expanded into
+    # single occurrences are bounded
+    series = load_series()
+    if series[1] and (window_last - window_first).days >= MAX_RANGE_DAYS:
+        abort(400, description=f'Templates without an RRULE equivalent are expanded over '
+                               f'at most {MAX_RANGE_DAYS} days; narrow start_date/end_date')
+    
+    chunks = export_calendar(component, request.host.split(':')[0], first_day, last_day,
+                             (window_first, window_last), series)
+    response = current_app.response_class(stream_with_context(chunks), mimetype='text/calendar')
+    response.headers['Content-Disposition'] = 'attachment; filename="tasks.ics"'
+    return response
+
+
+@api_bp.route('/import', methods=['POST'])
+def import_ics():
+    """Import an iCalendar file, sent as the body or as a multipart 'file' field.
+    
+    The upload is parsed as it is read and inserted in batches of
+    IMPORT_BATCH_SIZE rows, each committed on its own. VTODOs and VEVENTs
+    become tasks; components with an RRULE become templates.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            abort(400, description='Missing file')
+        stream = upload.stream
+    elif request.mimetype == 'text/calendar':
+        stream = request.stream
+    else:
+        abort(415, description='Send text/calendar or multipart/form-data')
+    
+    result = import_calendar(stream, current_app.config['IMPORT_BATCH_SIZE'])
+    return jsonify(result), 201 if result['tasks'] or result['templates'] else 200
+
+
+# --- Changes API ---
+
+# How often an open change stream re-checks the log for writes made by
+# other processes; writes in this process wake it immediately
+CHANGES_POLL_INTERVAL = 2
+CHANGES_KEEPALIVE_INTERVAL = 15
+
+
+def _parse_since(value):
+    try:
+        since = int(value)
+    except (TypeError, ValueError):
+        abort(400, description='since must be a sequence number')
+    if since < 0:
+        abort(400, description='since must be a sequence number')
+    return since
+
+
+@api_bp.route('/changes', methods=['GET'])
+def get_changes():
+    """Get task and template changes after a sequence number.
+    
+    Without since, returns only the current sequence number to start from.
+    """
+    if 'since' not in request.args:
+        return jsonify({'seq': latest_seq(), 'reset': False, 'more': False, 'changes': []})
+    return _json_response(changes_since(_parse_since(request.args['since'])))
+
+
+@api_bp.route('/changes/stream', methods=['GET'])
+def stream_changes():
+    """Push changes as Server-Sent Events, one 'changes' event per batch.
+    
+    Resumes after the Last-Event-ID header (or since) on reconnect. The stream
+    closes after CHANGES_STREAM_TIMEOUT seconds and the browser reconnects.
+    """
+    since = request.headers.get('Last-Event-ID', request.args.get('since'))
+    since = latest_seq() if since is None else _parse_since(since)
+    timeout = current_app.config['CHANGES_STREAM_TIMEOUT']
+    
+    def generate():
+        last_seq = since
+        started = last_sent = datetime.now()
+        yield f'retry: {CHANGES_POLL_INTERVAL * 1000}\n\n'
+        while (datetime.now() - started).total_seconds() < timeout:
+            payload = changes_since(last_seq)
+            # End the read transaction so the next poll sees new commits
+            db.session.rollback()
+            if payload['changes'] or payload['reset'] or payload['seq'] != last_seq:
+                last_seq = payload['seq']
+                last_sent = datetime.now()
+                data = orjson.dumps(payload).decode() if orjson is not None else json.dumps(payload)
+                yield f'id: {last_seq}\nevent: changes\ndata: {data}\n\n'
+                if payload['more']:
+                    continue
+            elif (datetime.now() - last_sent).total_seconds() >= CHANGES_KEEPALIVE_INTERVAL:
+                last_sent = datetime.now()
+                yield ': keepalive\n\n'
+            wait_for_changes(CHANGES_POLL_INTERVAL)
+    
+    response = current_app.response_class(
+        stream_with_context(generate()), mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_bp.route('/scheduler/status', methods=['GET'])
+def get_scheduler_status():
+    """Get the scheduler lock holder and recent job runs"""
+    lock = db.session.get(SchedulerLock, 'scheduler')
+    
+    latest_ids = db.session.query(db.func.max(JobRun.id)).group_by(JobRun.job_id)
+    last_runs = JobRun.query.filter(JobRun.id.in_(latest_ids)).all()
+    recent_runs = JobRun.query.order_by(JobRun.id.desc()).limit(20).all()
+    
+    return jsonify({
+        'lock': lock.to_dict() if lock else None,
+        'last_runs': {run.job_id: run.to_dict() for run in last_runs},
+        'recent_runs': [run.to_dict() for run in recent_runs]
+    })
+
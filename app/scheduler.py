@@ -1,18 +1,38 @@
 from datetime import datetime, timedelta
+import threading
+import time
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from croniter import croniter
+from sqlalchemy.dialects import postgresql, sqlite
+from app.expansion import expand_templates
+from app.locking import DatabaseLock, create_scheduler_lock, process_owner
 
 scheduler = None
+scheduler_lock = None
 
 
 def init_scheduler(app):
-    """Initialize the background scheduler for recurring tasks"""
-    global scheduler
+    """Initialize the background scheduler for recurring tasks.
+    
+    Only the process holding the scheduler lock starts it; the others skip
+    scheduling and retry the lock now and then, so another worker takes over
+    if the leader goes away.
+    """
+    global scheduler, scheduler_lock
     
     if scheduler is not None:
         return
     
+    if scheduler_lock is None:
+        scheduler_lock = create_scheduler_lock(app)
+    if scheduler_lock is not None and not scheduler_lock.acquire():
+        timer = threading.Timer(app.config['SCHEDULER_LOCK_RETRY'], init_scheduler, args=(app,))
+        timer.daemon = True
+        timer.start()
+        return
+    
     scheduler = BackgroundScheduler()
     
     # Run task generation daily at midnight
@@ -24,57 +44,323 @@ def init_scheduler(app):
         replace_existing=True
     )
     
-    scheduler.start()
+    # Bound the change log clients sync from
+    scheduler.add_job(
+        func=lambda: compact_change_log(app),
+        trigger=IntervalTrigger(hours=1),
+        id='change_log_compaction',
+        name='Compact change log',
+        replace_existing=True
+    )
     
-    # Generate tasks for the next 7 days on startup
-    with app.app_context():
-        generate_tasks_for_range(
-            datetime.now(),
-            datetime.now() + timedelta(days=7)
+    # Move old completed tasks out of the hot table
+    scheduler.add_job(
+        func=lambda: archive_tasks(app),
+        trigger=CronTrigger(hour=0, minute=30),
+        id='task_archival',
+        name='Archive old completed tasks',
+        replace_existing=True
+    )
+    
+    # Pick up generation jobs whose process died
+    scheduler.add_job(
+        func=lambda: resume_generation_jobs(app),
+        trigger=IntervalTrigger(seconds=app.config['GENERATION_JOB_STALE']),
+        id='generation_job_recovery',
+        name='Resume interrupted generation jobs',
+        replace_existing=True
+    )
+    
+    if isinstance(scheduler_lock, DatabaseLock):
+        # Keep the lease alive well within its TTL
+        scheduler.add_job(
+            func=scheduler_lock.refresh,
+            trigger=IntervalTrigger(seconds=max(scheduler_lock.ttl // 3, 1)),
+            id='scheduler_lock_heartbeat',
+            name='Refresh scheduler lock',
+            replace_existing=True
         )
+    
+    scheduler.start()
+    
+    # Catch up on anything missed while the app was down
+    run_job(app, 'startup_generation',
+            lambda: generate_pending_tasks(app.config['RECURRING_HORIZON_DAYS']))
+    resume_generation_jobs(app)
 
 
 def generate_daily_tasks(app):
-    """Generate recurring tasks for the next 7 days"""
+    """Extend recurring tasks up to the configured horizon"""
+    return run_job(app, 'daily_task_generation',
+                   lambda: generate_pending_tasks(app.config['RECURRING_HORIZON_DAYS']))
+
+
+def compact_change_log(app):
+    """Trim the change log to CHANGE_LOG_SIZE entries"""
+    from app import changes
+    return run_job(app, 'change_log_compaction',
+                   lambda: changes.compact_change_log(app.config['CHANGE_LOG_SIZE']))
+
+
+def archive_tasks(app):
+    """Archive completed tasks older than ARCHIVE_AFTER_DAYS"""
+    from app.archive import archive_completed_tasks
+    return run_job(app, 'task_archival', archive_completed_tasks)
+
+
+def resume_generation_jobs(app):
+    """Resume backfills interrupted by a crash or restart"""
+    if scheduler_lock is not None and not scheduler_lock.refresh():
+        return 0
+    from app import jobs
+    return jobs.resume_generation_jobs(app)
+
+
+def run_job(app, job_id, func):
+    """Run a job body and record a JobRun with its duration and rows generated"""
+    from app import db, metrics
+    from app.models import JobRun
+    
+    if scheduler_lock is not None and not scheduler_lock.refresh():
+        # Another process owns the scheduler now
+        return None
+    
     with app.app_context():
-        generate_tasks_for_range(
-            datetime.now(),
-            datetime.now() + timedelta(days=7)
+        run = JobRun(
+            job_id=job_id,
+            owner=process_owner(),
+            started_at=datetime.utcnow(),
+            status='running'
         )
+        db.session.add(run)
+        db.session.commit()
+        
+        metrics.track_job()
+        started = time.perf_counter()
+        try:
+            rows = func()
+        except Exception as e:
+            db.session.rollback()
+            run.status = 'failed'
+            run.error = str(e)
+            raise
+        else:
+            run.status = 'success'
+            run.rows_generated = rows
+            return rows
+        finally:
+            run.finished_at = datetime.utcnow()
+            run.duration = time.perf_counter() - started
+            metrics.record_job(job_id, run.status, run.duration, run.rows_generated)
+            db.session.commit()
 
 
-def generate_tasks_for_range(start_date, end_date):
-    """Generate task instances from templates for a date range"""
+def generate_pending_tasks(horizon_days):
+    """Materialize each active template from its watermark up to the horizon.
+    
+    Only templates whose next_occurrence_at falls before the horizon are
+    loaded, and only the slice past each one's materialized_through is
+    expanded, so a daily run costs about one day of occurrences of the
+    templates that are due.
+    """
     from app import db
-    from app.models import Task, TaskTemplate
+    from app.models import TaskTemplate
     
-    templates = TaskTemplate.query.filter_by(is_active=True).all()
-    generated_count = 0
+    now = datetime.now()
+    horizon = now + timedelta(days=horizon_days)
+    templates = TaskTemplate.query.filter(
+        TaskTemplate.is_active.is_(True),
+        TaskTemplate.is_exhausted.is_(False),
+        db.or_(
+            TaskTemplate.next_occurrence_at.is_(None),
+            TaskTemplate.next_occurrence_at <= horizon
+        )
+    ).all()
     
+    windows = []
+    window_start = horizon
     for template in templates:
-        occurrences = template.get_occurrences_in_range(start_date, end_date)
-        
-        for occurrence in occurrences:
-            # Check if task already exists for this template and date
-            existing = Task.query.filter_by(
-                template_id=template.id,
-                due_date=occurrence.date()
-            ).first()
-            
-            if not existing:
-                task = Task(
-                    title=template.title,
-                    description=template.description,
-                    due_date=occurrence.date(),
-                    due_time=occurrence.time(),
-                    priority=template.priority,
-                    template_id=template.id
-                )
-                db.session.add(task)
-                generated_count += 1
+        start = max(now, template.materialized_through or now)
+        window_start = min(window_start, start)
+        windows.append((template, start, horizon))
+        template.materialized_through = horizon
+        template.refresh_next_occurrence(now)
+    
+    return materialize_occurrences(expand_templates(windows), window_start.date(), horizon.date())
+
+
+def generate_tasks_for_range(start_date, end_date, templates=None):
+    """Generate task instances from templates for a date range"""
+    from app import db
+    from app.models import TaskTemplate
+    
+    if templates is None:
+        # Backfills can cover days before the watermark, so next_occurrence_at
+        # doesn't apply; skip templates whose dates don't overlap the range
+        templates = TaskTemplate.query.filter(
+            TaskTemplate.is_active.is_(True),
+            db.or_(TaskTemplate.start_date.is_(None), TaskTemplate.start_date <= end_date.date()),
+            db.or_(TaskTemplate.end_date.is_(None), TaskTemplate.end_date >= start_date.date())
+        ).all()
+    
+    occurrences = expand_templates([(template, start_date, end_date) for template in templates])
+    return materialize_occurrences(occurrences, start_date.date(), end_date.date())
+
+
+def materialize_occurrences(occurrences, start_date, end_date):
+    """Bulk-insert tasks for (template, occurrences) pairs that don't exist yet.
+    
+    Existing (template_id, due_date) keys for the whole window are fetched in
+    a single query instead of one lookup per occurrence, so most duplicates
+    are never sent; slots filled concurrently are skipped by insert_tasks().
+    """
+    from app import db
+    from app.archive import archived_keys
+    from app.models import Task
     
+    template_ids = [template.id for template, dates in occurrences if dates]
+    if not template_ids:
+        # Still commit, callers may have advanced template watermarks
+        db.session.commit()
+        return 0
+    
+    existing_query = db.session.query(Task.template_id, Task.due_date).filter(
+        Task.template_id.isnot(None),
+        Task.due_date >= start_date,
+        Task.due_date <= end_date
+    )
+    if len(template_ids) == 1:
+        existing_query = existing_query.filter(Task.template_id == template_ids[0])
+    existing = set(existing_query.all())
+    existing |= archived_keys(start_date, end_date, template_ids)
+    
+    rows = []
+    for template, dates in occurrences:
+        for occurrence in dates:
+            key = (template.id, occurrence.date())
+            if key in existing:
+                continue
+            # Only one task per template and day, the first occurrence wins
+            existing.add(key)
+            rows.append(task_row(template, occurrence))
+    
+    inserted = insert_tasks(rows)
     db.session.commit()
-    return generated_count
+    return inserted
+
+
+def insert_tasks(rows):
+    """Bulk-insert generated task rows and return how many were inserted.
+    
+    On SQLite and PostgreSQL a (template_id, due_date) slot that another
+    writer filled in the meantime (an edited occurrence, a generation job,
+    another worker) is skipped instead of failing the whole batch on the
+    unique constraint.
+    """
+    from app import db
+    from app.models import Task
+    
+    if not rows:
+        return 0
+    dialects = {'sqlite': sqlite, 'postgresql': postgresql}
+    dialect = dialects.get(db.session.get_bind(mapper=Task).dialect.name)
+    if dialect is None:
+        db.session.execute(db.insert(Task), rows)
+        return len(rows)
+    # Skipped rows return no id, so the ids count the inserted ones
+    inserted = db.session.scalars(
+        dialect.insert(Task)
+        .on_conflict_do_nothing(index_elements=['template_id', 'due_date'])
+        .returning(Task.id),
+        rows
+    ).all()
+    return len(inserted)
+
+
+def task_row(template, occurrence):
+    """Insert parameters for the task a template generates at an occurrence.
+    
+    Title, description and priority are left NULL and read from the template.
+    """
+    return {
+        'due_date': occurrence.date(),
+        'due_time': occurrence.time(),
+        'template_id': template.id
+    }
+
+
+def reconcile_template_tasks(template, horizon_end=None):
+    """Bring a template's future tasks (today onwards) in line with its schedule.
+    
+    The stored tasks up to the horizon are diffed against the occurrences the
+    template produces now: days that are no longer scheduled are deleted,
+    missing days are bulk-inserted and moved times are updated. Title,
+    description and priority need no sync, tasks inherit them. Completed
+    tasks and tasks with their own title, description or priority are
+    user edits and keep their day and time. Does not commit.
+    
+    Returns a dict with 'deleted', 'inserted' and 'updated' counts.
+    """
+    from app import db
+    from app.models import INHERITED_FIELDS, Task
+    
+    now = datetime.now()
+    today = now.date()
+    counts = {'deleted': 0, 'inserted': 0, 'updated': 0}
+    
+    # Reconcile scheduled days up to the furthest of the horizon, the
+    # watermark and the last stored task
+    last_stored = db.session.query(db.func.max(Task.due_date)).filter(
+        Task.template_id == template.id
+    ).scalar()
+    horizon = max(
+        horizon_end or now,
+        template.materialized_through or now,
+        datetime.combine(last_stored, datetime.max.time()) if last_stored else now
+    )
+    
+    # Start just before midnight so earlier occurrences today are kept
+    desired = {}
+    start = datetime.combine(today, datetime.min.time()) - timedelta(microseconds=1)
+    for occurrence in template.get_occurrences_in_range(start, horizon):
+        desired.setdefault(occurrence.date(), occurrence)
+    
+    stored = db.session.query(
+        Task.id, Task.due_date, Task.due_time, Task.is_completed, Task.is_skipped,
+        db.or_(*(getattr(Task, field).isnot(None) for field in INHERITED_FIELDS))
+    ).filter(
+        Task.template_id == template.id,
+        Task.due_date >= today,
+        Task.due_date <= horizon.date()
+    ).all()
+    
+    stored_days = set()
+    stale_ids = []
+    moved_ids = {}
+    for task_id, due_date, due_time, is_completed, is_skipped, is_overridden in stored:
+        stored_days.add(due_date)
+        occurrence = desired.get(due_date)
+        if is_completed or is_overridden:
+            continue
+        if occurrence is None:
+            stale_ids.append(task_id)
+        elif not is_skipped and due_time != occurrence.time():
+            moved_ids.setdefault(occurrence.time(), []).append(task_id)
+    
+    if stale_ids:
+        counts['deleted'] = Task.query.filter(Task.id.in_(stale_ids)).delete(synchronize_session=False)
+    for due_time, task_ids in moved_ids.items():
+        counts['updated'] += Task.query.filter(Task.id.in_(task_ids)).update(
+            {'due_time': due_time}, synchronize_session=False
+        )
+    
+    rows = [task_row(template, occurrence) for day, occurrence in sorted(desired.items())
+            if day not in stored_days]
+    counts['inserted'] = insert_tasks(rows)
+    
+    template.materialized_through = horizon
+    template.refresh_next_occurrence(now)
+    return counts
 
 
 def parse_cron_expression(cron_expr):
@@ -0,0 +1,160 @@
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.schema import AddConstraint, CreateTable
+from app import db
+from app.models import ArchivedTask, Task
+
+# Generated tasks are unique per template and day; older tables lack this
+TASK_SLOT_CONSTRAINT = 'uq_tasks_template_due_date'
+
+
+def _column_ddl(connection, column):
+    """Column definition for ALTER TABLE ... ADD COLUMN.
+    
+    Existing rows get the column's scalar default, which also lets NOT NULL
+    columns be added; columns without one are added as nullable.
+    """
+    dialect = connection.dialect
+    ddl = f'{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}'
+    if column.default is not None and column.default.is_scalar:
+        value = literal(column.default.arg, column.type).compile(
+            dialect=dialect, compile_kwargs={'literal_binds': True}
+        )
+        ddl += f' DEFAULT {value}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    return ddl
+
+
+def _has_slot_constraint(connection):
+    inspector = inspect(connection)
+    columns = ['template_id', 'due_date']
+    return (
+        any(c['column_names'] == columns for c in inspector.get_unique_constraints(Task.__tablename__))
+        or any(i['unique'] and i['column_names'] == columns for i in inspector.get_indexes(Task.__tablename__))
+    )
+
+
+def _delete_duplicate_occurrences(connection):
+    """Keep one task per template and day: a completed one if any, else the oldest"""
+    table = Task.__table__
+    ranked = db.select(
+        table.c.id,
+        db.func.row_number().over(
+            partition_by=(table.c.template_id, table.c.due_date),
+            order_by=(db.func.coalesce(table.c.is_completed, False).desc(), table.c.id)
+        ).label('position')
+    ).where(table.c.template_id.isnot(None)).subquery()
+    connection.execute(table.delete().where(
+        table.c.id.in_(db.select(ranked.c.id).where(ranked.c.position > 1))
+    ))
+
+
+def _rebuild_sqlite_table(connection, table):
+    """Recreate a table from its model, keeping its rows.
+    
+    SQLite can't drop NOT NULL or add constraints to an existing table, so a
+    new table is created, filled, and renamed over the old one. Triggers on
+    the old table are dropped with it (search recreates its own).
+    """
+    name = table.name
+    rebuilt = f'{name}_rebuilt'
+    quote = connection.dialect.identifier_preparer.quote
+    columns = ', '.join(quote(column.name) for column in table.columns)
+    ddl = str(CreateTable(table).compile(dialect=connection.dialect))
+    
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {rebuilt}')
+    connection.exec_driver_sql(ddl.replace(f'CREATE TABLE {name} ', f'CREATE TABLE {rebuilt} ', 1))
+    connection.exec_driver_sql(f'INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {name}')
+    connection.exec_driver_sql(f'DROP TABLE {name}')
+    connection.exec_driver_sql(f'ALTER TABLE {rebuilt} RENAME TO {name}')
+
+
+def _sqlite_autoincrement(connection, table):
+    """Whether an SQLite table matches its model's AUTOINCREMENT setting"""
+    if not table.dialect_options['sqlite']['autoincrement']:
+        return True
+    sql = connection.scalar(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table.name}
+    )
+    return 'AUTOINCREMENT' in sql.upper()
+
+
+def _reserve_archived_ids(connection):
+    """Start new task ids after every archived one.
+    
+    Without AUTOINCREMENT, SQLite may already have handed out ids of archived
+    tasks again; those stay as they are, but no new task gets such an id.
+    """
+    archive = db.engines['archive']
+    query = db.select(db.func.max(ArchivedTask.id))
+    if archive is connection.engine:
+        max_id = connection.scalar(query)
+    else:
+        with archive.connect() as archive_connection:
+            max_id = archive_connection.scalar(query)
+    if max_id is None:
+        return
+    updated = connection.execute(
+        text('UPDATE sqlite_sequence SET seq = max(seq, :id) WHERE name = :name'),
+        {'id': max_id, 'name': Task.__tablename__}
+    )
+    if not updated.rowcount:
+        connection.execute(
+            text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :id)'),
+            {'id': max_id, 'name': Task.__tablename__}
+        )
+
+
+def _upgrade_tasks(connection):
+    """Nullable title (inherited from the template), one task per slot and,
+    on SQLite, ids that are never reused
+    """
+    table = Task.__table__
+    title = next(c for c in inspect(connection).get_columns(table.name) if c['name'] == 'title')
+    has_constraint = _has_slot_constraint(connection)
+    sqlite = connection.dialect.name == 'sqlite'
+    autoincrement = not sqlite or _sqlite_autoincrement(connection, table)
+    if title['nullable'] and has_constraint and autoincrement:
+        return
+    
+    if not has_constraint:
+        _delete_duplicate_occurrences(connection)
+    if sqlite:
+        _rebuild_sqlite_table(connection, table)
+        if not autoincrement:
+            _reserve_archived_ids(connection)
+        return
+    if not title['nullable']:
+        connection.exec_driver_sql(f'ALTER TABLE {table.name} ALTER COLUMN title DROP NOT NULL')
+    if not has_constraint:
+        constraint = next(c for c in table.constraints if c.name == TASK_SLOT_CONSTRAINT)
+        connection.execute(AddConstraint(constraint))
+
+
+def _upgrade_table(connection, table):
+    existing = {column['name'] for column in inspect(connection).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing:
+            connection.exec_driver_sql(
+                f'ALTER TABLE {table.name} ADD COLUMN {_column_ddl(connection, column)}'
+            )
+    if table is Task.__table__:
+        _upgrade_tasks(connection)
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def upgrade_schema():
+    """Bring tables created by an earlier version up to the models.
+    
+    db.create_all() only creates missing tables. For existing ones this adds
+    missing columns and indexes, makes the task title nullable, adds the
+    (template_id, due_date) unique constraint after deleting duplicate
+    occurrences and switches SQLite's tasks table to AUTOINCREMENT.
+    Up-to-date tables are only inspected. Must run in an app context after
+    db.create_all(); statements other than SQLite's use PostgreSQL syntax.
+    """
+    for bind_key, metadata in db.metadatas.items():
+        with db.engines[bind_key].begin() as connection:
+            for table in metadata.sorted_tables:
+                _upgrade_table(connection, table)
@@ -0,0 +1,277 @@
+import re
+from flask import current_app
+from sqlalchemy import and_, column, func, literal, literal_column, not_, or_, table, text
+from sqlalchemy.exc import DBAPIError
+from app import db
+from app.models import (
+    ARCHIVED_TASK_COLUMNS, ArchivedTask, Task, TaskTemplate, TASK_COLUMNS, TASK_DESCRIPTION, TASK_TITLE
+)
+
+# bm25 weights of the indexed title and description: a title match ranks higher
+SEARCH_WEIGHTS = (10.0, 1.0)
+SEARCHED_MODELS = (Task, TaskTemplate, ArchivedTask)
+# Text fields a task inherits from its template when NULL: (inherited, own)
+INHERITED_TEXT = (
+    (('title', 'description'), ()),
+    (('title',), ('description',)),
+    (('description',), ('title',))
+)
+
+# SQLite: an external-content FTS5 table per searched table, kept in sync by
+# triggers, so bulk inserts and archive moves are indexed too
+FTS5_TABLE = (
+    "CREATE VIRTUAL TABLE {fts} USING fts5("
+    "title, description, content='{table}', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+FTS5_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+    "INSERT INTO {fts}(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    # Only text changes touch the index, not toggles or reschedules
+    "CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title, description ON {table} BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO {fts}(rowid, title, description) VALUES (new.id, new.title, new.description); END"
+)
+# PostgreSQL: a trigram index over the searched text, which the database
+# maintains itself and which serves ILIKE '%term%'
+TRIGRAM_INDEX = (
+    "CREATE INDEX IF NOT EXISTS ix_{table}_search_trgm ON {table} "
+    "USING gin ((title || ' ' || coalesce(description, '')) gin_trgm_ops)"
+)
+
+
+def _fts_name(model):
+    return f'{model.__tablename__}_fts'
+
+
+def _setup_sqlite(connection, model):
+    fts = _fts_name(model)
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': fts}
+    ).first()
+    if not exists:
+        connection.execute(text(FTS5_TABLE.format(fts=fts, table=model.__tablename__)))
+        # Index the rows that are already there
+        connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+    for trigger in FTS5_TRIGGERS:
+        connection.execute(text(trigger.format(fts=fts, table=model.__tablename__)))
+    return 'fts5'
+
+
+def _setup_postgresql(connection, model):
+    connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    connection.execute(text(TRIGRAM_INDEX.format(table=model.__tablename__)))
+    return 'trigram'
+
+
+def init_search(app):
+    """Create the search index of every searched table and remember its kind.
+    
+    Uses FTS5 on SQLite and pg_trgm on PostgreSQL. Where neither is available
+    (no FTS5 module, no permission to create the extension, other databases)
+    search falls back to unindexed LIKE matching. Must run in an app context
+    after the tables are created.
+    """
+    modes = {}
+    for model in SEARCHED_MODELS:
+        engine = db.engines[getattr(model, '__bind_key__', None)]
+        setup = {'sqlite': _setup_sqlite, 'postgresql': _setup_postgresql}.get(engine.dialect.name)
+        modes[model.__tablename__] = 'like'
+        if setup is None:
+            continue
+        try:
+            with engine.begin() as connection:
+                modes[model.__tablename__] = setup(connection, model)
+        except DBAPIError as e:
+            app.logger.warning('Search index for %s unavailable, using LIKE: %s', model.__tablename__, e)
+    app.extensions['search'] = modes
+
+
+def search_terms(query):
+    """Words of a search query, lowercased"""
+    return re.findall(r'\w+', query.lower())
+
+
+def _fts5_terms(terms):
+    # Quoted terms can't be read as FTS5 operators; the last one matches as a
+    # prefix, so results show up while typing
+    return [f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*']
+
+
+def _fts5_query(terms):
+    return ' '.join(_fts5_terms(terms))
+
+
+def _fts5_rowids(model, fields, query):
+    """Ids of model rows whose fields match an FTS5 query"""
+    fts_name = _fts_name(model)
+    fts = table(fts_name, column('rowid'))
+    match = literal_column(fts_name).op('MATCH')(f'{{{" ".join(fields)}}} : ({query})')
+    return db.select(fts.c.rowid).where(match)
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _matching(model, terms):
+    """(join target and condition or None, criteria, rank expression) for a
+    model; lower ranks are better matches
+    """
+    mode = current_app.extensions['search'][model.__tablename__]
+    if mode == 'fts5':
+        fts_name = _fts_name(model)
+        fts = table(fts_name, column('rowid'))
+        match = literal_column(fts_name).op('MATCH')(_fts5_query(terms))
+        rank = func.bm25(literal_column(fts_name), *SEARCH_WEIGHTS)
+        return (fts, fts.c.rowid == model.id), [match], rank
+    
+    document = model.title + ' ' + func.coalesce(model.description, '')
+    criteria = [document.ilike(f'%{_escape_like(term)}%', escape='\\') for term in terms]
+    if mode == 'trigram':
+        rank = -func.word_similarity(' '.join(terms), document)
+    else:
+        rank = literal(0)
+    return None, criteria, rank
+
+
+def _search_query(model, columns, terms, criteria, order_by, offset, count):
+    join, matches, rank = _matching(model, terms)
+    query = db.select(*columns, rank.label('rank'))
+    if join is not None:
+        query = query.join(*join)
+    return db.session.execute(
+        query.where(*matches, *criteria).order_by(rank, *order_by).offset(offset).limit(count)
+    ).all()
+
+
+def _inherited_text_query(inherited, own, terms, criteria, order_by, offset, count):
+    """Tasks that inherit the given text fields, ranked by their template's match.
+    
+    Inherited fields are NULL on the task, so every word has to match either
+    the template's inherited fields, through its index, or the task's own
+    fields. Tasks whose own text matches alone are left to the task index.
+    """
+    fts_name = _fts_name(TaskTemplate)
+    fts = table(fts_name, column('rowid'))
+    quoted = _fts5_terms(terms)
+    # Ranked on the inherited words; tasks without any are found by their own text
+    match = literal_column(fts_name).op('MATCH')(f'{{{" ".join(inherited)}}} : ({" OR ".join(quoted)})')
+    rank = func.bm25(literal_column(fts_name), *SEARCH_WEIGHTS)
+    
+    conditions = [getattr(Task, field).is_(None) for field in inherited]
+    conditions += [getattr(Task, field).isnot(None) for field in own]
+    for term in quoted:
+        in_template = Task.template_id.in_(_fts5_rowids(TaskTemplate, inherited, term))
+        if own:
+            in_template = or_(in_template, Task.id.in_(_fts5_rowids(Task, own, term)))
+        conditions.append(in_template)
+    if own:
+        conditions.append(Task.id.notin_(_fts5_rowids(Task, own, ' '.join(quoted))))
+    return db.session.execute(
+        db.select(*TASK_COLUMNS, rank.label('rank'))
+        .join(fts, fts.c.rowid == Task.template_id)
+        .where(match, *conditions, *criteria)
+        .order_by(rank, *order_by).offset(offset).limit(count)
+    ).all()
+
+
+def _inherited_text_like_query(mode, terms, criteria, order_by, offset, count):
+    """Tasks that inherit their title or description, matched on the text as read.
+    
+    Tasks whose own text matches alone are left to _search_query().
+    """
+    document = TASK_TITLE + ' ' + func.coalesce(TASK_DESCRIPTION, '')
+    own = Task.title + ' ' + func.coalesce(Task.description, '')
+    patterns = [f'%{_escape_like(term)}%' for term in terms]
+    own_match = and_(*(own.ilike(pattern, escape='\\') for pattern in patterns))
+    rank = -func.word_similarity(' '.join(terms), document) if mode == 'trigram' else literal(0)
+    return db.session.execute(
+        db.select(*TASK_COLUMNS, rank.label('rank'))
+        .where(
+            Task.template_id.isnot(None),
+            or_(Task.title.is_(None), Task.description.is_(None)),
+            # A NULL title leaves the task's own document NULL: never matched
+            or_(Task.title.is_(None), not_(own_match)),
+            *(document.ilike(pattern, escape='\\') for pattern in patterns),
+            *criteria
+        )
+        .order_by(rank, *order_by).offset(offset).limit(count)
+    ).all()
+
+
+def _task_criteria(model, first_day, last_day, completed):
+    criteria = []
+    if first_day:
+        criteria.append(model.due_date >= first_day)
+    if last_day:
+        criteria.append(model.due_date <= last_day)
+    if completed is not None:
+        criteria.append(model.is_completed.is_(completed))
+    return criteria
+
+
+def _task_sort_key(row):
+    # Same order as the SQL: rank, then latest due date, then id
+    return row.rank, -row.due_date.toordinal(), -row.id
+
+
+def search_tasks(query, offset, limit, first_day=None, last_day=None, completed=None, archived=True):
+    """One page of tasks matching every word of query, best match first.
+    
+    Returns (task dicts, whether more results exist). Archived tasks are
+    searched too when archived is true, and tasks that inherit their title or
+    description are matched on the text as read, through their template's
+    index. Ranks from separate indexes are
+    comparable but not identical scores.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+    criteria = [Task.is_skipped.is_(False)] + _task_criteria(Task, first_day, last_day, completed)
+    order_by = (Task.due_date.desc(), Task.id.desc())
+    
+    sources = [lambda count: _search_query(Task, TASK_COLUMNS, terms, criteria, order_by, 0, count)]
+    modes = current_app.extensions['search']
+    if modes[Task.__tablename__] == modes[TaskTemplate.__tablename__] == 'fts5':
+        for inherited, own in INHERITED_TEXT:
+            sources.append(lambda count, inherited=inherited, own=own: _inherited_text_query(
+                inherited, own, terms, criteria, order_by, 0, count
+            ))
+    else:
+        mode = modes[Task.__tablename__]
+        sources.append(lambda count: _inherited_text_like_query(mode, terms, criteria, order_by, 0, count))
+    # The archive only holds completed tasks
+    if archived and completed is not False:
+        archive_criteria = _task_criteria(ArchivedTask, first_day, last_day, completed)
+        archive_order = (ArchivedTask.due_date.desc(), ArchivedTask.id.desc())
+        sources.append(lambda count: _search_query(
+            ArchivedTask, ARCHIVED_TASK_COLUMNS, terms, archive_criteria, archive_order, 0, count
+        ))
+    
+    # Every source up to the end of the page (plus one row, to know whether
+    # another page exists), merged
+    rows = []
+    for source in sources:
+        rows += source(offset + limit + 1)
+    rows.sort(key=_task_sort_key)
+    page = rows[offset:offset + limit + 1]
+    return [Task.row_to_dict(row) for row in page[:limit]], len(page) > limit
+
+
+def search_templates(query, offset, limit, active=None):
+    """One page of templates matching every word of query, best match first"""
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+    criteria = [] if active is None else [TaskTemplate.is_active.is_(active)]
+    rows = _search_query(TaskTemplate, (TaskTemplate.id,), terms, criteria,
+                         (TaskTemplate.id,), offset, limit + 1)
+    templates = {template.id: template for template in TaskTemplate.query.filter(
+        TaskTemplate.id.in_([row.id for row in rows[:limit]])
+    )}
+    return [templates[row.id].to_dict() for row in rows[:limit]], len(rows) > limit
@@ -0,0 +1,125 @@
+from datetime import date
+import hashlib
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import DataVersion, Task, TaskTemplate
+
+# Bumped by task writes that can't be tied to specific dates (bulk UPDATE/DELETE)
+TASKS_SCOPE = 'tasks'
+TEMPLATES_SCOPE = 'templates'
+
+
+def month_scope(day):
+    """Version scope covering the tasks due in one month"""
+    return f'tasks:{day:%Y-%m}'
+
+
+def calendar_scopes(first_day, last_day):
+    """Scopes a calendar response for [first_day, last_day] depends on.
+    
+    Templates are included because they produce virtual occurrences.
+    """
+    scopes = [TASKS_SCOPE, TEMPLATES_SCOPE]
+    year, month = first_day.year, first_day.month
+    while (year, month) <= (last_day.year, last_day.month):
+        scopes.append(month_scope(date(year, month, 1)))
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return scopes
+
+
+def get_versions(scopes):
+    """Current version of each scope, 0 for scopes never written"""
+    rows = db.session.query(DataVersion.scope, DataVersion.version).filter(
+        DataVersion.scope.in_(scopes)
+    ).all()
+    versions = dict.fromkeys(scopes, 0)
+    versions.update(rows)
+    return versions
+
+
+def make_etag(scopes, *key):
+    """ETag for a response identified by key that depends on the given scopes"""
+    versions = get_versions(scopes)
+    state = repr((key, sorted(versions.items())))
+    return hashlib.sha1(state.encode()).hexdigest()
+
+
+def bump(connection, scopes):
+    """Increment the version of each scope inside the current transaction"""
+    table = DataVersion.__table__
+    dialects = {'sqlite': sqlite, 'postgresql': postgresql}
+    dialect = dialects.get(connection.dialect.name)
+    for scope in sorted(scopes):
+        if dialect is not None:
+            connection.execute(
+                dialect.insert(table)
+                .values(scope=scope, version=1)
+                .on_conflict_do_update(
+                    index_elements=['scope'],
+                    set_={'version': table.c.version + 1}
+                )
+            )
+            continue
+        result = connection.execute(
+            table.update().where(table.c.scope == scope).values(version=table.c.version + 1)
+        )
+        if not result.rowcount:
+            connection.execute(table.insert().values(scope=scope, version=1))
+
+
+def _task_scopes(task):
+    scopes = set()
+    state = inspect(task)
+    history = state.attrs.due_date.history
+    for day in list(history.added) + list(history.unchanged) + list(history.deleted):
+        if day is not None:
+            scopes.add(month_scope(day))
+    if not scopes:
+        scopes.add(TASKS_SCOPE)
+    return scopes
+
+
+def _after_flush(session, flush_context):
+    """Bump scopes touched by objects written through the unit of work"""
+    scopes = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Task):
+            scopes |= _task_scopes(obj)
+        elif isinstance(obj, TaskTemplate):
+            scopes.add(TEMPLATES_SCOPE)
+    if scopes:
+        bump(session.connection(), scopes)
+
+
+def _do_orm_execute(orm_execute_state):
+    """Bump scopes touched by bulk INSERT/UPDATE/DELETE statements"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update
+            or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    
+    scopes = set()
+    if mapper.class_ is TaskTemplate:
+        scopes.add(TEMPLATES_SCOPE)
+    elif mapper.class_ is Task:
+        params = orm_execute_state.parameters
+        if orm_execute_state.is_insert and isinstance(params, list) and params:
+            scopes = {month_scope(row['due_date']) for row in params if row.get('due_date')}
+        if not scopes:
+            scopes.add(TASKS_SCOPE)
+    if scopes:
+        bump(orm_execute_state.session.connection(), scopes)
+
+
+def init_versioning():
+    """Register the session events that keep data versions current"""
+    if not event.contains(db.session, 'after_flush', _after_flush):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'do_orm_execute', _do_orm_execute)
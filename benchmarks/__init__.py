@@ -0,0 +1,3 @@
+from benchmarks.suite import CASES, compare, run_suite
+
+__all__ = ['CASES', 'compare', 'run_suite']
@@ -0,0 +1,65 @@
+import argparse
+import json
+import sys
+from benchmarks.suite import CASES, compare, run_suite
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Time template expansion, generation and API reads on seeded data.'
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--templates', type=int, default=50, help='number of templates')
+    parser.add_argument('--tasks', type=int, default=5000, help='number of standalone tasks')
+    parser.add_argument('--years', type=float, default=2, help='years the tasks are spread over')
+    parser.add_argument('--month-tasks', type=int, default=10000,
+                        help='tasks in the month read by dense_month_read')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case')
+    parser.add_argument('--cases', help=f"comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument('--database', help='SQLite file to use, its contents are replaced (default: a temporary file)')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='fail when a median is this much slower than the baseline (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+    cases = args.cases.split(',') if args.cases else None
+    if cases and not set(cases) <= set(CASES):
+        parser.error(f"unknown case(s): {', '.join(sorted(set(cases) - set(CASES)))}")
+    
+    results = run_suite(
+        seed=args.seed,
+        templates=args.templates,
+        tasks=args.tasks,
+        years=args.years,
+        repeat=args.repeat,
+        cases=cases,
+        database=args.database,
+        month_tasks=args.month_tasks
+    )
+    
+    for name, stats in results['cases'].items():
+        print(f"{name:<24} median {stats['median'] * 1000:9.1f} ms   min {stats['min'] * 1000:9.1f} ms")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    params = ('seed', 'templates', 'tasks', 'years', 'month_tasks')
+    if any(baseline['meta'].get(key) != results['meta'][key] for key in params):
+        print('warning: baseline was generated with different data parameters', file=sys.stderr)
+    
+    regressed = False
+    print()
+    for name, before, after, ratio, slower in compare(results, baseline, args.threshold):
+        flag = '  REGRESSION' if slower else ''
+        print(f'{name:<24} {before * 1000:9.1f} -> {after * 1000:9.1f} ms  ({ratio:.2f}x){flag}')
+        regressed = regressed or slower
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
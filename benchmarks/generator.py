@@ -0,0 +1,96 @@
+from datetime import date, time, timedelta
+import random
+from app import db
+from app.models import CRON_PRESETS, Task, TaskTemplate
+
+# Relative frequency of each preset among generated templates
+PRESET_WEIGHTS = {
+    'daily': 25,
+    'weekdays': 25,
+    'weekly_monday': 12,
+    'weekly_friday': 8,
+    'biweekly': 5,
+    'monthly_first': 12,
+    'monthly_last': 5,
+    'quarterly': 8,
+}
+
+WORDS = (
+    'review', 'report', 'invoice', 'backup', 'standup', 'planning', 'garden',
+    'workout', 'groceries', 'laundry', 'budget', 'newsletter', 'meeting',
+    'call', 'dentist', 'rent', 'deploy', 'inventory', 'reading', 'cleanup'
+)
+
+
+def _title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).capitalize()
+
+
+def generate_templates(rng, count, today):
+    """Template objects with a realistic mix of CRON_PRESETS"""
+    names = list(PRESET_WEIGHTS)
+    weights = [PRESET_WEIGHTS[name] for name in names]
+    templates = []
+    for _ in range(count):
+        cron = CRON_PRESETS[rng.choices(names, weights)[0]]
+        # Vary the time of day so templates don't all collide at 09:00
+        rest = cron.split(' ', 2)[2]
+        cron = f'{rng.choice((0, 15, 30, 45))} {rng.randint(6, 20)} {rest}'
+        template = TaskTemplate(
+            title=_title(rng),
+            description=rng.choice(('', 'Generated for benchmarks')),
+            cron_schedule=cron,
+            priority=rng.choice((1, 2, 2, 3)),
+            is_active=rng.random() < 0.9
+        )
+        if rng.random() < 0.2:
+            template.start_date = today - timedelta(days=rng.randint(0, 365))
+        if rng.random() < 0.1:
+            template.end_date = today + timedelta(days=rng.randint(30, 365))
+        template.refresh_next_occurrence()
+        templates.append(template)
+    return templates
+
+
+def generate_task_rows(rng, count, first_day, last_day):
+    """Insert parameters for standalone tasks spread over [first_day, last_day]"""
+    span = (last_day - first_day).days
+    today = date.today()
+    rows = []
+    for _ in range(count):
+        due_date = first_day + timedelta(days=rng.randint(0, span))
+        rows.append({
+            'title': _title(rng),
+            'description': '',
+            'due_date': due_date,
+            'due_time': time(rng.randint(6, 21), rng.choice((0, 30))) if rng.random() < 0.7 else None,
+            'priority': rng.choice((1, 2, 2, 3)),
+            'is_completed': due_date < today and rng.random() < 0.8
+        })
+    return rows
+
+
+def populate(seed=0, templates=50, tasks=5000, years=2, horizon_days=7):
+    """Fill the current app's database with synthetic data.
+    
+    Standalone tasks are spread over `years` years centred on today, and the
+    templates are materialized up to horizon_days like the scheduler would.
+    Returns the (first_day, last_day) span of the tasks.
+    """
+    from app.scheduler import generate_pending_tasks
+    
+    rng = random.Random(seed)
+    today = date.today()
+    half_span = timedelta(days=int(years * 365 / 2))
+    first_day, last_day = today - half_span, today + half_span
+    
+    db.session.add_all(generate_templates(rng, templates, today))
+    db.session.commit()
+    
+    rows = generate_task_rows(rng, tasks, first_day, last_day)
+    for start in range(0, len(rows), 5000):
+        db.session.execute(db.insert(Task), rows[start:start + 5000])
+    db.session.commit()
+    
+    generate_pending_tasks(horizon_days)
+    return first_day, last_day
@@ -0,0 +1,265 @@
+from datetime import date, datetime, timedelta
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+import random
+import sqlalchemy
+from app import create_app, db
+from app.cron import compile_cron
+from app.models import Task, TaskTemplate
+from benchmarks.generator import generate_task_rows, populate
+
+# Registered benchmark cases: name -> (setup, run)
+CASES = {}
+
+
+def case(name, setup=None):
+    """Register a benchmark; setup runs untimed before every repetition"""
+    def register(func):
+        CASES[name] = (setup, func)
+        return func
+    return register
+
+
+def _get(client, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {url} returned {response.status_code}')
+    return response
+
+
+def _send(client, method, url, json=None):
+    response = client.open(url, method=method, json=json)
+    if response.status_code != 200:
+        raise RuntimeError(f'{method} {url} returned {response.status_code}')
+    return response
+
+
+def _reset_generated_tasks(ctx):
+    """Forget stored future occurrences so generation does the full work again"""
+    Task.query.filter(
+        Task.template_id.isnot(None),
+        Task.due_date >= date.today()
+    ).delete(synchronize_session=False)
+    TaskTemplate.query.update({'materialized_through': None, 'next_occurrence_at': None},
+                              synchronize_session=False)
+    db.session.commit()
+
+
+def _reset_template_tasks(ctx):
+    Task.query.filter(
+        Task.template_id == ctx['template_id'],
+        Task.due_date >= date.today()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _reset_far_future(ctx):
+    Task.query.filter(
+        Task.template_id.isnot(None),
+        Task.due_date >= ctx['far_future']
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _seed_dense_month(ctx):
+    """Fill one month with month_tasks standalone tasks, once per suite run"""
+    if ctx.get('dense_month_seeded'):
+        return
+    first = ctx['dense_month']
+    last = (first + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    rows = generate_task_rows(random.Random(ctx['seed']), ctx['month_tasks'], first, last)
+    for start in range(0, len(rows), 5000):
+        db.session.execute(db.insert(Task), rows[start:start + 5000])
+    db.session.commit()
+    ctx['dense_month_seeded'] = True
+
+
+@case('template_expansion', setup=lambda ctx: compile_cron.cache_clear())
+def template_expansion(ctx):
+    start = datetime.combine(ctx['first_day'], datetime.min.time())
+    end = datetime.combine(ctx['last_day'], datetime.max.time())
+    for template in TaskTemplate.query.all():
+        template.get_occurrences_in_range(start, end)
+
+
+@case('generation_job', setup=_reset_generated_tasks)
+def generation_job(ctx):
+    from app.scheduler import generate_daily_tasks
+    generate_daily_tasks(ctx['app'])
+
+
+@case('week_read')
+def week_read(ctx):
+    _get(ctx['client'], f'/api/calendar/week?date={date.today().isoformat()}')
+
+
+@case('month_read')
+def month_read(ctx):
+    today = date.today()
+    _get(ctx['client'], f'/api/calendar/month?year={today.year}&month={today.month}')
+
+
+@case('dense_month_read', setup=_seed_dense_month)
+def dense_month_read(ctx):
+    """Month view of a month holding month_tasks tasks (10,000 by default)"""
+    month = ctx['dense_month']
+    _get(ctx['client'], f'/api/calendar/month?year={month.year}&month={month.month}')
+
+
+@case('tasks_read')
+def tasks_read(ctx):
+    _get(ctx['client'], '/api/tasks')
+
+
+@case('task_search')
+def task_search(ctx):
+    """First page of a search over stored and inherited task text"""
+    response = _get(ctx['client'], '/api/search?q=review')
+    if not response.get_json()['results']:
+        raise RuntimeError('Search returned no results, is the index populated?')
+
+
+@case('template_update')
+def template_update(ctx):
+    ctx['update_count'] = ctx.get('update_count', 0) + 1
+    _send(ctx['client'], 'PUT', f"/api/templates/{ctx['template_id']}",
+          json={'title': f"Benchmark template {ctx['update_count']}"})
+
+
+@case('template_regenerate', setup=_reset_template_tasks)
+def template_regenerate(ctx):
+    _send(ctx['client'], 'POST', f"/api/templates/{ctx['template_id']}/regenerate")
+
+
+@case('read_during_generation', setup=_reset_far_future)
+def read_during_generation(ctx):
+    """Range reads while another thread materializes a year of occurrences"""
+    from app.scheduler import generate_tasks_for_range
+    
+    app = ctx['app']
+    start = datetime.combine(ctx['far_future'], datetime.min.time())
+    done = threading.Event()
+    errors = []
+    
+    def write():
+        try:
+            with app.app_context():
+                for month in range(12):
+                    chunk = start + timedelta(days=30 * month)
+                    generate_tasks_for_range(chunk, chunk + timedelta(days=30))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+    
+    writer = threading.Thread(target=write)
+    writer.start()
+    first, last = ctx['first_day'].isoformat(), ctx['last_day'].isoformat()
+    for _ in range(20):
+        _get(ctx['client'], f'/api/tasks?start_date={first}&end_date={last}&limit=200')
+    done.wait()
+    writer.join()
+    if errors:
+        raise errors[0]
+
+
+def run_suite(seed=0, templates=50, tasks=5000, years=2, repeat=5, cases=None, database=None,
+              month_tasks=10000):
+    """Build a seeded database, time each case and return JSON-ready results"""
+    names = cases or list(CASES)
+    unknown = set(names) - set(CASES)
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {', '.join(sorted(unknown))}")
+    
+    workdir = None
+    if database is None:
+        workdir = tempfile.TemporaryDirectory()
+        database = os.path.join(workdir.name, 'benchmark.db')
+    # Start from an empty file so create_app() sets the database up as in
+    # production, search triggers included
+    for path in (database, f'{database}-wal', f'{database}-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}',
+        'SCHEDULER_ENABLED': False,
+        'ASSET_BUILD': False
+    })
+    results = {}
+    try:
+        with app.app_context():
+            first_day, last_day = populate(
+                seed=seed, templates=templates, tasks=tasks, years=years,
+                horizon_days=app.config['RECURRING_HORIZON_DAYS']
+            )
+            template = TaskTemplate.query.filter_by(is_active=True).order_by(TaskTemplate.id).first()
+            ctx = {
+                'app': app,
+                'client': app.test_client(),
+                'first_day': first_day,
+                'last_day': last_day,
+                'template_id': template.id if template else None,
+                'far_future': last_day + timedelta(days=365),
+                # Clear of the other cases' data: after the far future year
+                'dense_month': (last_day + timedelta(days=800)).replace(day=1),
+                'month_tasks': month_tasks,
+                'seed': seed
+            }
+            for name in names:
+                setup, func = CASES[name]
+                runs = []
+                for _ in range(repeat):
+                    if setup is not None:
+                        setup(ctx)
+                    db.session.expire_all()
+                    started = time.perf_counter()
+                    func(ctx)
+                    runs.append(time.perf_counter() - started)
+                results[name] = {
+                    'median': statistics.median(runs),
+                    'min': min(runs),
+                    'max': max(runs),
+                    'runs': runs
+                }
+            db.session.remove()
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        if workdir is not None:
+            workdir.cleanup()
+    
+    return {
+        'meta': {
+            'seed': seed,
+            'templates': templates,
+            'tasks': tasks,
+            'years': years,
+            'month_tasks': month_tasks,
+            'repeat': repeat,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'platform': platform.platform()
+        },
+        'cases': results
+    }
+
+
+def compare(results, baseline, threshold):
+    """Compare median times against a baseline run.
+    
+    Returns (name, baseline median, current median, ratio, regressed) rows;
+    a case regressed when it is more than threshold (e.g. 0.2 = 20%) slower.
+    """
+    rows = []
+    for name, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(name)
+        if previous is None or not previous['median']:
+            continue
+        ratio = current['median'] / previous['median']
+        rows.append((name, previous['median'], current['median'], ratio, ratio > 1 + threshold))
+    return rows
@@ -0,0 +1,29 @@
+"""Gunicorn settings: `gunicorn -c gunicorn.conf.py "app:create_app()"`.
+
+With PROMETHEUS_MULTIPROC_DIR set, /metrics sums the metrics of all workers;
+the directory is emptied at startup and dead workers' live values dropped.
+"""
+import os
+import shutil
+
+bind = '0.0.0.0:8000'
+workers = 4
+# Every open calendar page holds a change stream for up to
+# CHANGES_STREAM_TIMEOUT seconds; threaded workers serve other requests
+# meanwhile and don't time out on the long-lived streams
+worker_class = 'gthread'
+threads = 16
+
+
+def on_starting(server):
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        # Values of a previous run would otherwise be added to this one's
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -31,6 +31,20 @@ function parseISODate(dateString) {
     return new Date(year, month - 1, day); // month is 0-indexed
 }
 
+// Format a Date as YYYY-MM-DD in local time
+function toISODate(date) {
+    const year = date.getFullYear();
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return `${year}-${month}-${day}`;
+}
+
+function addDays(date, days) {
+    const result = new Date(date);
+    result.setDate(result.getDate() + days);
+    return result;
+}
+
 // ============ Modal Functions ============
 
 function closeModal() {
@@ -80,10 +94,8 @@ function saveTask(event) {
     .then(response => response.json())
     .then(() => {
         closeModal();
-        // Reload the current view using global refresh callback
-        if (window.refreshCurrentView) {
-            window.refreshCurrentView();
-        }
+        // Bring the current view up to date
+        refreshAfterChange();
     })
     .catch(error => {
         console.error('Error saving task:', error);
@@ -97,9 +109,7 @@ function toggleTask(taskId) {
     })
     .then(response => response.json())
     .then(() => {
-        if (window.refreshCurrentView) {
-            window.refreshCurrentView();
-        }
+        refreshAfterChange();
     })
     .catch(error => console.error('Error toggling task:', error));
 }
@@ -113,13 +123,132 @@ function deleteTask(taskId) {
         method: 'DELETE'
     })
     .then(() => {
-        if (window.refreshCurrentView) {
-            window.refreshCurrentView();
-        }
+        refreshAfterChange();
     })
     .catch(error => console.error('Error deleting task:', error));
 }
 
+// Apply several task operations in one request, e.g.
+// batchTasks([{op: 'toggle', id: 1}, {op: 'delete', id: 2}])
+function batchTasks(operations) {
+    return fetch('/api/tasks/batch', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ operations: operations })
+    })
+    .then(response => response.json().then(data => {
+        if (!response.ok) {
+            throw data;
+        }
+        refreshAfterChange();
+        return data.results;
+    }))
+    .catch(error => {
+        console.error('Error applying batch:', error);
+        throw error;
+    });
+}
+
+// ============ Change Feed ============
+
+// Sequence number of the last change applied to the current view
+let changeSeq = null;
+
+// Order tasks within a day like the server: due_time, then priority, nulls first
+function compareTasks(a, b) {
+    const keyA = [a.due_time !== null, a.due_time || '', a.priority !== null, a.priority || 0];
+    const keyB = [b.due_time !== null, b.due_time || '', b.priority !== null, b.priority || 0];
+    for (let i = 0; i < keyA.length; i++) {
+        if (keyA[i] < keyB[i]) return -1;
+        if (keyA[i] > keyB[i]) return 1;
+    }
+    return 0;
+}
+
+// Patch cached calendar periods (objects with a days array) with task changes.
+// Returns true when a change can't be applied locally and the view must be refetched.
+function patchCalendarPeriods(periods, changes) {
+    const days = [];
+    for (const period of periods) {
+        days.push(...period.days);
+    }
+    
+    for (const change of changes) {
+        if (change.entity !== 'task' || change.action === 'invalidate') {
+            return true;
+        }
+        const ids = [String(change.id), change.virtual_id];
+        days.forEach(day => {
+            day.tasks = day.tasks.filter(task => !ids.includes(String(task.id)));
+        });
+        if (change.action === 'upsert') {
+            days.filter(day => day.date === change.task.due_date).forEach(day => {
+                day.tasks.push(change.task);
+                day.tasks.sort(compareTasks);
+            });
+        }
+    }
+    return false;
+}
+
+// Apply a /api/changes payload through the page's window.applyChanges hook,
+// refetching the view when the changes can't be patched in
+function handleChanges(payload) {
+    if (changeSeq !== null && payload.seq <= changeSeq && !payload.reset) {
+        return;
+    }
+    changeSeq = payload.seq;
+    
+    const refetch = payload.reset || window.applyChanges(payload.changes);
+    if (refetch && window.refreshCurrentView) {
+        window.refreshCurrentView();
+    }
+    if (payload.more) {
+        syncChanges();
+    }
+}
+
+// Fetch and apply whatever changed since the last applied change
+function syncChanges() {
+    return fetch(`/api/changes?since=${changeSeq}`)
+        .then(response => response.json())
+        .then(handleChanges)
+        .catch(error => console.error('Error loading changes:', error));
+}
+
+// Update the current view after a mutation made from this page
+function refreshAfterChange() {
+    if (window.applyChanges && changeSeq !== null) {
+        syncChanges();
+    } else if (window.refreshCurrentView) {
+        window.refreshCurrentView();
+    }
+}
+
+// Follow changes made by other tabs, users and the scheduler
+function startChangeFeed() {
+    fetch('/api/changes')
+        .then(response => response.json())
+        .then(data => {
+            changeSeq = data.seq;
+            if (!window.EventSource) {
+                return;
+            }
+            const source = new EventSource(`/api/changes/stream?since=${data.seq}`);
+            source.addEventListener('changes', event => handleChanges(JSON.parse(event.data)));
+        })
+        .catch(error => console.error('Error starting change feed:', error));
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    // Only calendar views that can patch themselves follow the feed
+    if (window.applyChanges) {
+        startChangeFeed();
+    }
+});
+
 // ============ Keyboard Shortcuts ============
 
 document.addEventListener('keydown', (event) => {
@@ -186,7 +315,7 @@ function handleSwipe() {
 
 if ('serviceWorker' in navigator) {
     window.addEventListener('load', () => {
-        navigator.serviceWorker.register('/static/js/sw.js')
+        navigator.serviceWorker.register('/sw.js')
             .then(registration => {
                 console.log('ServiceWorker registered:', registration.scope);
             })
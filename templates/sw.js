@@ -0,0 +1,49 @@
+// Service Worker for Task Calendar PWA, generated by the app (see /sw.js)
+
+// Changes whenever any static asset changes, which replaces the old cache
+const CACHE_NAME = 'task-calendar-{{ version }}';
+const urlsToCache = {{ precache|tojson }};
+
+// Install event
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+            .then(cache => cache.addAll(urlsToCache))
+            .then(() => self.skipWaiting())
+    );
+});
+
+// Fetch event
+self.addEventListener('fetch', event => {
+    if (event.request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(event.request.url);
+    if (url.pathname.startsWith('/assets/')) {
+        // Hashed assets never change: cache first
+        event.respondWith(
+            caches.match(event.request)
+                .then(response => response || fetch(event.request))
+        );
+    } else if (event.request.mode === 'navigate') {
+        // Pages: network first, the cached shell when offline
+        event.respondWith(
+            fetch(event.request).catch(() => caches.match('/'))
+        );
+    }
+});
+
+// Activate event
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys().then(cacheNames => {
+            return Promise.all(
+                cacheNames.filter(cacheName => {
+                    return cacheName !== CACHE_NAME;
+                }).map(cacheName => {
+                    return caches.delete(cacheName);
+                })
+            );
+        }).then(() => self.clients.claim())
+    );
+});
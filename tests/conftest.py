@@ -0,0 +1,36 @@
+import pytest
+from app import create_app, db
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app on a fresh SQLite database in tmp_path, inside an app context"""
+    contexts = []
+    
+    def make_app(**config):
+        settings = {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "tasks.db"}',
+            'SCHEDULER_ENABLED': False,
+            'ASSET_BUILD': False
+        }
+        settings.update(config)
+        app = create_app(settings)
+        context = app.app_context()
+        context.push()
+        contexts.append(context)
+        return app
+    
+    yield make_app
+    for context in reversed(contexts):
+        db.session.remove()
+        context.pop()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
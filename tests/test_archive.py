@@ -0,0 +1,115 @@
+"""Moving completed tasks to the archive and back"""
+from datetime import date, datetime, timedelta
+from app import db
+from app.archive import UNTITLED, archive_completed_tasks
+from app.models import ArchivedTask, Task, TaskTemplate
+from app.scheduler import generate_tasks_for_range
+
+
+def create_task(client, **fields):
+    data = {'title': 'Task', 'due_date': date.today().isoformat()}
+    data.update(fields)
+    return client.post('/api/tasks', json=data).get_json()
+
+
+def archive_old_tasks(app, client, count):
+    """Ids of count completed tasks due 60 days ago, archived"""
+    app.config['ARCHIVE_AFTER_DAYS'] = 30
+    ids = []
+    for i in range(count):
+        task = create_task(client, title=f'old{i}', due_date=(date.today() - timedelta(days=60)).isoformat())
+        client.post(f'/api/tasks/{task["id"]}/toggle')
+        ids.append(task['id'])
+    assert archive_completed_tasks() == count
+    return ids
+
+
+def hot_titles():
+    db.session.expire_all()
+    return sorted(db.session.scalars(db.select(Task.title)))
+
+
+def test_archived_ids_are_not_reused(app, client):
+    archived_ids = archive_old_tasks(app, client, 3)
+    newest = create_task(client, title='newest')
+    client.delete(f'/api/tasks/{newest["id"]}')
+    
+    task = create_task(client, title='new')
+    assert task['id'] not in archived_ids
+    
+    # Moving the archive back doesn't touch the new task
+    app.config['ARCHIVE_AFTER_DAYS'] = 0
+    archive_completed_tasks()
+    assert hot_titles() == ['new', 'old0', 'old1', 'old2']
+
+
+def test_restore_keeps_live_tasks(app, client):
+    archived_ids = archive_old_tasks(app, client, 2)
+    live = [create_task(client, title=f'live{i}') for i in range(2)]
+    assert not {task['id'] for task in live} & set(archived_ids)
+    
+    response = client.put(f'/api/tasks/{archived_ids[0]}', json={'title': 'restored'})
+    assert response.status_code == 200
+    assert hot_titles() == ['live0', 'live1', 'restored']
+    assert db.session.scalars(db.select(ArchivedTask.title)).all() == ['old1']
+
+
+def test_newest_task_is_archived(app, client):
+    archived_ids = archive_old_tasks(app, client, 1)
+    assert db.session.get(ArchivedTask, archived_ids[0]) is not None
+    assert hot_titles() == []
+
+
+def test_restored_task_inherits_again(app, client):
+    app.config['ARCHIVE_AFTER_DAYS'] = 30
+    template = client.post('/api/templates', json={
+        'title': 'Watering', 'description': 'All plants', 'cron_schedule': '0 9 * * *', 'priority': 1
+    }).get_json()
+    day = date.today() - timedelta(days=60)
+    start = datetime.combine(day, datetime.min.time())
+    generate_tasks_for_range(start, start + timedelta(days=1) - timedelta(microseconds=1))
+    db.session.commit()
+    task = db.session.scalars(db.select(Task).where(Task.template_id == template['id'])).one()
+    task_id = task.id
+    client.put(f'/api/tasks/{task_id}', json={'description': 'Only the ferns', 'is_completed': True})
+    assert archive_completed_tasks() == 1
+    
+    # The archive reads as the task did, without the template
+    archived = db.session.get(ArchivedTask, task_id)
+    assert (archived.title, archived.description, archived.priority) == ('Watering', 'Only the ferns', 1)
+    
+    client.put(f'/api/templates/{template["id"]}', json={'title': 'Misting', 'priority': 3})
+    app.config['ARCHIVE_AFTER_DAYS'] = 0
+    archive_completed_tasks()
+    db.session.expire_all()
+    restored = db.session.get(Task, task_id)
+    assert (restored.title, restored.description, restored.priority) == (None, 'Only the ferns', None)
+    assert client.get(f'/api/tasks/{task_id}').get_json()['title'] == 'Misting'
+
+
+def test_archive_task_without_title(app, client):
+    # Its template was deleted without the title being copied down
+    task = create_task(client, due_date=(date.today() - timedelta(days=60)).isoformat())
+    client.post(f'/api/tasks/{task["id"]}/toggle')
+    db.session.execute(db.update(Task).where(Task.id == task['id']).values(title=None))
+    db.session.commit()
+    
+    app.config['ARCHIVE_AFTER_DAYS'] = 30
+    assert archive_completed_tasks() == 1
+    assert db.session.get(ArchivedTask, task['id']).title == UNTITLED
+
+
+def test_restore_after_template_deleted(app, client):
+    app.config['ARCHIVE_AFTER_DAYS'] = 30
+    template = client.post('/api/templates', json={'title': 'Watering', 'cron_schedule': '0 9 * * *'}).get_json()
+    start = datetime.combine(date.today() - timedelta(days=60), datetime.min.time())
+    generate_tasks_for_range(start, start + timedelta(hours=23))
+    db.session.execute(db.update(Task).values(is_completed=True))
+    db.session.commit()
+    assert archive_completed_tasks() == 1
+    
+    db.session.delete(db.session.get(TaskTemplate, template['id']))
+    db.session.commit()
+    app.config['ARCHIVE_AFTER_DAYS'] = 0
+    archive_completed_tasks()
+    assert hot_titles() == ['Watering']
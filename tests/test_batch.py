@@ -0,0 +1,78 @@
+"""POST /api/tasks/batch"""
+from datetime import date, timedelta
+import pytest
+from app import db
+from app.archive import archive_completed_tasks
+from app.models import ArchivedTask, Task
+
+
+@pytest.fixture(params=['shared', 'separate'])
+def app(request, make_app, tmp_path):
+    config = {'ARCHIVE_AFTER_DAYS': 30}
+    if request.param == 'separate':
+        config['ARCHIVE_DATABASE_URL'] = f'sqlite:///{tmp_path / "archive.db"}'
+    return make_app(**config)
+
+
+def create_task(client, **fields):
+    data = {'title': 'Task', 'due_date': date.today().isoformat()}
+    data.update(fields)
+    return client.post('/api/tasks', json=data).get_json()
+
+
+def archive_task(client):
+    """An archived task's id (a newer task keeps it from being the newest row)"""
+    task = create_task(client, title='Old', due_date=(date.today() - timedelta(days=60)).isoformat())
+    client.post(f'/api/tasks/{task["id"]}/toggle')
+    create_task(client, title='Newer')
+    assert archive_completed_tasks() == 1
+    return task['id']
+
+
+def test_batch_applies_all(client):
+    first, second = create_task(client), create_task(client)
+    response = client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'New', 'due_date': date.today().isoformat()}},
+        {'op': 'toggle', 'id': first['id']},
+        {'op': 'delete', 'id': second['id']}
+    ]})
+    assert response.status_code == 200
+    assert [result['status'] for result in response.get_json()['results']] == ['ok'] * 3
+    assert db.session.get(Task, first['id']).is_completed
+    assert db.session.get(Task, second['id']) is None
+
+
+def test_rejected_batch_leaves_archive_alone(client):
+    archived_id = archive_task(client)
+    response = client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'update', 'id': archived_id, 'data': {'title': 'Edited'}},
+        {'op': 'toggle', 'id': 999999}
+    ]})
+    assert response.status_code == 400
+    assert [result['status'] for result in response.get_json()['results']] == ['skipped', 'error']
+    
+    db.session.remove()
+    assert db.session.get(Task, archived_id) is None
+    assert db.session.get(ArchivedTask, archived_id).title == 'Old'
+
+
+def test_batch_restores_archived_task(client):
+    archived_id = archive_task(client)
+    response = client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'update', 'id': archived_id, 'data': {'title': 'Edited'}}
+    ]})
+    assert response.status_code == 200
+    
+    db.session.remove()
+    assert db.session.get(Task, archived_id).title == 'Edited'
+    assert db.session.get(ArchivedTask, archived_id) is None
+
+
+def test_batch_rejects_operations_on_deleted_task(client):
+    task = create_task(client)
+    response = client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'delete', 'id': task['id']},
+        {'op': 'toggle', 'id': task['id']}
+    ]})
+    assert response.status_code == 400
+    assert db.session.get(Task, task['id']) is not None
@@ -0,0 +1,92 @@
+"""CompiledCron and get_occurrences() against croniter's own iteration"""
+from datetime import datetime, timedelta
+import random
+import pytest
+from croniter import croniter
+from app.cron import compile_cron, get_occurrences
+from app.models import CRON_PRESETS
+
+EXPRESSIONS = list(CRON_PRESETS.values()) + [
+    # Last day of the month, alone and combined with other days and weekdays
+    '30 17 L * *',
+    '0 8 15,L * *',
+    '0 8 L 2 *',
+    '0 8 L * 5',
+    # Steps from a start value and over the whole range
+    '0 9 * * 1/2',
+    '0 1/2 * * *',
+    '*/15 9-10 * * *',
+    '0 */6 * * *',
+    '0 9 */2 * *',
+    '0 9 1 */2 *',
+    '5 4 * * */3',
+    # Ranges, including stepped ranges and Sunday as 7
+    '0 9 * * 1-5',
+    '0 9-17 * * 6-7',
+    '0 9 10-20 * *',
+    '0 9 1-15/3 * *',
+    '0 12 * 3-5 1-3',
+    # Day-of-month OR day-of-week, as in cron
+    '0 9 13 * 5'
+]
+
+WINDOWS = 20
+
+
+def croniter_occurrences(cron_expr, start, end):
+    """Reference: repeated get_next() from start up to end"""
+    occurrences = []
+    cron = croniter(cron_expr, start)
+    while True:
+        next_time = cron.get_next(datetime)
+        if next_time > end:
+            return occurrences
+        occurrences.append(next_time)
+
+
+def random_windows(cron_expr):
+    rng = random.Random(cron_expr)
+    for _ in range(WINDOWS):
+        start = datetime(2023, 1, 1) + timedelta(minutes=rng.randrange(4 * 365 * 24 * 60))
+        yield start, start + timedelta(minutes=rng.randrange(1, 120 * 24 * 60))
+
+
+@pytest.mark.parametrize('cron_expr', EXPRESSIONS)
+def test_compiled(cron_expr):
+    assert compile_cron(cron_expr) is not None
+
+
+@pytest.mark.parametrize('cron_expr', EXPRESSIONS)
+def test_matches_croniter(cron_expr):
+    compiled = compile_cron(cron_expr)
+    for start, end in random_windows(cron_expr):
+        expected = croniter_occurrences(cron_expr, start, end)
+        assert compiled.occurrences(start, end) == expected, (start, end)
+        assert get_occurrences(cron_expr, start, end) == expected, (start, end)
+
+
+@pytest.mark.parametrize('cron_expr', EXPRESSIONS)
+def test_window_bounds(cron_expr):
+    # An occurrence at start is excluded and one at end is included
+    first = croniter(cron_expr, datetime(2024, 2, 1)).get_next(datetime)
+    second = croniter(cron_expr, first).get_next(datetime)
+    assert get_occurrences(cron_expr, first, second) == [second]
+
+
+def test_leap_years():
+    start, end = datetime(2023, 1, 1), datetime(2029, 1, 1)
+    for cron_expr in ('0 9 L 2 *', '0 9 29 2 *'):
+        assert get_occurrences(cron_expr, start, end) == croniter_occurrences(cron_expr, start, end)
+
+
+def test_slow_path():
+    # Nth weekday isn't compiled but gives the same results through croniter
+    cron_expr = '0 9 * * 1#2'
+    assert compile_cron(cron_expr) is None
+    start, end = datetime(2024, 1, 1), datetime(2024, 12, 31)
+    assert get_occurrences(cron_expr, start, end) == croniter_occurrences(cron_expr, start, end)
+
+
+def test_invalid_expression():
+    with pytest.raises((ValueError, KeyError)):
+        compile_cron('61 9 * * *')
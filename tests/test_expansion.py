@@ -0,0 +1,48 @@
+"""Serial and parallel template expansion"""
+from datetime import date, datetime, timedelta
+import random
+import pytest
+from app import expansion
+from app.expansion import expand_specs
+from app.models import CRON_PRESETS
+
+
+@pytest.fixture
+def pool():
+    yield
+    if expansion._pool is not None:
+        expansion._pool.shutdown()
+        expansion._pool = None
+
+
+def random_specs(count):
+    """Specs over every preset, with and without start and end dates"""
+    rng = random.Random(0)
+    expressions = list(CRON_PRESETS.values()) + ['0 8 15,L * *', '0 9 13 * 5', '0 9 * * 1#2', 'not a cron']
+    specs = []
+    for _ in range(count):
+        start = datetime(2030, 1, 1) + timedelta(hours=rng.randrange(365 * 24))
+        end = start + timedelta(days=rng.randrange(1, 120))
+        template_start = template_end = None
+        if rng.random() < 0.5:
+            template_start = (start + timedelta(days=rng.randrange(-30, 60))).date()
+        if rng.random() < 0.5:
+            template_end = (start + timedelta(days=rng.randrange(0, 90))).date()
+        specs.append((rng.choice(expressions), template_start, template_end, start, end))
+    return specs
+
+
+def test_parallel_matches_serial(pool):
+    specs = random_specs(400)
+    serial = expand_specs(specs, 1)
+    assert expand_specs(specs, 2) == serial
+    # The specs are realistic: end dates cut some expansions short
+    assert any(occurrences for occurrences in serial)
+    assert any(spec[2] is not None and spec[2] < spec[4].date() for spec in specs)
+    assert all(occurrence.date() <= spec[2] for spec, occurrences in zip(specs, serial)
+               if spec[2] is not None for occurrence in occurrences)
+
+
+def test_single_spec(pool):
+    spec = ('0 9 * * *', None, date(2030, 1, 3), datetime(2030, 1, 1), datetime(2030, 1, 10))
+    assert expand_specs([spec], 2) == [[datetime(2030, 1, 1, 9), datetime(2030, 1, 2, 9), datetime(2030, 1, 3, 9)]]
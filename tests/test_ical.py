@@ -0,0 +1,71 @@
+"""GET /api/export.ics and POST /api/import"""
+from datetime import date, timedelta
+from app import db
+from app.ical import CalendarImport
+from app.models import Task, TaskTemplate
+
+SERIES = '\r\n'.join([
+    'BEGIN:VCALENDAR',
+    'BEGIN:VTODO',
+    'UID:series@example.com',
+    'SUMMARY:Watering',
+    'DTSTART:20301104T090000',
+    'RRULE:FREQ=DAILY',
+    'END:VTODO',
+    'BEGIN:VTODO',
+    'UID:series@example.com',
+    'SUMMARY:Watering the ferns',
+    'RECURRENCE-ID:20301105T090000',
+    'END:VTODO',
+    'BEGIN:VTODO',
+    'SUMMARY:Buy soil',
+    'DUE;VALUE=DATE:20301106',
+    'END:VTODO',
+    'END:VCALENDAR',
+    ''
+])
+
+
+def export(client, first_day, last_day):
+    return client.get(f'/api/export.ics?start_date={first_day.isoformat()}&end_date={last_day.isoformat()}')
+
+
+def test_long_export_of_stored_tasks(client):
+    client.post('/api/templates', json={'title': 'Daily', 'cron_schedule': '0 9 * * *'})
+    client.post('/api/tasks', json={'title': 'Old', 'due_date': '2024-03-01'})
+    response = export(client, date(2024, 1, 1), date(2025, 12, 31))
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    assert 'SUMMARY:Old' in text
+    assert 'RRULE:' in text
+
+
+def test_long_export_with_expanded_templates(client):
+    # Day-of-month OR day-of-week has no RRULE equivalent and is expanded
+    client.post('/api/templates', json={'title': 'Friday 13th', 'cron_schedule': '0 9 13 * 5'})
+    assert export(client, date.today(), date.today() + timedelta(days=730)).status_code == 400
+    assert export(client, date.today(), date.today() + timedelta(days=90)).status_code == 200
+
+
+def test_import_reports_conflicting_rows(client, monkeypatch):
+    flush = CalendarImport._flush
+    
+    def flush_after_concurrent_write(self):
+        # The occurrence is generated by another connection meanwhile
+        template_id = db.session.scalar(db.select(TaskTemplate.id))
+        with db.engine.begin() as connection:
+            connection.execute(db.insert(Task).values(
+                title='Generated', template_id=template_id, due_date=date(2030, 11, 5)
+            ))
+        monkeypatch.setattr(CalendarImport, '_flush', flush)
+        flush(self)
+    
+    monkeypatch.setattr(CalendarImport, '_flush', flush_after_concurrent_write)
+    response = client.post('/api/import', data=SERIES.encode(), content_type='text/calendar')
+    assert response.status_code == 201
+    result = response.get_json()
+    assert (result['templates'], result['tasks'], result['skipped']) == (1, 1, 1)
+    assert [error['line'] for error in result['errors']] == [12]
+    
+    db.session.remove()
+    assert sorted(db.session.scalars(db.select(Task.title))) == ['Buy soil', 'Generated']
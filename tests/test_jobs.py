@@ -0,0 +1,91 @@
+"""Generation jobs running while the calendar is read"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+import threading
+from app import db
+from app.jobs import create_generation_job, run_generation_job
+from app.models import Task, TaskTemplate
+
+TEMPLATES = 100
+MONTHS = 3
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def stored_by_month(payload):
+    """Check one calendar response and count its stored tasks per month.
+    
+    Every day shows each daily template exactly once, stored or virtual.
+    """
+    stored = Counter()
+    days = Counter()
+    for day in payload['days']:
+        assert len(day['tasks']) == TEMPLATES, day['date']
+        assert len({task['template_id'] for task in day['tasks']}) == TEMPLATES, day['date']
+        month = day['date'][:7]
+        days[month] += 1
+        stored[month] += sum(isinstance(task['id'], int) for task in day['tasks'])
+    return stored, days
+
+
+def test_reads_during_generation_job(app):
+    db.session.add_all(
+        TaskTemplate(title=f'Template {i}', cron_schedule=f'{i % 60} {6 + i % 12} * * *')
+        for i in range(TEMPLATES)
+    )
+    db.session.commit()
+    first_month = add_months(date.today(), 2)
+    start = datetime.combine(first_month, datetime.min.time())
+    job_id = create_generation_job(
+        start, datetime.combine(add_months(first_month, MONTHS), datetime.min.time())
+    ).id
+    
+    urls = []
+    for offset in range(MONTHS):
+        month = add_months(first_month, offset)
+        urls.append(f'/api/calendar/month?year={month.year}&month={month.month}')
+        # A week across the boundary into the next chunk
+        urls.append(f'/api/calendar/week?date={add_months(month, 1) - timedelta(days=2)}')
+    
+    running = threading.Event()
+    finished = threading.Event()
+    statuses = []
+    
+    def generate():
+        running.set()
+        try:
+            statuses.append(run_generation_job(app, job_id))
+        finally:
+            finished.set()
+    
+    writer = threading.Thread(target=generate)
+    writer.start()
+    running.wait()
+    
+    client = app.test_client()
+    reads = reads_while_running = 0
+    errors = []
+    while not finished.is_set() or reads < len(urls):
+        url = urls[reads % len(urls)]
+        was_running = not finished.is_set()
+        response = client.get(url)
+        if response.status_code != 200:
+            errors.append((url, response.status_code, response.get_data(as_text=True)[:200]))
+            break
+        # Each month is one chunk, committed as a whole or not yet at all
+        stored, days = stored_by_month(response.get_json())
+        for month, count in stored.items():
+            assert count in (0, TEMPLATES * days[month]), (url, month, count)
+        reads += 1
+        reads_while_running += was_running and not finished.is_set()
+    writer.join()
+    
+    assert not errors
+    assert statuses == ['success']
+    assert reads_while_running > 0
+    assert Task.query.filter(Task.due_date >= first_month).count() == TEMPLATES * (
+        add_months(first_month, MONTHS) - first_month
+    ).days
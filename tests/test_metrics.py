@@ -0,0 +1,62 @@
+"""GET /metrics"""
+import os
+import subprocess
+import sys
+import textwrap
+
+# Runs a worker in a fresh interpreter: prometheus_client picks its storage
+# when it is imported
+WORKER = textwrap.dedent("""
+    import sys
+    from app import create_app
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': sys.argv[1],
+        'SCHEDULER_ENABLED': False,
+        'ASSET_BUILD': False
+    })
+    client = app.test_client()
+    for _ in range(int(sys.argv[2])):
+        assert client.get('/api/tasks').status_code == 200
+    if sys.argv[3] == 'scrape':
+        sys.stdout.write(client.get('/metrics').get_data(as_text=True))
+""")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS_REQUESTS = 'http_request_duration_seconds_count{method="GET",route="/api/tasks",status="200"}'
+
+
+def sample(text, name):
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.split()[-1])
+    return None
+
+
+def test_metrics(client):
+    client.get('/api/tasks')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert sample(text, TASKS_REQUESTS) >= 1
+    assert 'db_statements_total{route="/api/tasks"}' in text
+    assert 'Server-Timing' in response.headers
+
+
+def test_metrics_summed_across_processes(tmp_path):
+    directory = tmp_path / 'metrics'
+    directory.mkdir()
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(directory))
+    database = f'sqlite:///{tmp_path / "tasks.db"}'
+    
+    def worker(requests, scrape=False):
+        return subprocess.run(
+            [sys.executable, '-c', WORKER, database, str(requests), 'scrape' if scrape else ''],
+            env=env, cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+    
+    worker(3)
+    worker(2)
+    # Whichever process answers the scrape reports the other workers too
+    text = worker(1, scrape=True)
+    assert sample(text, TASKS_REQUESTS) == 6
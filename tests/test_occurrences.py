@@ -0,0 +1,61 @@
+"""Virtual occurrences of templates that have no stored task yet"""
+from datetime import date, datetime, timedelta
+from app import db
+from app.models import TaskTemplate
+
+
+def create_template(client, **fields):
+    data = {'title': 'Water plants', 'cron_schedule': '0 9 * * *', 'priority': 1}
+    data.update(fields)
+    response = client.post('/api/templates', json=data)
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def virtual_days(client, first_day, last_day):
+    response = client.get(f'/api/calendar/range?start={first_day}&end={last_day}&group=day')
+    assert response.status_code == 200
+    return [
+        task['due_date'] for period in response.get_json()['periods'] for task in period['tasks']
+        if str(task['id']).startswith('tpl-')
+    ]
+
+
+def test_no_occurrences_before_creation(client):
+    today = date.today()
+    create_template(client, start_date=(today - timedelta(days=60)).isoformat())
+    first_day, last_day = today - timedelta(days=10), today + timedelta(days=3)
+    
+    assert virtual_days(client, first_day, last_day) == [
+        (today + timedelta(days=offset)).isoformat() for offset in range(4)
+    ]
+    
+    summary = client.get(f'/api/calendar/summary?start={first_day}&end={last_day}&group=day').get_json()
+    pending = {period['start_date']: period['virtual'] for period in summary['periods']}
+    assert sum(pending.values()) == 4
+    assert pending[(today - timedelta(days=1)).isoformat()] == 0
+    
+    # A past occurrence can't be materialized either
+    virtual_id = f'tpl-1-{today - timedelta(days=1):%Y%m%d}'
+    assert client.get(f'/api/tasks/{virtual_id}').status_code == 404
+
+
+def test_occurrences_from_creation_day(client):
+    today = date.today()
+    template = create_template(client)
+    db.session.get(TaskTemplate, template['id']).created_at = datetime.combine(
+        today - timedelta(days=5), datetime.min.time()
+    )
+    db.session.commit()
+    
+    assert virtual_days(client, today - timedelta(days=10), today) == [
+        (today - timedelta(days=offset)).isoformat() for offset in range(5, -1, -1)
+    ]
+
+
+def test_start_date_after_creation(client):
+    today = date.today()
+    create_template(client, start_date=(today + timedelta(days=2)).isoformat())
+    assert virtual_days(client, today, today + timedelta(days=3)) == [
+        (today + timedelta(days=offset)).isoformat() for offset in (2, 3)
+    ]
@@ -0,0 +1,45 @@
+"""Generation of template tasks"""
+from datetime import date, datetime, timedelta
+from app import db
+from app.models import Task, TaskTemplate
+from app.scheduler import generate_tasks_for_range, insert_tasks, task_row
+
+START = datetime(2030, 3, 1)
+END = datetime(2030, 4, 30, 23, 59)
+
+
+def create_templates(client):
+    for cron_schedule in ('0 9 * * *', '30 8 * * 1-5', '0 18 L * *'):
+        client.post('/api/templates', json={'title': cron_schedule, 'cron_schedule': cron_schedule})
+
+
+def slot_counts():
+    return db.session.execute(
+        db.select(Task.template_id, Task.due_date, db.func.count())
+        .group_by(Task.template_id, Task.due_date)
+    ).all()
+
+
+def test_generation_twice_over_range(client):
+    create_templates(client)
+    inserted = generate_tasks_for_range(START, END)
+    db.session.commit()
+    assert inserted == 61 + 43 + 2
+    
+    assert generate_tasks_for_range(START, END) == 0
+    db.session.commit()
+    counts = slot_counts()
+    assert len(counts) == inserted
+    assert {count for _, _, count in counts} == {1}
+
+
+def test_filled_slots_skipped(client):
+    # Slots another writer filled after this one looked for existing tasks
+    create_templates(client)
+    template = db.session.get(TaskTemplate, 1)
+    rows = [task_row(template, START + timedelta(days=days, hours=9)) for days in range(10)]
+    assert insert_tasks(rows[:4]) == 4
+    assert insert_tasks(rows) == 6
+    db.session.commit()
+    assert sorted(day for _, day, _ in slot_counts()) == [date(2030, 3, day) for day in range(1, 11)]
+    assert {count for _, _, count in slot_counts()} == {1}
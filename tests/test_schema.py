@@ -0,0 +1,124 @@
+"""Upgrading a database created by the first version of the app"""
+from datetime import date, timedelta
+import sqlite3
+from sqlalchemy import create_engine, inspect
+from app import db
+from app.models import ArchivedTask, Task
+
+# Tables as the first release created them
+INITIAL_SCHEMA = """
+CREATE TABLE task_templates (
+    id INTEGER NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    description TEXT,
+    cron_schedule VARCHAR(100) NOT NULL,
+    priority INTEGER,
+    start_date DATE,
+    end_date DATE,
+    is_active BOOLEAN,
+    created_at DATETIME,
+    updated_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE TABLE tasks (
+    id INTEGER NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    description TEXT,
+    due_date DATE NOT NULL,
+    due_time TIME,
+    is_completed BOOLEAN,
+    completed_at DATETIME,
+    priority INTEGER,
+    template_id INTEGER,
+    created_at DATETIME,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(template_id) REFERENCES task_templates (id)
+);
+"""
+
+
+def create_initial_database(path):
+    today = date.today()
+    connection = sqlite3.connect(path)
+    connection.executescript(INITIAL_SCHEMA)
+    connection.execute(
+        "INSERT INTO task_templates (id, title, cron_schedule, priority, is_active, created_at) "
+        "VALUES (1, 'Water plants', '0 9 * * *', 2, 1, ?)", (f'{today - timedelta(days=30)} 08:00:00',)
+    )
+    rows = [(1, today, 0), (2, today, 1), (3, today + timedelta(days=1), 0)]
+    connection.executemany(
+        "INSERT INTO tasks (id, title, due_date, due_time, is_completed, priority, template_id) "
+        "VALUES (?, 'Water plants', ?, '09:00:00.000000', ?, 2, 1)",
+        [(task_id, str(day), completed) for task_id, day, completed in rows]
+    )
+    connection.execute(
+        "INSERT INTO tasks (id, title, due_date, is_completed, priority) VALUES (4, 'Call mom', ?, 0, 1)",
+        (str(today),)
+    )
+    connection.commit()
+    connection.close()
+
+
+def test_upgrade_initial_database(tmp_path, make_app):
+    create_initial_database(tmp_path / 'tasks.db')
+    app = make_app()
+    
+    inspector = inspect(db.engine)
+    template_columns = {column['name'] for column in inspector.get_columns('task_templates')}
+    assert {'materialized_through', 'next_occurrence_at', 'is_exhausted'} <= template_columns
+    assert 'ix_task_templates_next_occurrence' in {
+        index['name'] for index in inspector.get_indexes('task_templates')
+    }
+    task_columns = {column['name']: column for column in inspector.get_columns('tasks')}
+    assert 'is_skipped' in task_columns
+    assert task_columns['title']['nullable']
+    # Existing tasks are occurrences nobody deleted
+    assert not db.session.scalar(db.select(db.func.count()).where(Task.is_skipped.is_(True)))
+    assert 'ix_tasks_due' in {index['name'] for index in inspector.get_indexes('tasks')}
+    assert any(c['name'] == 'uq_tasks_template_due_date' for c in inspector.get_unique_constraints('tasks'))
+    
+    # The completed duplicate of today's occurrence is the one kept
+    today = date.today()
+    assert db.session.scalars(
+        db.select(Task.id).where(Task.template_id == 1, Task.due_date == today)
+    ).all() == [2]
+    
+    client = app.test_client()
+    response = client.get(f'/api/calendar/week?date={today}')
+    assert response.status_code == 200
+    titles = [task['title'] for day in response.get_json()['days'] for task in day['tasks']]
+    assert 'Call mom' in titles
+    
+    # Generated tasks inherit their title now
+    db.session.execute(db.insert(Task), [{'due_date': today + timedelta(days=2), 'template_id': 1}])
+    db.session.commit()
+    response = client.get(f'/api/tasks?start_date={today + timedelta(days=2)}&end_date={today + timedelta(days=2)}')
+    assert [task['title'] for task in response.get_json() if task['template_id'] == 1] == ['Water plants']
+
+
+def test_upgrade_is_idempotent(tmp_path, make_app):
+    create_initial_database(tmp_path / 'tasks.db')
+    make_app()
+    db.session.remove()
+    make_app()
+    assert db.session.scalar(db.select(db.func.count()).select_from(Task)) == 3
+
+
+def test_upgrade_reserves_archived_ids(tmp_path, make_app):
+    path = tmp_path / 'tasks.db'
+    create_initial_database(path)
+    # Archived before ids stopped being reused
+    engine = create_engine(f'sqlite:///{path}')
+    ArchivedTask.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(ArchivedTask.__table__.insert().values(
+            id=10, title='Archived', due_date=date.today() - timedelta(days=400), is_completed=True
+        ))
+    engine.dispose()
+    
+    app = make_app()
+    task = app.test_client().post('/api/tasks', json={
+        'title': 'New', 'due_date': date.today().isoformat()
+    }).get_json()
+    assert task['id'] == 11
@@ -0,0 +1,57 @@
+"""GET /api/search over tasks that inherit text from their template"""
+from datetime import date, timedelta
+import pytest
+from app.occurrences import virtual_task_id
+
+
+@pytest.fixture(params=['fts5', 'like'])
+def client(request, app):
+    if request.param == 'like':
+        app.extensions['search'] = dict.fromkeys(app.extensions['search'], 'like')
+    return app.test_client()
+
+
+@pytest.fixture
+def template(client):
+    return client.post('/api/templates', json={
+        'title': 'Watering', 'description': 'Every plant by the window', 'cron_schedule': '0 9 * * *'
+    }).get_json()
+
+
+def search(client, query):
+    response = client.get('/api/search', query_string={'q': query})
+    assert response.status_code == 200
+    return [(task['title'], task['description']) for task in response.get_json()['results']]
+
+
+def override(client, template, **fields):
+    """Edit the occurrence of template tomorrow"""
+    day = date.today() + timedelta(days=1)
+    response = client.put(f'/api/tasks/{virtual_task_id(template["id"], day)}', json=fields)
+    assert response.status_code == 200
+
+
+def test_inherited_title(client, template):
+    override(client, template, description='Only the ferns')
+    assert search(client, 'watering') == [('Watering', 'Only the ferns')]
+    assert search(client, 'ferns') == [('Watering', 'Only the ferns')]
+    assert search(client, 'watering fer') == [('Watering', 'Only the ferns')]
+    assert search(client, 'window') == []
+
+
+def test_inherited_description(client, template):
+    override(client, template, title='Misting')
+    assert search(client, 'window') == [('Misting', 'Every plant by the window')]
+    assert search(client, 'misting plant') == [('Misting', 'Every plant by the window')]
+    assert search(client, 'watering') == []
+
+
+def test_inherited_text(client, template):
+    override(client, template, priority=1)
+    assert search(client, 'watering window') == [('Watering', 'Every plant by the window')]
+
+
+def test_own_text(client, template):
+    # Found once, although the template matches too
+    override(client, template, title='Watering twice', description='Every plant')
+    assert search(client, 'watering') == [('Watering twice', 'Every plant')]
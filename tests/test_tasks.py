@@ -0,0 +1,83 @@
+"""GET /api/tasks keyset pagination"""
+from datetime import date, datetime, time, timedelta
+import pytest
+from sqlalchemy import event
+from app import db
+from app.archive import archive_completed_tasks
+from app.models import ArchivedTask, Task
+from app.routes import _after_cursor, _task_list_order
+from app.scheduler import generate_tasks_for_range
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(ARCHIVE_AFTER_DAYS=30)
+
+
+def create_task(client, day, **fields):
+    data = {'title': 'Task', 'due_date': day.isoformat()}
+    data.update(fields)
+    return client.post('/api/tasks', json=data).get_json()
+
+
+@pytest.fixture
+def listing(client):
+    """Stored, generated and archived tasks sharing days, times and priorities"""
+    today = date.today()
+    for day in (today - timedelta(days=days) for days in range(60, 64)):
+        for priority in (1, 2):
+            task = create_task(client, day, priority=priority)
+            client.post(f'/api/tasks/{task["id"]}/toggle')
+    assert archive_completed_tasks() == 8
+    
+    for days in range(6):
+        day = today + timedelta(days=days)
+        create_task(client, day)
+        create_task(client, day, due_time='09:00')
+        create_task(client, day, due_time='09:00', priority=1)
+    # Generated tasks store no priority and read their template's
+    for priority in (1, 3):
+        client.post('/api/templates', json={'title': f'Daily {priority}', 'cron_schedule': '0 9 * * *',
+                                            'priority': priority})
+    start = datetime.combine(today, datetime.min.time())
+    generate_tasks_for_range(start, start + timedelta(days=6))
+    db.session.commit()
+    return (today - timedelta(days=90)).isoformat()
+
+
+def test_pages_cover_listing_once(client, listing):
+    expected = [task['id'] for task in client.get(f'/api/tasks?start_date={listing}').get_json()]
+    assert len(expected) == len(set(expected)) == 8 + 6 * 3 + 2 * 6
+    
+    ids, cursor = [], None
+    while True:
+        url = f'/api/tasks?start_date={listing}&limit=4'
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        ids += [task['id'] for task in response.get_json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert ids == expected
+
+
+def query_plan(engine, query):
+    """SQLite's plan for a query, with its parameters bound as in production"""
+    def explain(connection, cursor, statement, parameters, context, executemany):
+        return f'EXPLAIN QUERY PLAN {statement}', parameters
+    
+    event.listen(engine, 'before_cursor_execute', explain, retval=True)
+    try:
+        with engine.connect() as connection:
+            return ' '.join(row[3] for row in connection.execute(query))
+    finally:
+        event.remove(engine, 'before_cursor_execute', explain)
+
+
+@pytest.mark.parametrize('model', [Task, ArchivedTask])
+def test_cursor_seeks_index(app, model):
+    # A cursor deep into the table must not scan every row before it
+    query = (db.select(model.id).where(_after_cursor((date(2026, 1, 1), time(9), 2, 100), model))
+             .order_by(*_task_list_order(model)).limit(100))
+    plan = query_plan(db.engines[getattr(model, '__bind_key__', None)], query)
+    assert f'SEARCH {model.__tablename__} USING' in plan, plan
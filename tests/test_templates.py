@@ -0,0 +1,82 @@
+"""Reconciling a template's stored tasks with its schedule"""
+from datetime import date, time, timedelta
+import pytest
+from app import db
+from app.models import Task
+from app.occurrences import virtual_task_id
+
+
+def stored_tasks(template_id):
+    """{due_date: Task} of a template's stored tasks from tomorrow on"""
+    db.session.expire_all()
+    return {task.due_date: task for task in Task.query.filter(
+        Task.template_id == template_id,
+        Task.due_date > date.today()
+    )}
+
+
+@pytest.fixture
+def template(client):
+    """A daily template with its next 30 days stored"""
+    template = client.post('/api/templates', json={'title': 'Daily', 'cron_schedule': '0 9 * * *'}).get_json()
+    assert client.post(f'/api/templates/{template["id"]}/regenerate').status_code == 200
+    return template
+
+
+def reschedule(client, template, cron_schedule):
+    response = client.put(f'/api/templates/{template["id"]}', json={'cron_schedule': cron_schedule})
+    assert response.status_code == 200
+
+
+def first_day(weekday):
+    """The first day after today falling on weekday (Monday is 0)"""
+    tomorrow = date.today() + timedelta(days=1)
+    return tomorrow + timedelta(days=(weekday - tomorrow.weekday()) % 7)
+
+
+def test_unscheduled_days_deleted(client, template):
+    saturday, sunday = first_day(5), first_day(6)
+    tasks = stored_tasks(template['id'])
+    client.put(f'/api/tasks/{tasks[saturday].id}', json={'description': 'Water the ferns too'})
+    client.post(f'/api/tasks/{tasks[sunday].id}/toggle')
+    
+    reschedule(client, template, '0 9 * * 1-5')
+    tasks = stored_tasks(template['id'])
+    weekend = sorted(day for day in tasks if day.weekday() >= 5)
+    # Edited and completed occurrences stay
+    assert weekend == sorted([saturday, sunday])
+    assert tasks[saturday].description == 'Water the ferns too'
+    assert tasks[sunday].is_completed
+
+
+def test_missing_days_inserted(client, template):
+    reschedule(client, template, '0 9 * * 1-5')
+    assert all(day.weekday() < 5 for day in stored_tasks(template['id']))
+    
+    reschedule(client, template, '0 9 * * *')
+    days = sorted(stored_tasks(template['id']))
+    assert days == [days[0] + timedelta(days=offset) for offset in range(len(days))]
+    assert len(days) >= 29
+
+
+def test_times_moved(client, template):
+    tasks = stored_tasks(template['id'])
+    edited, completed = sorted(tasks)[:2]
+    client.put(f'/api/tasks/{tasks[edited].id}', json={'priority': 1})
+    client.post(f'/api/tasks/{tasks[completed].id}/toggle')
+    
+    reschedule(client, template, '30 10 * * *')
+    tasks = stored_tasks(template['id'])
+    assert tasks[edited].due_time == tasks[completed].due_time == time(9, 0)
+    assert {task.due_time for day, task in tasks.items() if day not in (edited, completed)} == {time(10, 30)}
+
+
+def test_inactive_template_keeps_tombstones(client, template):
+    day = date.today() + timedelta(days=3)
+    assert client.delete(f'/api/tasks/{virtual_task_id(template["id"], day)}').status_code == 204
+    client.put(f'/api/templates/{template["id"]}', json={'is_active': False})
+    assert client.post(f'/api/templates/{template["id"]}/regenerate').get_json()['deleted'] >= 29
+    
+    client.put(f'/api/templates/{template["id"]}', json={'is_active': True})
+    week = client.get(f'/api/calendar/week?date={day.isoformat()}').get_json()
+    assert week['days'][day.weekday()]['tasks'] == []
@@ -0,0 +1,78 @@
+"""ETags of calendar responses and the data versions behind them"""
+from datetime import date, timedelta
+import pytest
+from app import db
+from app.models import Task
+
+WEEK = date(2030, 6, 12)
+
+
+@pytest.fixture
+def week(client):
+    """GET the week of WEEK, revalidating with an ETag when given one"""
+    def week(etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return client.get(f'/api/calendar/week?date={WEEK.isoformat()}', headers=headers)
+    return week
+
+
+def create_task(client, day):
+    return client.post('/api/tasks', json={'title': 'Task', 'due_date': day.isoformat()}).get_json()
+
+
+def test_unchanged_week_not_modified(week):
+    response = week()
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    revalidated = week(etag)
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    assert not revalidated.data
+
+
+def test_task_writes_change_etag(client, week):
+    etag = week().headers['ETag']
+    task = create_task(client, WEEK)
+    assert week(etag).status_code == 200
+    
+    etag = week().headers['ETag']
+    client.put(f'/api/tasks/{task["id"]}', json={'title': 'Renamed'})
+    response = week(etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    
+    etag = response.headers['ETag']
+    client.delete(f'/api/tasks/{task["id"]}')
+    assert week(etag).status_code == 200
+
+
+def test_other_month_keeps_etag(client, week):
+    etag = week().headers['ETag']
+    create_task(client, WEEK + timedelta(days=90))
+    assert week(etag).status_code == 304
+
+
+def test_template_write_changes_etag(client, week):
+    etag = week().headers['ETag']
+    client.post('/api/templates', json={'title': 'Daily', 'cron_schedule': '0 9 * * *'})
+    assert week(etag).status_code == 200
+
+
+def test_bulk_statements_change_etag(client, week):
+    task = create_task(client, WEEK)
+    etag = week().headers['ETag']
+    Task.query.filter(Task.id == task['id']).update({'title': 'Bulk'}, synchronize_session=False)
+    db.session.commit()
+    response = week(etag)
+    assert response.status_code == 200
+    
+    etag = response.headers['ETag']
+    Task.query.filter(Task.id == task['id']).delete(synchronize_session=False)
+    db.session.commit()
+    response = week(etag)
+    assert response.status_code == 200
+    
+    etag = response.headers['ETag']
+    db.session.execute(db.insert(Task), [{'title': 'Inserted', 'due_date': WEEK}])
+    db.session.commit()
+    assert week(etag).status_code == 200